@@ -5,6 +5,11 @@ from auth_utils import login_required
 
 PREDICTED_COLLECTION = "PREDICTED_FIRE"
 
+# daily re-scoring of the saved prediction sites
+RESCORE_HOUR_UTC = 3 # after the 00 UTC forecast run is published
+RESCORE_CHUNK = 1000 # grid cells scored together: one Earth Engine evaluation, one weather batch, one model call
+FIRESTORE_BATCH_SIZE = 500 # largest Firestore write batch
+
 predictions_bp = Blueprint("predictions_bp", __name__, url_prefix="/api/predictions")
 
 
@@ -91,7 +96,9 @@ def _serialize_prediction(doc_snapshot):
         "is_Predicted": _to_bool(data.get("is_Predicted")), 
         "latitude": data.get("latitude"),  
         "predicted_at": _to_iso(data.get("predicted_at")), 
-        "risk_level": data.get("risk_level")  
+        "risk_level": data.get("risk_level"),
+        "current_risk_level": data.get("current_risk_level"),  # risk of today, set by the daily re-scoring
+        "rescored_at": _to_iso(data.get("rescored_at"))
     }
 
 
@@ -219,4 +226,82 @@ def get_user_predictions(user_id: str):
 
     # sort predictions by datetime, newest first
     results.sort(key=lambda item: item.get("predicted_at") or "", reverse=True)
-    return results
\ No newline at end of file
+    return results
+
+
+# ---------- RESCORING ----------
+
+# (document id, lat, lon) of every saved prediction with coordinates
+def _saved_sites(db):
+    docs = db.collection(PREDICTED_COLLECTION).select(["latitude", "Longitude"]).stream()
+
+    sites = []
+    for d in docs:
+        data = d.to_dict() or {}
+        lat = _to_float_or_none(data.get("latitude"))
+        lng = _to_float_or_none(data.get("Longitude"))
+        if lat is not None and lng is not None:
+            sites.append((d.id, lat, lng))
+    return sites
+
+
+# score every saved prediction site again for today and store the new risk level next to the saved one
+def rescore_saved_predictions(now=None):
+    from FirePrediction import GRID_RISK_HOUR_UTC, predict_fire_risk_many
+    from weather_utils import snap
+
+    now = now or datetime.now(timezone.utc)
+    # same hour as the daily risk grid (fire weather peak)
+    when_iso = now.replace(hour=GRID_RISK_HOUR_UTC, minute=0, second=0, microsecond=0).isoformat()
+
+    db = FirebaseConnection.get_db()
+    sites = _saved_sites(db)
+
+    # sites in the same ~1 km grid cell share one score
+    cells = {}
+    for doc_id, lat, lng in sites:
+        cells.setdefault(snap(lat, lng), []).append(doc_id)
+    points = list(cells)
+
+    levels = {}
+    for start in range(0, len(points), RESCORE_CHUNK):
+        chunk = points[start:start + RESCORE_CHUNK]
+        try:
+            results = predict_fire_risk_many(chunk, when_iso)
+        except Exception as e:
+            # the other chunks are still scored, these sites keep their last level
+            print(f">>> ERROR re-scoring {len(chunk)} prediction cells: {e}")
+            continue
+        for point, result in zip(chunk, results):
+            if result.get("ok"):
+                levels[point] = result["risk_level"]
+
+    # batched writes, only the two re-scoring fields change
+    updated = 0
+    batch = db.batch()
+    pending = 0
+    for point, risk_level in levels.items():
+        for doc_id in cells[point]:
+            batch.update(db.collection(PREDICTED_COLLECTION).document(doc_id), {
+                "current_risk_level": risk_level,
+                "rescored_at": now
+            })
+            pending += 1
+            if pending == FIRESTORE_BATCH_SIZE:
+                batch.commit()
+                updated += pending
+                batch = db.batch()
+                pending = 0
+    if pending:
+        batch.commit()
+        updated += pending
+
+    print(f"Saved predictions re-scored: {len(sites)} sites, {len(points)} cells, {updated} updated")
+    return {"sites": len(sites), "cells": len(points), "updated": updated}
+
+
+# daily background re-scoring of the saved prediction sites
+def start_prediction_rescoring():
+    from scheduler_utils import run_daily
+    # not at startup, every restart would score all the sites again
+    return run_daily("prediction-rescoring", rescore_saved_predictions, hour_utc=RESCORE_HOUR_UTC, run_now=False)
@@ -1,7 +1,9 @@
-from flask import Blueprint, request, jsonify # Blueprint, reguest for input data, jsonify for response
+from flask import Blueprint, request, jsonify, g # Blueprint, reguest for input data, jsonify for response
 import ee # google earth engine
 import traceback
 from auth_utils import login_required
+from job_utils import register_job_handler, submit_job_response, wants_async
+from Singleton.saudi_boundary import SaudiBoundary, box_around
 
 fire_area_bp = Blueprint("fire_area", __name__) # Blueprint for burned area route
 
@@ -157,16 +159,25 @@ def _best_cluster(clusters_fc, point):
         .first()
     )
 
-def _clip(geom, aoi):
-    # Clip the final geometry to the search area and Saudi land boundary
-    return (
-        geom.intersection(aoi, maxError= 1)
-        .intersection(_saudi_land(), maxError= 1)
-    )
+def _needs_saudi_clip(lat, lon):
+    # The Saudi clip is only needed when the search area may cross the border
+    boundary = SaudiBoundary.get_instance()
+    if boundary is None:
+        return True
+    return not boundary.contains_box(*box_around(lat, lon, SEARCH_RADIUS_M))
+
+def _clip(geom, aoi, clip_to_saudi=True):
+    # Clip the final geometry to the search area
+    clipped = geom.intersection(aoi, maxError= 1)
+
+    # and to the Saudi land boundary when the search area is not fully inside it
+    if clip_to_saudi:
+        clipped = clipped.intersection(_saudi_land(), maxError= 1)
+    return clipped
  
 # ---------------------------- CORE LOGIC ----------------------------
 
-def _build_area_geometry(pixel_fc, cluster_geom, n_pixels_in_cluster, aoi):
+def _build_area_geometry(pixel_fc, cluster_geom, n_pixels_in_cluster, aoi, clip_to_saudi=True):
     # Keep only the pixel polygons that belong to the selected cluster
     selected_pixels= pixel_fc.filterBounds(cluster_geom)
     has_pixels= int(selected_pixels.size().getInfo() or 0)
@@ -177,12 +188,12 @@ def _build_area_geometry(pixel_fc, cluster_geom, n_pixels_in_cluster, aoi):
 
     # If the cluster is large enough, build an outer perimeter around it
     if n_pixels_in_cluster >= 3:
-        geom = _clip(cluster_geom.convexHull(maxError= 1), aoi)
+        geom = _clip(cluster_geom.convexHull(maxError= 1), aoi, clip_to_saudi)
         method = "convex_hull_perimeter"
 
     # If the cluster is very small, keep the actual hotspot footprints only
     else:
-        geom = _clip(selected_pixels.geometry().dissolve(maxError= 1), aoi)
+        geom = _clip(selected_pixels.geometry().dissolve(maxError= 1), aoi, clip_to_saudi)
         method = "hotspot_footprint_only"
 
     return geom, method
@@ -205,104 +216,116 @@ def _success(geom, n_pixels, method):
         "datasets": ALL_LABELS,
     }
 
-# ---------------------------- ROUTE ----------------------------
+# ---------------------------- BURNED AREA ----------------------------
 
-@fire_area_bp.route("/fire-burned-area", methods=["POST"])
-@login_required
-def estimate_fire_burned_area():
-    try:
-        # Read request data from frontend
-        body = request.get_json(silent=True) or {}
-        lat = body.get("lat")
-        lon = body.get("lon")
-        when_iso = body.get("datetime")
+def compute_burned_area(lat, lon, when_iso):
+    point = ee.Geometry.Point([lon, lat]) # Create the selected point
+    aoi = point.buffer(SEARCH_RADIUS_M) # Create the search area around the selected point
+    clip_to_saudi = _needs_saudi_clip(lat, lon) # Skip the Saudi clip when the search area is fully inside
 
-        # Make sure all required values exist
-        if lat is None or lon is None or not when_iso:
-            return jsonify({"ok": False, "error": "Missing lat/lon/datetime"}), 400
+    # Build one final fire mask from all available fire datasets
+    fire_mask = _combined_fire_mask(aoi, when_iso)
 
-        lat, lon = float(lat), float(lon) # Convert coordinates to float
+    # Count all detected fire pixels inside the search area
+    n_pixels = _count_pixels(fire_mask, aoi)
 
-        point = ee.Geometry.Point([lon, lat]) # Create the selected point
-        aoi = point.buffer(SEARCH_RADIUS_M) # Create the search area around the selected point
+    # If no satellite pixels are found, return a small minimum estimate
+    if n_pixels == 0:
+        print("BURNED AREA: 0 satellite pixels → using minimum circular estimate")
 
-        # Build one final fire mask from all available fire datasets
-        fire_mask = _combined_fire_mask(aoi, when_iso)
+        min_geom = _clip(point.buffer(PIXEL_SCALE_M / 2), aoi, clip_to_saudi) # Use a small circle around the selected point as a fallback geometry
 
-        # Count all detected fire pixels inside the search area
-        n_pixels = _count_pixels(fire_mask, aoi)
+        return {
+            "ok": True,
+            "burned_area_km2": round((ee.Number(min_geom.area(maxError=1)).getInfo() or 0) / 1e6, 4),
+            "total_hotspot_count": 0,
+            "burned_area_geojson": min_geom.getInfo(),
+            "method": "minimum_estimate_no_satellite_pixels",
+            "time_window_hours": WINDOW_HOURS,
+            "search_radius_m": SEARCH_RADIUS_M,
+            "aggregation_distance_m": AGGREGATION_DISTANCE_M,
+            "datasets": ALL_LABELS,
+        }
 
-        # If no satellite pixels are found, return a small minimum estimate
-        if n_pixels == 0:
-            print("BURNED AREA: 0 satellite pixels → using minimum circular estimate")
+    # Convert the fire mask into fire pixel polygons
+    pixel_fc= _to_polygons(fire_mask, aoi)
 
-            min_geom = _clip(point.buffer(PIXEL_SCALE_M / 2), aoi) # Use a small circle around the selected point as a fallback geometry
+    # Group nearby fire pixels into clusters
+    clusters= _make_clusters(fire_mask, aoi)
+    n_clusters= int(clusters.size().getInfo() or 0)
 
-            return jsonify({
-                "ok": True,
-                "burned_area_km2": round((ee.Number(min_geom.area(maxError=1)).getInfo() or 0) / 1e6, 4),
-                "total_hotspot_count": 0,
-                "burned_area_geojson": min_geom.getInfo(),
-                "method": "minimum_estimate_no_satellite_pixels",
-                "time_window_hours": WINDOW_HOURS,
-                "search_radius_m": SEARCH_RADIUS_M,
-                "aggregation_distance_m": AGGREGATION_DISTANCE_M,
-                "datasets": ALL_LABELS,
-            }), 200
+    # If no cluster is formed, use all hotspot footprints as fallback
+    if n_clusters == 0:
+        geom= _clip(pixel_fc.geometry().dissolve(maxError=1), aoi, clip_to_saudi)
+        method= "hotspot_footprint_only"
 
-        # Convert the fire mask into fire pixel polygons
-        pixel_fc= _to_polygons(fire_mask, aoi)
+        print(f"BURNED AREA: no cluster formed → fallback {method}")
+        return _success(geom, n_pixels, method)
 
-        # Group nearby fire pixels into clusters
-        clusters= _make_clusters(fire_mask, aoi)
-        n_clusters= int(clusters.size().getInfo() or 0)
+    # Choose the best cluster for the selected point
+    cluster= _best_cluster(clusters, point)
+    cluster_geom= cluster.geometry()
 
-        # If no cluster is formed, use all hotspot footprints as fallback
-        if n_clusters == 0:
-            geom= _clip(pixel_fc.geometry().dissolve(maxError=1), aoi)
-            method= "hotspot_footprint_only"
+    # Count how many fire pixels exist inside the selected cluster
+    cluster_mask= fire_mask.clip(cluster_geom)
+    n_cluster_pixels= _count_pixels(cluster_mask, cluster_geom)
 
-            print(f"BURNED AREA: no cluster formed → fallback {method}")
-            return jsonify(_success(geom, n_pixels, method)), 200
+    # If the selected cluster has no pixels, use all pixels as fallback
+    if n_cluster_pixels == 0:
+        geom= _clip(pixel_fc.geometry().dissolve(maxError=1), aoi, clip_to_saudi)
+        method= "hotspot_footprint_only"
 
-        # Choose the best cluster for the selected point
-        cluster= _best_cluster(clusters, point)
-        cluster_geom= cluster.geometry()
+        print("BURNED AREA: cluster pixel count = 0 → fallback")
+        return _success(geom, n_pixels, method)
 
-        # Count how many fire pixels exist inside the selected cluster
-        cluster_mask= fire_mask.clip(cluster_geom)
-        n_cluster_pixels= _count_pixels(cluster_mask, cluster_geom)
+    # Build the final burned area geometry for the selected cluster
+    geom, method= _build_area_geometry(
+        pixel_fc, cluster_geom, n_cluster_pixels, aoi, clip_to_saudi
+    )
 
-        # If the selected cluster has no pixels, use all pixels as fallback
-        if n_cluster_pixels == 0:
-            geom= _clip(pixel_fc.geometry().dissolve(maxError=1), aoi)
-            method= "hotspot_footprint_only"
+    # If no geometry is returned, fallback to all pixel footprints
+    if geom is None:
+        geom = _clip(pixel_fc.geometry().dissolve(maxError=1), aoi, clip_to_saudi)
+        method = "hotspot_footprint_only"
 
-            print("BURNED AREA: cluster pixel count = 0 → fallback")
-            return jsonify(_success(geom, n_pixels, method)), 200
+        print("BURNED AREA: no vector pixels in cluster → fallback")
 
-        # Build the final burned area geometry for the selected cluster
-        geom, method= _build_area_geometry(
-            pixel_fc, cluster_geom, n_cluster_pixels, aoi
-        )
+    # Print debug information
+    print("BURNED AREA DEBUG:", {
+        "method": method,
+        "satellite_pixels_total": n_pixels,
+        "satellite_pixels_cluster": n_cluster_pixels,
+    })
+
+    return _success(geom, n_pixels, method) # Return the final burned area result
 
-        # If no geometry is returned, fallback to all pixel footprints
-        if geom is None:
-            geom = _clip(pixel_fc.geometry().dissolve(maxError=1), aoi)
-            method = "hotspot_footprint_only"
+# ---------------------------- ROUTE ----------------------------
 
-            print("BURNED AREA: no vector pixels in cluster → fallback")
+register_job_handler("fire-burned-area", compute_burned_area)
+
+@fire_area_bp.route("/fire-burned-area", methods=["POST"])
+@login_required
+def estimate_fire_burned_area():
+    try:
+        # Read request data from frontend
+        body = request.get_json(silent=True) or {}
+        lat = body.get("lat")
+        lon = body.get("lon")
+        when_iso = body.get("datetime")
+
+        # Make sure all required values exist
+        if lat is None or lon is None or not when_iso:
+            return jsonify({"ok": False, "error": "Missing lat/lon/datetime"}), 400
+
+        lat, lon = float(lat), float(lon) # Convert coordinates to float
 
-        # Print debug information
-        print("BURNED AREA DEBUG:", {
-            "method": method,
-            "satellite_pixels_total": n_pixels,
-            "satellite_pixels_cluster": n_cluster_pixels,
-        })
+        # Async mode: answer with a job id and run the estimate in the worker pool
+        if wants_async(body, request.args):
+            return submit_job_response("fire-burned-area", g.user_uid, {"lat": lat, "lon": lon, "when_iso": when_iso})
 
-        return jsonify(_success(geom, n_pixels, method)), 200 # Return the final burned area result
+        return jsonify(compute_burned_area(lat, lon, when_iso)), 200
 
     except Exception as e:
         print("=== BURNED AREA ERROR ===")
         traceback.print_exc()
-        return jsonify({"ok": False, "error": str(e)}), 500
\ No newline at end of file
+        return jsonify({"ok": False, "error": str(e)}), 500
@@ -1,9 +1,14 @@
 from flask import Blueprint, request, jsonify, g
-from datetime import datetime, timezone
+from datetime import datetime, timedelta, timezone
 import ee
 import traceback
 from auth_utils import login_required
+from Singleton.saudi_boundary import SaudiBoundary, box_around
+from Singleton.fire_archive import FireArchive, days_in_window
+from cache_utils import TTLCache
+from job_utils import register_job_handler, submit_job_response, wants_async, wants_enrichment
 import math
+import zlib
 
 fire_detection_bp = Blueprint("fire_detection", __name__) # blueprint for the fire detection routes
 
@@ -19,12 +24,49 @@ class OutsideSaudiError(Exception):
 STRICT_BUFFER_M = 500      # around clicked point
 REGION_BUFFER_M = 1500     # wider nearby region to 3 km x 3 km
 
+# largest number of points accepted by the batch detection endpoint
+MAX_BATCH_POINTS = 100
+
 # use 48 hours because active-fire products are daily products
 WINDOW_HOURS = 48
 
 # check persistence in the previous 7 days
 PERSISTENCE_DAYS = 7
 
+# read the persistence window from the local daily fire archive when it has every day
+FIRE_ARCHIVE_ENABLED = True
+
+# read the fire products first and run the enrichment stages only when a sensor fired
+# (with no active source the decision is "no fire" whatever NDVI / LULC / persistence / weather say)
+LAZY_ENRICHMENT = True
+
+# response fields that come from the enrichment stages
+ENRICHMENT_FIELDS = [
+    "temperature",
+    "humidity",
+    "ndvi_mean",
+    "ndvi_rule",
+    "lulc_class",
+    "lulc_name",
+    "lulc_burnable",
+    "special_lulc",
+    "land_type_group",
+    "previous_fire_observations",
+    "persistence_confirmed"
+]
+
+# build the whole AOI analysis as one server-side dictionary and fetch it with one evaluation,
+# set to False to run every stage with its own getInfo call
+SINGLE_EVALUATION = True
+
+# answer the strict box and the nearby region from one grouped reduction over the region,
+# set to False to analyze the region again only when the strict box has no fire
+ZONED_REDUCTION = True
+
+# zone band values: outer ring of the region / strict box around the clicked point
+REGION_ZONE = 0
+STRICT_ZONE = 1
+
 # confidence of the firemask
 FIREMASK_THRESHOLD = 7
 
@@ -56,6 +98,14 @@ PRODUCTS = [
     }
 ]
 
+# cache of detection results, clicks in the same ~1 km cell and hour share one answer
+DETECTION_CACHE_ENABLED = True
+DETECTION_CACHE_CELL_DEG = 0.01 # grid cell size, close to the 1 km product resolution
+DETECTION_CACHE_BUCKET_HOURS = 1 # request times are grouped into 1 hour buckets
+DETECTION_CACHE_MAX_ENTRIES = 2048
+DETECTION_CACHE_TTL_S = 24 * 3600 # past windows, their products will not change
+DETECTION_CACHE_NOW_TTL_S = 15 * 60 # windows that reach the current time, new granules can still arrive
+
 # names for MCD12Q1 LC_Type1 classes
 LULC_NAMES = {
     1: "Evergreen Needleleaf Forest",
@@ -93,7 +143,14 @@ def _get_saudi_geometry():
 
 
 def _ensure_inside_saudi(lat: float, lon: float):
-    # check if the selected point is inside Saudi Arabia
+    # check the point in-process with the local boundary index when its snapshot exists
+    boundary = SaudiBoundary.get_instance()
+    if boundary is not None:
+        if not boundary.contains(lat, lon):
+            raise OutsideSaudiError("Selected location is outside Saudi Arabia")
+        return
+
+    # otherwise check if the selected point is inside Saudi Arabia on Earth Engine
     saudi_geom = _get_saudi_geometry()
 
     # build the selected poin
@@ -106,6 +163,22 @@ def _ensure_inside_saudi(lat: float, lon: float):
         raise OutsideSaudiError("Selected location is outside Saudi Arabia")
 
 
+def _inside_saudi_many(points):
+    # one bool per (lat, lon): the local boundary index when its snapshot exists,
+    # otherwise every point checked in one Earth Engine evaluation
+    boundary = SaudiBoundary.get_instance()
+    if boundary is not None:
+        return [boundary.contains(lat, lon) for lat, lon in points]
+    if not points:
+        return []
+
+    saudi_geom = _get_saudi_geometry()
+    inside = ee.List([[lon, lat] for lat, lon in points]).map(
+        lambda coords: saudi_geom.contains(ee.Geometry.Point(coords), ee.ErrorMargin(1))
+    ).getInfo()
+    return [bool(value) for value in inside]
+
+
 def _coerce_utc_datetime(value):
     # if there is a valid value then convert it to UTC datetime
     if value:
@@ -138,10 +211,7 @@ def _safe_float(value, default=None):
     except Exception:
         return default
 
-def _get_gfs_weather(aoi, when_iso):
-    print(">>> _get_gfs_weather CALLED")
-    print(">>> when_iso:", when_iso)
-
+def _era5_weather_values(aoi, when_iso):
     when_dt = _coerce_utc_datetime(when_iso)
     when = ee.Date(when_dt.isoformat())
     # Use a larger area for weather because ERA5-Land is coarse resolution
@@ -153,20 +223,12 @@ def _get_gfs_weather(aoi, when_iso):
         .filterBounds(weather_region)
         .select(["temperature_2m", "dewpoint_temperature_2m"])
     )
-    era_size = era.size().getInfo()
-    print(">>> ERA size:", era_size)
-
-    if era_size == 0:
-        print(">>> No ERA5 weather image found for this time/location")
-        return {
-            "temperature": None,
-            "humidity": None
-        }
 
     def add_time_diff(img):
         diff = ee.Number(img.get("system:time_start")).subtract(when.millis()).abs()
         return img.set("time_diff", diff)
 
+    # take the ERA5 image closest to the request time
     img = ee.Image(
             era.map(add_time_diff).sort("time_diff").first()
         )
@@ -177,8 +239,16 @@ def _get_gfs_weather(aoi, when_iso):
         scale=9000,
         bestEffort=True,
         maxPixels=1e9
-    ).getInfo() or {}
+    )
 
+    # server-side dictionary, empty when no ERA5 image was found
+    return ee.Dictionary(
+        ee.Algorithms.If(era.size().gt(0), vals, ee.Dictionary({}))
+    )
+
+
+def _weather_from_era5_values(vals):
+    vals = vals or {}
     print(">>> WEATHER VALUES:", vals)
 
     # ERA5 temperature values are in Kelvin
@@ -212,6 +282,14 @@ def _get_gfs_weather(aoi, when_iso):
     }
 
 
+def _get_gfs_weather(aoi, when_iso):
+    print(">>> _get_gfs_weather CALLED")
+    print(">>> when_iso:", when_iso)
+
+    vals = _era5_weather_values(aoi, when_iso).getInfo() or {}
+    return _weather_from_era5_values(vals)
+
+
 def _to_iso_from_millis(value_ms, fallback_iso=None):
     try:
         if value_ms is None:
@@ -237,11 +315,9 @@ def _fallback_fire_image(end_dt):
     )
 
 
-def _summarize_fire_product(aoi, start_dt, end_dt, product):
+def _fire_product_images(aoi, start_dt, end_dt, product):
     # read product settings
-    label = product["label"]
     dataset_id = product["dataset_id"]
-    scale_m = product["scale_m"]
 
     # load the fire image collection for the selected dataset in the time
     collection = (
@@ -272,79 +348,67 @@ def _summarize_fire_product(aoi, start_dt, end_dt, product):
         )
     )
 
+    return collection_count, merged_img, latest_img
+
+
+def _fire_stats_image(merged_img):
     # pixels with FireMask >= threshold are considered fire pixels
-    fire_mask = merged_img.select("FireMask").gte(FIREMASK_THRESHOLD)
+    firemask = merged_img.select("FireMask").unmask(0)
+    fire = firemask.gte(FIREMASK_THRESHOLD)
 
-    # count fire pixels in AOI
-    fire_pixels = _safe_number(
-        fire_mask.unmask(0).reduceRegion(
-            reducer=ee.Reducer.sum(),
-            geometry=aoi,
-            scale=scale_m,
-            bestEffort=True,
-            maxPixels=1e9
-        ).get("FireMask"),
-        0
+    # non-fire pixels are set to 0 so a max over all pixels equals a max over fire pixels
+    return (
+        fire.rename("fire")
+        .addBands(firemask.multiply(fire).rename("firemask_fire"))
+        .addBands(firemask.rename("firemask_any"))
+        .addBands(merged_img.select("MaxFRP").unmask(0).multiply(fire).rename("frp_fire"))
     )
 
-    # maximum FireMask class among pixels that passed threshold
-    max_firemask_class = _safe_number(
-        merged_img.select("FireMask").updateMask(fire_mask).reduceRegion(
-            reducer=ee.Reducer.max(),
-            geometry=aoi,
-            scale=scale_m,
-            bestEffort=True,
-            maxPixels=1e9
-        ).get("FireMask"),
-        0
-    )
 
-    # maximum FireMask regardless of threshold (for debugging)
-    max_any_firemask = _safe_number(
-        merged_img.select("FireMask").reduceRegion(
-            reducer=ee.Reducer.max(),
-            geometry=aoi,
-            scale=scale_m,
-            bestEffort=True,
-            maxPixels=1e9
-        ).get("FireMask"),
-        0
-    )
+def _fire_stats_reducer():
+    # fire pixel sum on the first band, max of the next three bands
+    return ee.Reducer.sum().combine(ee.Reducer.max().repeat(3), sharedInputs=False)
 
-    # maximum FRP among fire pixels
-    frp_max = _safe_number(
-        merged_img.select("MaxFRP").updateMask(fire_mask).reduceRegion(
-            reducer=ee.Reducer.max(),
-            geometry=aoi,
-            scale=scale_m,
-            bestEffort=True,
-            maxPixels=1e9
-        ).get("MaxFRP"),
-        0
+
+def _fire_product_summary(aoi, start_dt, end_dt, product):
+    scale_m = product["scale_m"]
+    collection_count, merged_img, latest_img = _fire_product_images(aoi, start_dt, end_dt, product)
+
+    # fire pixel sum, max class over threshold, max class overall and max FRP in one pass over the pixels
+    stats = _fire_stats_image(merged_img).reduceRegion(
+        reducer=_fire_stats_reducer(),
+        geometry=aoi,
+        scale=scale_m,
+        bestEffort=True,
+        maxPixels=1e9
     )
 
-    # build one summary dictionary
-    summary = ee.Dictionary({
+    # build one server-side summary dictionary, null values are handled when it is parsed
+    return ee.Dictionary({
         "collection_count": collection_count,
-        "fire_pixels": fire_pixels,
-        "max_firemask_class": max_firemask_class,
-        "max_any_firemask": max_any_firemask,
-        "frp_max": frp_max,
+        "stats": stats,
         "dataset_time_ms": latest_img.get("system:time_start")
-    }).getInfo()
+    })
+
+
+def _parse_fire_product_summary(summary, product):
+    summary = summary or {}
+    # fire pixel sum and the [max class over threshold, max class overall, max FRP] list
+    stats = summary.get("stats") or {}
+    maxima = list(stats.get("max") or []) + [0, 0, 0]
 
     # convert returned values into normal Python types
-    fire_pixels_value = int(float(summary.get("fire_pixels") or 0))
-    fire_class_value = int(float(summary.get("max_firemask_class") or 0))
-    max_any_firemask_value = int(float(summary.get("max_any_firemask") or 0))
-    frp_value = float(summary.get("frp_max") or 0.0)
+    fire_pixels_value = int(float(stats.get("sum") or 0))
+    fire_class_value = int(float(maxima[0] or 0))
+    max_any_firemask_value = int(float(maxima[1] or 0))
+    frp_value = float(maxima[2] or 0.0)
     # if at least one real source image existed in the collection
     has_source_image = int(float(summary.get("collection_count") or 0)) > 0
 
     # return the final summarized fire result for this product
     return {
-        "source_name": label,
-        "dataset_id": dataset_id,
+        "source_name": product["label"],
+        "dataset_id": product["dataset_id"],
         "has_source_image": has_source_image,
         "is_detected": fire_pixels_value > 0,
         "fire_pixels": fire_pixels_value,
@@ -354,7 +418,156 @@ def _summarize_fire_product(aoi, start_dt, end_dt, product):
         "dataset_time": _to_iso_from_millis(summary.get("dataset_time_ms"))
     }
 
-def _get_ndvi_mean(aoi, end_dt):
+def _summarize_fire_product(aoi, start_dt, end_dt, product):
+    summary = _fire_product_summary(aoi, start_dt, end_dt, product).getInfo()
+    return _parse_fire_product_summary(summary, product)
+
+# -----------------------------
+# ZONED HELPERS (strict box + outer ring of the region in one reduction)
+# -----------------------------
+
+def _zone_image(strict_aoi):
+    # zone band: 1 inside the strict box, 0 in the outer ring of the region
+    return (
+        ee.Image.constant(0)
+        .paint(ee.FeatureCollection([ee.Feature(strict_aoi)]), STRICT_ZONE)
+        .rename("zone")
+    )
+
+
+def _zoned_fire_product_summary(region_aoi, zone_img, start_dt, end_dt, product):
+    collection_count, merged_img, latest_img = _fire_product_images(region_aoi, start_dt, end_dt, product)
+
+    # fire statistics for every zone in one grouped reduction
+    groups = _fire_stats_image(merged_img).addBands(zone_img).reduceRegion(
+        reducer=_fire_stats_reducer().group(groupField=4, groupName="zone"),
+        geometry=region_aoi,
+        scale=product["scale_m"],
+        bestEffort=True,
+        maxPixels=1e9
+    ).get("groups")
+
+    return ee.Dictionary({
+        "collection_count": collection_count,
+        "groups": groups,
+        "dataset_time_ms": latest_img.get("system:time_start")
+    })
+
+
+def _zoned_ndvi_groups(region_aoi, zone_img, end_dt):
+    start_dt = end_dt.advance(-32, "day")
+
+    ndvi_collection = (
+        ee.ImageCollection("MODIS/061/MOD13A1")
+        .filterDate(start_dt, end_dt)
+        .filterBounds(region_aoi)
+    )
+
+    # use the latest NDVI image if available, otherwise NDVI = 0
+    latest_ndvi = ee.Image(
+        ee.Algorithms.If(
+            ndvi_collection.size().gt(0),
+            ndvi_collection.sort("system:time_start", False).first(),
+            ee.Image.constant(0).rename("NDVI")
+        )
+    )
+
+    # mean and pixel count per zone so the region mean can be rebuilt from both zones
+    return latest_ndvi.select("NDVI").addBands(zone_img).reduceRegion(
+        reducer=ee.Reducer.mean().combine(ee.Reducer.count(), sharedInputs=True).group(groupField=1, groupName="zone"),
+        geometry=region_aoi,
+        scale=500,
+        bestEffort=True,
+        maxPixels=1e9
+    ).get("groups")
+
+
+def _zoned_lulc_groups(region_aoi, zone_img, ref_year):
+    lc_all = ee.ImageCollection("MODIS/061/MCD12Q1")
+    lc_year = lc_all.filterDate(ee.Date.fromYMD(ref_year, 1, 1), ee.Date.fromYMD(ref_year + 1, 1, 1))
+
+    fallback_lc = ee.Image(
+        ee.Algorithms.If(
+            lc_all.size().gt(0),
+            lc_all.sort("system:time_start", False).first(),
+            ee.Image.constant(0).rename("LC_Type1")
+        )
+    )
+
+    lc_img = ee.Image(
+        ee.Algorithms.If(
+            lc_year.size().gt(0),
+            lc_year.first(),
+            fallback_lc
+        )
+    )
+
+    # class histogram per zone, the dominant class of any zone set is taken from the summed histograms
+    return lc_img.select("LC_Type1").addBands(zone_img).reduceRegion(
+        reducer=ee.Reducer.frequencyHistogram().group(groupField=1, groupName="zone"),
+        geometry=region_aoi,
+        scale=500,
+        bestEffort=True,
+        maxPixels=1e9
+    ).get("groups")
+
+
+def _groups_in_zones(groups, zones):
+    # keep only the grouped records that belong to the requested zones
+    return [grp for grp in (groups or []) if int(float(grp.get("zone", -1))) in zones]
+
+
+def _merge_fire_records(records):
+    # sum the fire pixels and take the largest max values over several statistics records
+    fire_pixels = 0
+    maxima = [0, 0, 0]
+
+    for record in records:
+        fire_pixels += float(record.get("sum") or 0)
+        for i, value in enumerate((record.get("max") or [])[:3]):
+            maxima[i] = max(maxima[i], float(value or 0))
+
+    return {"sum": fire_pixels, "max": maxima}
+
+
+def _merge_fire_zones(summary, zones):
+    # rebuild a normal product summary from the grouped records of the requested zones
+    summary = summary or {}
+    return {
+        "collection_count": summary.get("collection_count"),
+        "stats": _merge_fire_records(_groups_in_zones(summary.get("groups"), zones)),
+        "dataset_time_ms": summary.get("dataset_time_ms")
+    }
+
+
+def _merge_ndvi_zones(groups, zones):
+    # pixel-weighted mean of the zone means
+    total = 0.0
+    count = 0.0
+    for grp in _groups_in_zones(groups, zones):
+        n = float(grp.get("count") or 0)
+        if n > 0 and grp.get("mean") is not None:
+            total += float(grp["mean"]) * n
+            count += n
+
+    return _parse_ndvi_mean(total / count if count else 0)
+
+
+def _merge_lulc_zones(groups, zones):
+    # sum the class histograms of the zones and take the dominant class
+    histogram = {}
+    for grp in _groups_in_zones(groups, zones):
+        for lc_class, n in (grp.get("histogram") or {}).items():
+            lc_class = int(float(lc_class))
+            histogram[lc_class] = histogram.get(lc_class, 0) + float(n or 0)
+
+    if not histogram:
+        return 0
+
+    # ties go to the smallest class value
+    return max(sorted(histogram), key=lambda lc_class: histogram[lc_class])
+
+def _ndvi_mean_raw(aoi, end_dt):
     # start the search 32 days before the given end date
     start_dt = end_dt.advance(-32, "day")
 
@@ -378,7 +591,7 @@ def _get_ndvi_mean(aoi, end_dt):
     )
 
     # calculate the mean value
-    ndvi_mean_raw = _safe_number(
+    return _safe_number(
         latest_ndvi.select("NDVI").reduceRegion(
             reducer=ee.Reducer.mean(),
             geometry=aoi,
@@ -387,14 +600,21 @@ def _get_ndvi_mean(aoi, end_dt):
             maxPixels=1e9
         ).get("NDVI"),
         0
-    ).getInfo()
+    )
 
+
+def _parse_ndvi_mean(ndvi_mean_raw):
     # MODIS NDVI is scaled by 10000
-    ndvi_mean = float(ndvi_mean_raw) * 0.0001
+    ndvi_mean = float(ndvi_mean_raw or 0) * 0.0001
     return round(ndvi_mean, 3)
 
 
-def _get_lulc_class(aoi, ref_year):
+def _get_ndvi_mean(aoi, end_dt):
+    return _parse_ndvi_mean(_ndvi_mean_raw(aoi, end_dt).getInfo())
+
+
+
+def _lulc_class_raw(aoi, ref_year):
     # load image collection
     lc_all = ee.ImageCollection("MODIS/061/MCD12Q1")
 
@@ -423,7 +643,7 @@ def _get_lulc_class(aoi, ref_year):
     )
 
     # compute the dominant land-cover
-    lc_value = _safe_number(
+    return _safe_number(
         lc_img.select("LC_Type1").reduceRegion(
             reducer=ee.Reducer.mode(),
             geometry=aoi,
@@ -432,7 +652,11 @@ def _get_lulc_class(aoi, ref_year):
             maxPixels=1e9
         ).get("LC_Type1"),
         0
-    ).getInfo()
+    )
+
+
+def _get_lulc_class(aoi, ref_year):
+    lc_value = _lulc_class_raw(aoi, ref_year).getInfo()
 
     # convert the returned value into a normal Python integer
     lc_class = int(float(lc_value or 0))
@@ -468,10 +692,33 @@ def _get_ndvi_rule(ndvi_mean):
         return "weak_vegetation"
     return "very_low_vegetation"
 
-# count the number of the detected fire in the previous persistence window
-def _count_previous_fire_observations(aoi, ref_end_dt):
+# previous persistence window, it ends 2 days before the reference time
+def _previous_window(ref_end_dt):
     previous_start_dt = ref_end_dt.advance(-(PERSISTENCE_DAYS + 2), "day")
     previous_end_dt = ref_end_dt.advance(-2, "day")
+    return previous_start_dt, previous_end_dt
+
+# server-side summaries of every product in the previous persistence window
+def _previous_fire_summaries(aoi, ref_end_dt):
+    previous_start_dt, previous_end_dt = _previous_window(ref_end_dt)
+    return ee.Dictionary({
+        product["label"]: _fire_product_summary(aoi, previous_start_dt, previous_end_dt, product)
+        for product in PRODUCTS
+    })
+
+# count the products that detected fire in already fetched previous summaries
+def _count_detected_summaries(summaries):
+    summaries = summaries or {}
+    count = 0
+    for product in PRODUCTS:
+        result = _parse_fire_product_summary(summaries.get(product["label"]), product)
+        if result["is_detected"]:
+            count += 1
+    return count
+
+# count the number of the detected fire in the previous persistence window
+def _count_previous_fire_observations(aoi, ref_end_dt):
+    previous_start_dt, previous_end_dt = _previous_window(ref_end_dt)
 
     count = 0
     # check each fire product separately
@@ -481,6 +728,22 @@ def _count_previous_fire_observations(aoi, ref_end_dt):
             count += 1
     return count
 
+# count the previous fire observations from the local archive, None when the archive cannot answer
+def _archived_previous_observations(lat, lon, ref_dt, buffer_m):
+    if not FIRE_ARCHIVE_ENABLED:
+        return None
+
+    # same window as _previous_window, as the list of daily images inside it
+    days = days_in_window(
+        ref_dt - timedelta(days=PERSISTENCE_DAYS + 2),
+        ref_dt - timedelta(days=2)
+    )
+    return FireArchive.get_instance().count_detected(
+        [product["label"] for product in PRODUCTS],
+        days,
+        box_around(lat, lon, buffer_m)
+    )
+
 # pick the strongest source among active sources
 def _pick_primary_source(active_sources):
     if not active_sources:
@@ -540,41 +803,59 @@ def _final_decision(active_sources, lulc_burnable, special_lulc, persistence_con
 # CORE DETECTION FUNCTION
 # -----------------------------
 
-def _analyze_aoi(lat: float, lon: float, ref_dt, ref_iso, buffer_m):
-    # build analysis area around the selected point
-    aoi = _build_aoi(lat, lon, buffer_m)
-
+def _build_aoi_analysis(aoi, ref_dt, ref_iso, include_previous=True, include_sources=True, include_enrichment=True):
     # current detection time window
     end_dt = ee.Date(ref_iso)
     start_dt = end_dt.advance(-WINDOW_HOURS, "hour")
 
-    # step 1: read all fire products inside this AOI
-    sources = []
-    for product in PRODUCTS:
-        src_result = _summarize_fire_product(aoi, start_dt, end_dt, product)
-        sources.append(src_result)
+    # the AOI analysis as one server-side dictionary
+    analysis = {}
+
+    # fire products inside this AOI
+    if include_sources:
+        analysis["sources"] = ee.Dictionary({
+            product["label"]: _fire_product_summary(aoi, start_dt, end_dt, product)
+            for product in PRODUCTS
+        })
 
+    if include_enrichment:
+        # vegetation and land cover
+        analysis["ndvi_raw"] = _ndvi_mean_raw(aoi, end_dt)
+        analysis["lulc_raw"] = _lulc_class_raw(aoi, ref_dt.year)
+        # weather at the request time
+        analysis["weather"] = _era5_weather_values(aoi, ref_iso)
+
+        # fire products in the previous persistence window, unless the local archive answered it
+        if include_previous:
+            analysis["previous_sources"] = _previous_fire_summaries(aoi, end_dt)
+    return ee.Dictionary(analysis)
+
+
+def _assemble_aoi_result(aoi, buffer_m, ref_iso, sources, ndvi_mean, lulc_class, previous_fire_observations, weather,
+                         skipped_fields=()):
     # keep only products that detected fire
     active_sources = [src for src in sources if src["is_detected"]]
     sensor_agreement_count = len(active_sources)
     base_detected = sensor_agreement_count > 0
 
-    # step 2: vegetation condition using NDVI
-    ndvi_mean = _get_ndvi_mean(aoi, end_dt)
-    ndvi_rule = _get_ndvi_rule(ndvi_mean)
+    if skipped_fields:
+        # enrichment stages were not run, they cannot change a decision without active sources
+        ndvi_rule = lulc_name = lulc_burnable = special_lulc = land_type_group = persistence_confirmed = None
+        weather = {"temperature": None, "humidity": None}
+    else:
+        # vegetation condition using NDVI
+        ndvi_rule = _get_ndvi_rule(ndvi_mean)
 
-    # step 3: land cover condition
-    lulc_class = _get_lulc_class(aoi, ref_dt.year)
-    lulc_name = LULC_NAMES.get(lulc_class, "Unknown")
-    lulc_burnable = _is_burnable_lulc(lulc_class)
-    special_lulc = _is_special_lulc(lulc_class)
-    land_type_group = _get_land_type_group(lulc_class)
+        # land cover condition
+        lulc_name = LULC_NAMES.get(lulc_class, "Unknown")
+        lulc_burnable = _is_burnable_lulc(lulc_class)
+        special_lulc = _is_special_lulc(lulc_class)
+        land_type_group = _get_land_type_group(lulc_class)
 
-    # step 4: persistence check using previous days
-    previous_fire_observations = _count_previous_fire_observations(aoi, end_dt)
-    persistence_confirmed = previous_fire_observations > 0
+        # persistence check using previous days
+        persistence_confirmed = previous_fire_observations > 0
 
-    # step 5: final decision for this AOI
+    # final decision for this AOI
     is_detected, decision_reason = _final_decision(
         active_sources=active_sources,
         lulc_burnable=lulc_burnable,
@@ -601,8 +882,6 @@ def _analyze_aoi(lat: float, lon: float, ref_dt, ref_iso, buffer_m):
 
     # use request time itself as the fire time shown or saved by the system
     fire_datetime = ref_iso
-    # weather is taken at the same request time
-    weather = _get_gfs_weather(aoi, fire_datetime)
 
     return {
         "aoi": aoi,
@@ -635,132 +914,603 @@ def _analyze_aoi(lat: float, lon: float, ref_dt, ref_iso, buffer_m):
         "previous_fire_observations": previous_fire_observations,
         "persistence_confirmed": persistence_confirmed,
         # source summaries
-        "sources": sources
+        "sources": sources,
+        "skipped_fields": list(skipped_fields)
     }
 
-# Detect fire
-def detect_active_fire(lat: float, lon: float, when_iso=None):
-    # convert request time to UTC.
-    ref_dt = _coerce_utc_datetime(when_iso)
-    ref_iso = ref_dt.isoformat()
 
-    # step 1: strict area around clicked point
-    strict_result = _analyze_aoi(lat, lon, ref_dt, ref_iso, STRICT_BUFFER_M)
+def _skipped_aoi_result(aoi, buffer_m, ref_iso, sources):
+    # result from the fire products only, the enrichment fields are left empty
+    return _assemble_aoi_result(
+        aoi, buffer_m, ref_iso, sources, None, None, None, None, skipped_fields=ENRICHMENT_FIELDS
+    )
 
-    # if fire found in strict area, return it directly
-    if strict_result["is_detected"]:
-        return {
-            "ok": True,
-            "is_detected": True,
-            "detected_nearby": False,
-            "selected_point_has_fire": True,
-            "message": "Active fire detected at the selected area",
-            "decision_reason": strict_result["decision_reason"],
-            "lat": lat,
-            "lon": lon,
-            "detected_at": strict_result["detected_at"],
-            "dataset_time": strict_result["dataset_time"],
-            "fire_datetime": strict_result["fire_datetime"],
-            "temperature": strict_result["temperature"],
-            "humidity": strict_result["humidity"],
-            "analysis_radius_m": STRICT_BUFFER_M,
-            "region_radius_m": REGION_BUFFER_M,
-            "data_source": "VIIRS + MODIS with NDVI + LULC + Persistence filters",
-            "sensor_agreement_count": strict_result["sensor_agreement_count"],
-            "fused_confidence": strict_result["fused_confidence"],
-            "primary_source": strict_result["primary_source"],
-            "total_fire_pixels": strict_result["total_fire_pixels"],
-            "max_frp": strict_result["max_frp"],
-            "ndvi_mean": strict_result["ndvi_mean"],
-            "ndvi_rule": strict_result["ndvi_rule"],
-            "lulc_class": strict_result["lulc_class"],
-            "lulc_name": strict_result["lulc_name"],
-            "lulc_burnable": strict_result["lulc_burnable"],
-            "special_lulc": strict_result["special_lulc"],
-            "land_type_group": strict_result["land_type_group"],
-            "previous_fire_observations": strict_result["previous_fire_observations"],
-            "persistence_confirmed": strict_result["persistence_confirmed"],
-            "sources": strict_result["sources"]
-        }
 
-    # Step 2: wider nearby region
-    region_result = _analyze_aoi(lat, lon, ref_dt, ref_iso, REGION_BUFFER_M)
+def _can_skip_enrichment(sources, enrich):
+    # with no active source the decision is "no fire" whatever the enrichment stages return
+    return LAZY_ENRICHMENT and not enrich and not any(src["is_detected"] for src in sources)
 
-    # if fire is found only in the wider region, mark it as nearby
-    if region_result["is_detected"]:
-        return {
-            "ok": True,
-            "is_detected": True,
-            "detected_nearby": True,
-            "selected_point_has_fire": False,
-            "message": "Fire detected near the selected point in the surrounding region",
-            "decision_reason": region_result["decision_reason"],
-            "lat": lat,
-            "lon": lon,
-            "detected_at": region_result["detected_at"],
-            "dataset_time": region_result["dataset_time"],
-            "fire_datetime": region_result["fire_datetime"],
-            "temperature": region_result["temperature"],
-            "humidity": region_result["humidity"],
-            "analysis_radius_m": STRICT_BUFFER_M,
-            "region_radius_m": REGION_BUFFER_M,
-            "data_source": "VIIRS + MODIS with NDVI + LULC + Persistence filters",
-            "sensor_agreement_count": region_result["sensor_agreement_count"],
-            "fused_confidence": region_result["fused_confidence"],
-            "primary_source": region_result["primary_source"],
-            "total_fire_pixels": region_result["total_fire_pixels"],
-            "max_frp": region_result["max_frp"],
-            "ndvi_mean": region_result["ndvi_mean"],
-            "ndvi_rule": region_result["ndvi_rule"],
-            "lulc_class": region_result["lulc_class"],
-            "lulc_name": region_result["lulc_name"],
-            "lulc_burnable": region_result["lulc_burnable"],
-            "special_lulc": region_result["special_lulc"],
-            "land_type_group": region_result["land_type_group"],
-            "previous_fire_observations": region_result["previous_fire_observations"],
-            "persistence_confirmed": region_result["persistence_confirmed"],
-            "sources": region_result["sources"]
-        }
 
-    # no fire found in strict area or nearby region
+def _analyze_aoi_sequential(aoi, ref_dt, ref_iso, buffer_m, previous_fire_observations=None, enrich=False):
+    # current detection time window
+    end_dt = ee.Date(ref_iso)
+    start_dt = end_dt.advance(-WINDOW_HOURS, "hour")
+
+    # step 1: read all fire products inside this AOI
+    sources = []
+    for product in PRODUCTS:
+        src_result = _summarize_fire_product(aoi, start_dt, end_dt, product)
+        sources.append(src_result)
+
+    # no sensor fired: the next steps cannot change the answer
+    if _can_skip_enrichment(sources, enrich):
+        return _skipped_aoi_result(aoi, buffer_m, ref_iso, sources)
+
+    # step 2: vegetation condition using NDVI
+    ndvi_mean = _get_ndvi_mean(aoi, end_dt)
+
+    # step 3: land cover condition
+    lulc_class = _get_lulc_class(aoi, ref_dt.year)
+
+    # step 4: persistence check using previous days
+    if previous_fire_observations is None:
+        previous_fire_observations = _count_previous_fire_observations(aoi, end_dt)
+
+    # step 5: weather is taken at the same request time
+    weather = _get_gfs_weather(aoi, ref_iso)
+
+    return _assemble_aoi_result(
+        aoi, buffer_m, ref_iso, sources, ndvi_mean, lulc_class, previous_fire_observations, weather
+    )
+
+
+def _analyze_aoi(lat: float, lon: float, ref_dt, ref_iso, buffer_m, enrich=False):
+    # build analysis area around the selected point
+    aoi = _build_aoi(lat, lon, buffer_m)
+    archived_observations = _archived_previous_observations(lat, lon, ref_dt, buffer_m)
+    include_previous = archived_observations is None
+
+    if not SINGLE_EVALUATION:
+        return _analyze_aoi_sequential(aoi, ref_dt, ref_iso, buffer_m, archived_observations, enrich)
+
+    if LAZY_ENRICHMENT and not enrich:
+        # step 1: fire products only
+        values = _build_aoi_analysis(aoi, ref_dt, ref_iso, include_enrichment=False).getInfo() or {}
+        sources = _parse_source_values(values.get("sources"))
+        if _can_skip_enrichment(sources, enrich):
+            return _skipped_aoi_result(aoi, buffer_m, ref_iso, sources)
+
+        # step 2: a sensor fired, fetch the enrichment stages
+        values.update(
+            _build_aoi_analysis(aoi, ref_dt, ref_iso, include_previous, include_sources=False).getInfo() or {}
+        )
+    else:
+        # fetch every stage of the analysis with one evaluation
+        values = _build_aoi_analysis(aoi, ref_dt, ref_iso, include_previous).getInfo() or {}
+        sources = _parse_source_values(values.get("sources"))
+
+    # convert the returned values into the same Python values used by the decision rules
+    ndvi_mean = _parse_ndvi_mean(values.get("ndvi_raw"))
+    lulc_class = int(float(values.get("lulc_raw") or 0))
+    if archived_observations is None:
+        previous_fire_observations = _count_detected_summaries(values.get("previous_sources"))
+    else:
+        previous_fire_observations = archived_observations
+    weather = _weather_from_era5_values(values.get("weather"))
+
+    return _assemble_aoi_result(
+        aoi, buffer_m, ref_iso, sources, ndvi_mean, lulc_class, previous_fire_observations, weather
+    )
+
+# parse the fetched product summaries of one AOI
+def _parse_source_values(source_values):
+    source_values = source_values or {}
+    return [
+        _parse_fire_product_summary(source_values.get(product["label"]), product)
+        for product in PRODUCTS
+    ]
+
+
+def _build_zoned_analysis(strict_aoi, region_aoi, ref_dt, ref_iso, include_previous=True,
+                          include_sources=True, include_enrichment=True):
+    end_dt = ee.Date(ref_iso)
+    start_dt = end_dt.advance(-WINDOW_HOURS, "hour")
+    previous_start_dt, previous_end_dt = _previous_window(end_dt)
+    zone_img = _zone_image(strict_aoi)
+
+    # the strict and region analysis as one server-side dictionary of grouped reductions
+    analysis = {}
+
+    if include_sources:
+        analysis["sources"] = ee.Dictionary({
+            product["label"]: _zoned_fire_product_summary(region_aoi, zone_img, start_dt, end_dt, product)
+            for product in PRODUCTS
+        })
+
+    if include_enrichment:
+        analysis["ndvi_groups"] = _zoned_ndvi_groups(region_aoi, zone_img, end_dt)
+        analysis["lulc_groups"] = _zoned_lulc_groups(region_aoi, zone_img, ref_dt.year)
+        # both boxes share the same centroid, so the weather is the same for both answers
+        analysis["weather"] = _era5_weather_values(strict_aoi, ref_iso)
+
+        # previous persistence window, unless the local archive answered it
+        if include_previous:
+            analysis["previous_sources"] = ee.Dictionary({
+                product["label"]: _zoned_fire_product_summary(region_aoi, zone_img, previous_start_dt, previous_end_dt, product)
+                for product in PRODUCTS
+            })
+    return ee.Dictionary(analysis)
+
+
+def _zone_sources(values, zones):
+    source_values = values.get("sources") or {}
+    return [
+        _parse_fire_product_summary(_merge_fire_zones(source_values.get(product["label"]), zones), product)
+        for product in PRODUCTS
+    ]
+
+
+def _assemble_zone_result(values, zones, aoi, buffer_m, ref_iso, previous_fire_observations=None, enriched=True):
+    previous_values = values.get("previous_sources") or {}
+
+    sources = _zone_sources(values, zones)
+    if not enriched:
+        return _skipped_aoi_result(aoi, buffer_m, ref_iso, sources)
+
+    if previous_fire_observations is None:
+        previous_fire_observations = _count_detected_summaries({
+            product["label"]: _merge_fire_zones(previous_values.get(product["label"]), zones)
+            for product in PRODUCTS
+        })
+
+    return _assemble_aoi_result(
+        aoi,
+        buffer_m,
+        ref_iso,
+        sources,
+        _merge_ndvi_zones(values.get("ndvi_groups"), zones),
+        _merge_lulc_zones(values.get("lulc_groups"), zones),
+        previous_fire_observations,
+        _weather_from_era5_values(values.get("weather"))
+    )
+
+
+def _analyze_zones(lat: float, lon: float, ref_dt, ref_iso, enrich=False):
+    # strict box inside the wider region around the selected point
+    strict_aoi = _build_aoi(lat, lon, STRICT_BUFFER_M)
+    region_aoi = _build_aoi(lat, lon, REGION_BUFFER_M)
+
+    # persistence from the local archive when it covers the whole window
+    strict_previous = _archived_previous_observations(lat, lon, ref_dt, STRICT_BUFFER_M)
+    region_previous = _archived_previous_observations(lat, lon, ref_dt, REGION_BUFFER_M)
+    include_previous = strict_previous is None or region_previous is None
+
+    enriched = True
+    if LAZY_ENRICHMENT and not enrich:
+        # step 1: fire products of both zones only
+        values = _build_zoned_analysis(
+            strict_aoi, region_aoi, ref_dt, ref_iso, include_enrichment=False
+        ).getInfo() or {}
+
+        # the region includes the strict box, so no fire in the region means no fire anywhere
+        enriched = not _can_skip_enrichment(_zone_sources(values, (STRICT_ZONE, REGION_ZONE)), enrich)
+        if enriched:
+            # step 2: a sensor fired, fetch the enrichment stages of both zones
+            values.update(_build_zoned_analysis(
+                strict_aoi, region_aoi, ref_dt, ref_iso, include_previous, include_sources=False
+            ).getInfo() or {})
+    else:
+        # fetch both answers with one evaluation
+        values = _build_zoned_analysis(strict_aoi, region_aoi, ref_dt, ref_iso, include_previous).getInfo() or {}
+
+    strict_result = _assemble_zone_result(
+        values, (STRICT_ZONE,), strict_aoi, STRICT_BUFFER_M, ref_iso, strict_previous, enriched
+    )
+    region_result = _assemble_zone_result(
+        values, (STRICT_ZONE, REGION_ZONE), region_aoi, REGION_BUFFER_M, ref_iso, region_previous, enriched
+    )
+    return strict_result, region_result
+
+# build the detection response from the strict and (optional) region analysis
+def _detection_response(lat, lon, strict_result, region_result=None):
+    if strict_result["is_detected"]:
+        # fire found in strict area
+        result = strict_result
+        is_detected, detected_nearby, selected_point_has_fire = True, False, True
+        message = "Active fire detected at the selected area"
+    elif region_result is not None and region_result["is_detected"]:
+        # fire is found only in the wider region, mark it as nearby
+        result = region_result
+        is_detected, detected_nearby, selected_point_has_fire = True, True, False
+        message = "Fire detected near the selected point in the surrounding region"
+    else:
+        # no fire found in strict area or nearby region
+        result = strict_result
+        is_detected, detected_nearby, selected_point_has_fire = False, False, False
+        message = "No reliable active fire detected in the selected area or nearby region"
+
     return {
         "ok": True,
-        "is_detected": False,
-        "detected_nearby": False,
-        "selected_point_has_fire": False,
-        "message": "No reliable active fire detected in the selected area or nearby region",
-        "decision_reason": strict_result["decision_reason"],
+        "is_detected": is_detected,
+        "detected_nearby": detected_nearby,
+        "selected_point_has_fire": selected_point_has_fire,
+        "message": message,
+        "decision_reason": result["decision_reason"],
         "lat": lat,
         "lon": lon,
-        "detected_at": strict_result["detected_at"],
-        "dataset_time": strict_result["dataset_time"],
-        "fire_datetime": strict_result["fire_datetime"],
-        "temperature": strict_result["temperature"],
-        "humidity": strict_result["humidity"],
+        "detected_at": result["detected_at"],
+        "dataset_time": result["dataset_time"],
+        "fire_datetime": result["fire_datetime"],
+        "temperature": result["temperature"],
+        "humidity": result["humidity"],
         "analysis_radius_m": STRICT_BUFFER_M,
         "region_radius_m": REGION_BUFFER_M,
         "data_source": "VIIRS + MODIS with NDVI + LULC + Persistence filters",
-        "sensor_agreement_count": strict_result["sensor_agreement_count"],
-        "fused_confidence": strict_result["fused_confidence"],
-        "primary_source": strict_result["primary_source"],
-        "total_fire_pixels": strict_result["total_fire_pixels"],
-        "max_frp": strict_result["max_frp"],
-        "ndvi_mean": strict_result["ndvi_mean"],
-        "ndvi_rule": strict_result["ndvi_rule"],
-        "lulc_class": strict_result["lulc_class"],
-        "lulc_name": strict_result["lulc_name"],
-        "lulc_burnable": strict_result["lulc_burnable"],
-        "special_lulc": strict_result["special_lulc"],
-        "land_type_group": strict_result["land_type_group"],
-        "previous_fire_observations": strict_result["previous_fire_observations"],
-        "persistence_confirmed": strict_result["persistence_confirmed"],
-        "sources": strict_result["sources"]
+        "sensor_agreement_count": result["sensor_agreement_count"],
+        "fused_confidence": result["fused_confidence"],
+        "primary_source": result["primary_source"],
+        "total_fire_pixels": result["total_fire_pixels"],
+        "max_frp": result["max_frp"],
+        "ndvi_mean": result["ndvi_mean"],
+        "ndvi_rule": result["ndvi_rule"],
+        "lulc_class": result["lulc_class"],
+        "lulc_name": result["lulc_name"],
+        "lulc_burnable": result["lulc_burnable"],
+        "special_lulc": result["special_lulc"],
+        "land_type_group": result["land_type_group"],
+        "previous_fire_observations": result["previous_fire_observations"],
+        "persistence_confirmed": result["persistence_confirmed"],
+        "sources": result["sources"],
+        "skipped_fields": result.get("skipped_fields", [])
     }
 
+# Detect fire
+def detect_active_fire(lat: float, lon: float, when_iso=None, enrich=False):
+    # convert request time to UTC.
+    ref_dt = _coerce_utc_datetime(when_iso)
+    ref_iso = ref_dt.isoformat()
+
+    if ZONED_REDUCTION and SINGLE_EVALUATION:
+        # strict area and wider nearby region answered by one grouped reduction
+        strict_result, region_result = _analyze_zones(lat, lon, ref_dt, ref_iso, enrich)
+    else:
+        # step 1: strict area around clicked point
+        strict_result = _analyze_aoi(lat, lon, ref_dt, ref_iso, STRICT_BUFFER_M, enrich)
+        region_result = None
+
+        # step 2: wider nearby region only when the strict area has no fire
+        if not strict_result["is_detected"]:
+            region_result = _analyze_aoi(lat, lon, ref_dt, ref_iso, REGION_BUFFER_M, enrich)
+
+    return _detection_response(lat, lon, strict_result, region_result)
+
+
+# -----------------------------
+# DETECTION CACHE
+# -----------------------------
+
+_detection_cache = TTLCache(DETECTION_CACHE_MAX_ENTRIES, DETECTION_CACHE_TTL_S)
+
+
+def _detection_config_version():
+    # any change in the detection settings gives new cache keys
+    config = (
+        STRICT_BUFFER_M, REGION_BUFFER_M, WINDOW_HOURS, PERSISTENCE_DAYS, FIREMASK_THRESHOLD,
+        NDVI_LOW_THRESHOLD, NDVI_GOOD_THRESHOLD, BURNABLE_LULC_CLASSES, SPECIAL_LULC_CLASSES,
+        [product["dataset_id"] for product in PRODUCTS]
+    )
+    return zlib.crc32(repr(config).encode("utf-8"))
+
+
+def _detection_cache_key(lat, lon, ref_dt, enrich=False):
+    # snapped grid cell, request time bucket, enrichment mode and settings version
+    cell = (round(lat / DETECTION_CACHE_CELL_DEG), round(lon / DETECTION_CACHE_CELL_DEG))
+    bucket = int(ref_dt.timestamp() // (DETECTION_CACHE_BUCKET_HOURS * 3600))
+    return cell + (bucket, bool(enrich), _detection_config_version())
+
+
+def _detection_cache_ttl(ref_dt):
+    # shorter life when the detection window reaches the current time
+    age_hours = (datetime.now(timezone.utc) - ref_dt).total_seconds() / 3600
+    if age_hours < WINDOW_HOURS:
+        return DETECTION_CACHE_NOW_TTL_S
+    return DETECTION_CACHE_TTL_S
+
+
+def _cached_response(result, lat, lon, ref_dt):
+    # the analysis is shared by the clicks of one cache entry, the point and request time are the caller's
+    ref_iso = ref_dt.isoformat()
+    return dict(result, lat=lat, lon=lon, detected_at=ref_iso, fire_datetime=ref_iso)
+
+
+def detect_active_fire_cached(lat: float, lon: float, when_iso=None, enrich=False):
+    if not DETECTION_CACHE_ENABLED:
+        return detect_active_fire(lat, lon, when_iso, enrich)
+
+    ref_dt = _coerce_utc_datetime(when_iso)
+    key = _detection_cache_key(lat, lon, ref_dt, enrich)
+
+    result = _detection_cache.get(key)
+    if result is None:
+        result = detect_active_fire(lat, lon, ref_dt.isoformat(), enrich)
+        _detection_cache.set(key, result, _detection_cache_ttl(ref_dt))
+
+    return _cached_response(result, lat, lon, ref_dt)
+
+
+# -----------------------------
+# BATCH DETECTION
+# -----------------------------
+
+def _batch_aoi_collection(points, indexes=None):
+    # strict and region AOI of every point in one feature collection, tagged with the point index
+    features = []
+    for i, (lat, lon) in zip(indexes or range(len(points)), points):
+        features.append(ee.Feature(_build_aoi(lat, lon, STRICT_BUFFER_M), {"point": i, "zone": STRICT_ZONE}))
+        features.append(ee.Feature(_build_aoi(lat, lon, REGION_BUFFER_M), {"point": i, "zone": REGION_ZONE}))
+    return ee.FeatureCollection(features)
+
+
+def _batch_fire_product_summary(aois, start_dt, end_dt, product):
+    _, merged_img, _ = _fire_product_images(aois, start_dt, end_dt, product)
+    collection = ee.ImageCollection(product["dataset_id"]).filterDate(start_dt, end_dt)
+
+    def with_source_images(feature):
+        # image count and latest image time of this AOI, as _fire_product_summary reports them for one point
+        aoi_collection = collection.filterBounds(feature.geometry())
+        count = aoi_collection.size()
+        return feature.set({
+            "collection_count": count,
+            "dataset_time_ms": ee.Algorithms.If(count.gt(0), aoi_collection.aggregate_max("system:time_start"), end_dt.millis())
+        })
+
+    # fire statistics of every AOI in one reduceRegions pass
+    stats = _fire_stats_image(merged_img).reduceRegions(
+        collection=aois,
+        reducer=_fire_stats_reducer(),
+        scale=product["scale_m"]
+    ).map(with_source_images)
+
+    return ee.Dictionary({
+        "features": stats.select(["point", "zone", "sum", "max", "collection_count", "dataset_time_ms"], None, False)
+    })
+
+
+def _batch_weather_values(points, ref_iso, indexes=None):
+    when = ee.Date(ref_iso)
+
+    # weather regions around every point
+    regions = ee.FeatureCollection([
+        ee.Feature(ee.Geometry.Point([lon, lat]).buffer(5000).bounds(), {"point": i})
+        for i, (lat, lon) in zip(indexes or range(len(points)), points)
+    ])
+
+    era = (
+        ee.ImageCollection("ECMWF/ERA5_LAND/HOURLY")
+        .filterDate(when.advance(-2, "hour"), when.advance(2, "hour"))
+        .filterBounds(regions)
+        .select(["temperature_2m", "dewpoint_temperature_2m"])
+    )
+
+    def add_time_diff(img):
+        diff = ee.Number(img.get("system:time_start")).subtract(when.millis()).abs()
+        return img.set("time_diff", diff)
+
+    # all points share the ERA5 image closest to the request time
+    img = ee.Image(era.map(add_time_diff).sort("time_diff").first())
+    vals = img.reduceRegions(collection=regions, reducer=ee.Reducer.mean(), scale=9000)
+
+    return ee.FeatureCollection(
+        ee.Algorithms.If(era.size().gt(0), vals, ee.FeatureCollection([]))
+    ).select(["point", "temperature_2m", "dewpoint_temperature_2m"], None, False)
+
+
+def _build_batch_analysis(points, ref_dt, ref_iso, include_previous=True,
+                          include_sources=True, include_enrichment=True, indexes=None):
+    aois = _batch_aoi_collection(points, indexes)
+    end_dt = ee.Date(ref_iso)
+    start_dt = end_dt.advance(-WINDOW_HOURS, "hour")
+    previous_start_dt, previous_end_dt = _previous_window(end_dt)
+
+    # NDVI and LULC of every AOI, same images as the single point analysis
+    ndvi_collection = (
+        ee.ImageCollection("MODIS/061/MOD13A1")
+        .filterDate(end_dt.advance(-32, "day"), end_dt)
+        .filterBounds(aois)
+    )
+    latest_ndvi = ee.Image(
+        ee.Algorithms.If(
+            ndvi_collection.size().gt(0),
+            ndvi_collection.sort("system:time_start", False).first(),
+            ee.Image.constant(0).rename("NDVI")
+        )
+    ).select("NDVI")
+
+    lc_all = ee.ImageCollection("MODIS/061/MCD12Q1")
+    lc_year = lc_all.filterDate(ee.Date.fromYMD(ref_dt.year, 1, 1), ee.Date.fromYMD(ref_dt.year + 1, 1, 1))
+    lc_img = ee.Image(
+        ee.Algorithms.If(
+            lc_year.size().gt(0),
+            lc_year.first(),
+            ee.Algorithms.If(
+                lc_all.size().gt(0),
+                lc_all.sort("system:time_start", False).first(),
+                ee.Image.constant(0).rename("LC_Type1")
+            )
+        )
+    ).select("LC_Type1")
+
+    # every point of the batch as one server-side dictionary
+    analysis = {}
+
+    if include_sources:
+        analysis["sources"] = ee.Dictionary({
+            product["label"]: _batch_fire_product_summary(aois, start_dt, end_dt, product)
+            for product in PRODUCTS
+        })
+
+    if include_enrichment:
+        analysis["ndvi"] = (
+            latest_ndvi.reduceRegions(collection=aois, reducer=ee.Reducer.mean(), scale=500)
+            .select(["point", "zone", "mean"], None, False)
+        )
+        analysis["lulc"] = (
+            lc_img.reduceRegions(collection=aois, reducer=ee.Reducer.mode(), scale=500)
+            .select(["point", "zone", "mode"], None, False)
+        )
+        analysis["weather"] = _batch_weather_values(points, ref_iso, indexes)
+
+        # previous persistence window, unless the local archive answered it for every point
+        if include_previous:
+            analysis["previous_sources"] = ee.Dictionary({
+                product["label"]: _batch_fire_product_summary(aois, previous_start_dt, previous_end_dt, product)
+                for product in PRODUCTS
+            })
+    return ee.Dictionary(analysis)
+
+
+def _feature_properties(feature_collection):
+    # {(point, zone): properties} from a fetched feature collection
+    rows = {}
+    for feature in (feature_collection or {}).get("features") or []:
+        props = feature.get("properties") or {}
+        key = (int(float(props.get("point", -1))), int(float(props.get("zone", -1))))
+        rows[key] = props
+    return rows
+
+
+def _batch_source_summaries(values, i, zone):
+    # per-point product summaries in the same format as _fire_product_summary
+    summaries = {}
+    for product in PRODUCTS:
+        product_values = (values or {}).get(product["label"]) or {}
+        props = _feature_properties(product_values.get("features")).get((i, zone)) or {}
+        summaries[product["label"]] = {
+            "collection_count": props.get("collection_count"),
+            "stats": {"sum": props.get("sum"), "max": props.get("max")},
+            "dataset_time_ms": props.get("dataset_time_ms")
+        }
+    return summaries
+
+
+def _batch_point_sources(values, i, zone):
+    source_summaries = _batch_source_summaries(values.get("sources"), i, zone)
+    return [
+        _parse_fire_product_summary(source_summaries[product["label"]], product)
+        for product in PRODUCTS
+    ]
+
+
+def _assemble_batch_results(values, points, ref_iso, archived_previous=None, enriched_points=None):
+    values = values or {}
+    ndvi_rows = _feature_properties(values.get("ndvi"))
+    lulc_rows = _feature_properties(values.get("lulc"))
+    weather_rows = {
+        int(float((f.get("properties") or {}).get("point", -1))): f.get("properties") or {}
+        for f in (values.get("weather") or {}).get("features") or []
+    }
+
+    responses = []
+    for i, (lat, lon) in enumerate(points):
+        weather = _weather_from_era5_values(weather_rows.get(i))
+        zone_results = {}
+        for zone, buffer_m in ((STRICT_ZONE, STRICT_BUFFER_M), (REGION_ZONE, REGION_BUFFER_M)):
+            sources = _batch_point_sources(values, i, zone)
+            if enriched_points is not None and i not in enriched_points:
+                zone_results[zone] = _skipped_aoi_result(None, buffer_m, ref_iso, sources)
+                continue
+
+            previous_fire_observations = (archived_previous or {}).get((i, zone))
+            if previous_fire_observations is None:
+                previous_fire_observations = _count_detected_summaries(
+                    _batch_source_summaries(values.get("previous_sources"), i, zone)
+                )
+            zone_results[zone] = _assemble_aoi_result(
+                None,
+                buffer_m,
+                ref_iso,
+                sources,
+                _parse_ndvi_mean((ndvi_rows.get((i, zone)) or {}).get("mean")),
+                int(float((lulc_rows.get((i, zone)) or {}).get("mode") or 0)),
+                previous_fire_observations,
+                weather
+            )
+
+        responses.append(_detection_response(lat, lon, zone_results[STRICT_ZONE], zone_results[REGION_ZONE]))
+    return responses
+
+
+def detect_active_fire_batch(points, when_iso=None, enrich=False):
+    # points: list of (lat, lon, when_iso or None), the batch datetime is used when a point has none
+    default_dt = _coerce_utc_datetime(when_iso)
+    results = [None] * len(points)
+
+    # answer points that are already in the detection cache
+    groups = {}
+    for i, (lat, lon, point_when) in enumerate(points):
+        ref_dt = _coerce_utc_datetime(point_when) if point_when else default_dt
+        key = _detection_cache_key(lat, lon, ref_dt, enrich)
+        cached = _detection_cache.get(key) if DETECTION_CACHE_ENABLED else None
+        if cached is not None:
+            results[i] = _cached_response(cached, lat, lon, ref_dt)
+        else:
+            groups.setdefault(ref_dt.isoformat(), []).append((i, lat, lon, key))
+
+    # one evaluation per distinct request time for the remaining points
+    # (two when lazy enrichment is on and some points have an active sensor)
+    for ref_iso, members in groups.items():
+        ref_dt = _coerce_utc_datetime(ref_iso)
+        coords = [(lat, lon) for _, lat, lon, _ in members]
+
+        # persistence from the local archive when it covers the whole window
+        archived_previous = {
+            (j, zone): _archived_previous_observations(lat, lon, ref_dt, buffer_m)
+            for j, (lat, lon) in enumerate(coords)
+            for zone, buffer_m in ((STRICT_ZONE, STRICT_BUFFER_M), (REGION_ZONE, REGION_BUFFER_M))
+        }
+
+        if LAZY_ENRICHMENT and not enrich:
+            # step 1: fire products of every point
+            values = _build_batch_analysis(coords, ref_dt, ref_iso, include_enrichment=False).getInfo() or {}
+            enriched_points = [
+                j for j in range(len(coords))
+                if not _can_skip_enrichment(
+                    _batch_point_sources(values, j, STRICT_ZONE) + _batch_point_sources(values, j, REGION_ZONE),
+                    enrich
+                )
+            ]
+
+            # step 2: enrichment stages for the points where a sensor fired
+            if enriched_points:
+                include_previous = any(
+                    archived_previous[(j, zone)] is None
+                    for j in enriched_points for zone in (STRICT_ZONE, REGION_ZONE)
+                )
+                values.update(_build_batch_analysis(
+                    [coords[j] for j in enriched_points], ref_dt, ref_iso, include_previous,
+                    include_sources=False, indexes=enriched_points
+                ).getInfo() or {})
+            enriched_points = set(enriched_points)
+        else:
+            include_previous = any(count is None for count in archived_previous.values())
+            values = _build_batch_analysis(coords, ref_dt, ref_iso, include_previous).getInfo() or {}
+            enriched_points = None
+
+        responses = _assemble_batch_results(values, coords, ref_iso, archived_previous, enriched_points)
+
+        for (i, _, _, key), response in zip(members, responses):
+            results[i] = response
+            if DETECTION_CACHE_ENABLED:
+                _detection_cache.set(key, response, _detection_cache_ttl(ref_dt))
+
+    return results
+
 
 # -----------------------------
 # ROUTE
 # -----------------------------
+register_job_handler("fire-detection", detect_active_fire_cached)
+
 # route used to run the full fire detection process
 @fire_detection_bp.route("/fire-detection", methods=["POST"])
 @login_required
@@ -772,6 +1522,8 @@ def fire_detection_route():
     lat = data.get("lat")
     lon = data.get("lon")
     when_iso = data.get("datetime")
+    # run NDVI / LULC / persistence / weather even when no sensor fired
+    enrich = wants_enrichment(data, request.args)
 
     if lat is None or lon is None:
         return jsonify({
@@ -787,8 +1539,14 @@ def fire_detection_route():
         # validate that the selected point is inside Saudi Arabia
         _ensure_inside_saudi(lat_f, lon_f)
 
+        # async mode: answer with a job id and run the detection in the worker pool
+        if wants_async(data, request.args):
+            return submit_job_response("fire-detection", user_id, {
+                "lat": lat_f, "lon": lon_f, "when_iso": when_iso, "enrich": enrich
+            })
+
         # run fire detection only after passing Saudi boundary validation
-        result = detect_active_fire(lat_f, lon_f, when_iso)
+        result = detect_active_fire_cached(lat_f, lon_f, when_iso, enrich)
         return jsonify(result), 200
 
     except OutsideSaudiError as e:
@@ -807,4 +1565,76 @@ def fire_detection_route():
             "error": "internal_server_error",
             "message": "An internal error occurred during fire detection.",
             "details": tb
-        }), 500
\ No newline at end of file
+        }), 500
+
+
+# route used to run fire detection for many points at once
+@fire_detection_bp.route("/fire-detection/batch", methods=["POST"])
+@login_required
+def fire_detection_batch_route():
+    user_id = g.user_uid
+    data = request.get_json(silent=True) or {}
+
+    points = data.get("points")
+    when_iso = data.get("datetime")
+    # run NDVI / LULC / persistence / weather even when no sensor fired
+    enrich = wants_enrichment(data, request.args)
+
+    if not isinstance(points, list) or not points:
+        return jsonify({
+            "ok": False,
+            "error": "missing_points",
+            "message": "Missing points list"
+        }), 400
+
+    if len(points) > MAX_BATCH_POINTS:
+        return jsonify({
+            "ok": False,
+            "error": "too_many_points",
+            "message": f"At most {MAX_BATCH_POINTS} points are allowed per request"
+        }), 400
+
+    try:
+        results = [None] * len(points)
+        valid_points = []
+        valid_indexes = []
+
+        # validate every point, invalid points get their own error result
+        parsed = []
+        for i, point in enumerate(points):
+            point = point if isinstance(point, dict) else {}
+            try:
+                parsed.append((i, float(point.get("lat")), float(point.get("lon")), point.get("datetime")))
+            except (TypeError, ValueError):
+                results[i] = {"ok": False, "error": "missing_lat_lon", "message": "Missing lat/lon"}
+
+        # the boundary check of all points at once
+        for (i, lat_f, lon_f, point_when), inside in zip(parsed, _inside_saudi_many([(lat, lon) for _, lat, lon, _ in parsed])):
+            if not inside:
+                results[i] = {"ok": False, "error": "outside_saudi", "message": "Selected location is outside Saudi Arabia",
+                              "lat": lat_f, "lon": lon_f}
+                continue
+
+            valid_points.append((lat_f, lon_f, point_when))
+            valid_indexes.append(i)
+
+        # run the detection for all valid points together
+        for i, result in zip(valid_indexes, detect_active_fire_batch(valid_points, when_iso, enrich)):
+            results[i] = result
+
+        return jsonify({
+            "ok": True,
+            "count": len(results),
+            "results": results
+        }), 200
+
+    except Exception:
+        tb = traceback.format_exc()
+        print(f">>> ERROR in /fire-detection/batch for user {user_id}:\n{tb}")
+
+        return jsonify({
+            "ok": False,
+            "error": "internal_server_error",
+            "message": "An internal error occurred during batch fire detection.",
+            "details": tb
+        }), 500
@@ -1,17 +1,26 @@
-from flask import Blueprint, request, jsonify, g
-from datetime import datetime, timezone, timedelta
-from pathlib import Path
+from flask import Blueprint, Response, request, jsonify, g
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+import time
 import traceback
 import ee
-import joblib
-import pandas as pd
+import numpy as np
 from auth_utils import login_required
-import requests
+from metrics_utils import Histogram, register_metric
+from model_utils import sklearn_predict_proba
+from Singleton.prediction_model import PredictionModel
+from Singleton.weather_client import WeatherClient
+from weather_utils import get_weather_cache, hour_is_complete, next_forecast_run, snap, weather_expiry
+from tile_utils import (
+    class_png, grid_cell_centres, grid_shape, grid_spec, load_tile, parse_bbox, prune_tiles, save_tile, tile_path
+)
+from job_utils import register_job_handler, submit_job_response, wants_async
 
 # import shared helper functions from FireDetection
 from FireDetection import (
     OutsideSaudiError,
     _ensure_inside_saudi,
+    _inside_saudi_many,
     _coerce_utc_datetime,
     _safe_number,
     _safe_float
@@ -31,47 +40,55 @@ NDVI_SCOPE_THRESHOLD = 0.15 # vegetation area
 RISK_MEDIUM_THRESHOLD = 0.50 # medium fire risk
 RISK_HIGH_THRESHOLD = 0.80 # high fire risk
 
-# folder that contains this file
-BASE_DIR = Path(__file__).resolve().parent
+# batch prediction limits
+MAX_BATCH_POINTS = 1000 # largest number of points accepted by the batch endpoint
+OPEN_METEO_MAX_LOCATIONS = 100 # locations sent in one Open-Meteo request
 
-# folder that contains model files
-MODEL_DIR = BASE_DIR / "Model"
+# keep whole Open-Meteo days on disk (weather_utils.WeatherCache)
+WEATHER_CACHE_ENABLED = True
 
-# path for saved model files
-MODEL_PATH = MODEL_DIR / "gb_model.pkl"
-PREPROCESSOR_PATH = MODEL_DIR / "preprocessor.pkl"
-THRESHOLD_PATH = MODEL_DIR / "threshold.pkl"
+# threads shared by all requests for the Earth Engine and Open-Meteo lookups of a prediction
+FEATURE_WORKERS = 8
 
-# global variables to load model files once only
-_model = None
-_preprocessor = None
-_threshold = None
+# risk grid of a bounding box
+GRID_DEFAULT_CELL_DEG = 0.01 # ~1 km, the model resolution
+GRID_MIN_CELL_DEG = 0.005
+GRID_MAX_CELL_DEG = 0.1
+GRID_MAX_CELLS = 40000 # 200 x 200 cells
+GRID_WEATHER_DEG = 0.1 # weather is fetched on this coarser grid (ERA5-Land is ~0.1 deg) and shared by the cells in it
+GRID_MAX_WEATHER_POINTS = 400 # Open-Meteo locations per grid request (4 pooled requests), bounds the box area to ~4 square degrees
+GRID_RISK_HOUR_UTC = 11 # one tile per day, scored with the weather of 14:00 Saudi time (daily fire weather peak)
 
+# colours of the PNG tile by risk class: no data, safe, low, medium, high
+GRID_PALETTE = [
+    (0, 0, 0, 0),
+    (46, 125, 50, 140),
+    (253, 216, 53, 170),
+    (251, 140, 0, 200),
+    (198, 40, 40, 220)
+]
 
-# -----------------------------
-# HELPER FUNCTIONS
-# -----------------------------
+# score with the NumPy form of the model (same probabilities, no pandas / sklearn overhead per request)
+COMPILED_INFERENCE = True
 
-def _load_prediction_artifacts():
-    # use global variables so files are not loaded every request
-    global _model, _preprocessor, _threshold
+_feature_executor = ThreadPoolExecutor(max_workers=FEATURE_WORKERS, thread_name_prefix="prediction-features")
 
-    # load trained model if it is not loaded yet
-    if _model is None:
-        _model = joblib.load(MODEL_PATH)
+# time of every feature lookup, shown by /metrics
+FEATURE_LATENCY = register_metric(Histogram(
+    "wameed_prediction_feature_duration_seconds",
+    "Latency of the feature lookups of a fire prediction.",
+    ("source", "outcome")
+))
 
-    # load preprocessor if it is not loaded yet
-    if _preprocessor is None:
-        _preprocessor = joblib.load(PREPROCESSOR_PATH)
 
-    # load threshold if it exists, otherwise use default threshold
-    if _threshold is None:
-        if THRESHOLD_PATH.exists():
-            _threshold = float(joblib.load(THRESHOLD_PATH))
-        else:
-            _threshold = 0.35
+# -----------------------------
+# HELPER FUNCTIONS
+# -----------------------------
 
-    return _model, _preprocessor, _threshold
+def _load_prediction_artifacts():
+    # model, preprocessor and threshold of one bundle, taken together so a model swap never mixes versions
+    bundle = PredictionModel.get_instance().current()
+    return bundle.model, bundle.preprocessor, bundle.threshold
 
 
 def _build_point(lat, lon):
@@ -79,80 +96,33 @@ def _build_point(lat, lon):
     return ee.Geometry.Point([lon, lat])
 
 
-def _get_terrain_features(point_geom):
-    # load SRTM elevation model
-    srtm = ee.Image("USGS/SRTMGL1_003")
-
-    # build terrain products
-    terrain = ee.Algorithms.Terrain(srtm)
-
-    # combine static terrain bands
-    static_img = (
-        terrain.select("elevation").rename("elevation")
-        .addBands(terrain.select("slope").rename("slope"))
-        .addBands(terrain.select("aspect").rename("aspect"))
-    )
-
-    # take terrain values at the selected point
-    vals = static_img.reduceRegion(
-        reducer=ee.Reducer.first(),
-        geometry=point_geom,
-        scale=SCALE_M,
-        bestEffort=True,
-        maxPixels=1e8
-    ).getInfo() or {}
-
-    return {
-        "elevation": round(_safe_float(vals.get("elevation"), -9999), 3),
-        "slope": round(_safe_float(vals.get("slope"), -9999), 3),
-        "aspect": round(_safe_float(vals.get("aspect"), -9999), 3)
-    }
+def _terrain_image():
+    # SRTM elevation model with its terrain products
+    terrain = ee.Algorithms.Terrain(ee.Image("USGS/SRTMGL1_003"))
+    return terrain.select(["elevation", "slope", "aspect"])
 
 
-def _get_lulc_class(point_geom):
+def _lulc_image():
     # load MODIS land cover and sort from newest to oldest
-    lc_col = (ee.ImageCollection("MODIS/061/MCD12Q1").select("LC_Type1").sort("system:time_start", False))
+    lc_col = ee.ImageCollection("MODIS/061/MCD12Q1").select("LC_Type1").sort("system:time_start", False)
 
     # take most recent image if available, otherwise use fallback image
-    lulc_img = ee.Image(
-        ee.Algorithms.If(
-            lc_col.size().gt(0),
-            lc_col.first(),
-            ee.Image.constant(0).rename("LC_Type1")
-        )
+    return ee.Image(
+        ee.Algorithms.If(lc_col.size().gt(0), lc_col.first(), ee.Image.constant(0).rename("LC_Type1"))
     ).rename("lulc")
 
-    # take lulc value at the selected point
-    lulc_value = _safe_number(
-        lulc_img.reduceRegion(
-            reducer=ee.Reducer.first(),
-            geometry=point_geom,
-            scale=SCALE_M,
-            bestEffort=True,
-            maxPixels=1e8
-        ).get("lulc"),
-        -9999
-    ).getInfo()
-
-    return int(float(lulc_value or -9999))
-
 
-def _get_ndvi_mean(point_geom, end_dt):
+def _ndvi_image(region, end_dt):
     # use a longer window because MODIS NDVI can be delayed or masked
-    start_dt = end_dt.advance(-96, "day")
-
-    # use buffer around selected point instead of exact point only
-    region_geom = point_geom.buffer(1500)
-
     ndvi_col = (
         ee.ImageCollection("MODIS/061/MOD13Q1")  # use same source as training if training used MOD13Q1
-        .filterBounds(region_geom)
-        .filterDate(start_dt, end_dt)
+        .filterBounds(region)
+        .filterDate(end_dt.advance(-96, "day"), end_dt)
         .select("NDVI")
     )
 
     # if images exist use median, otherwise use fallback value
-    ndvi_img = ee.Image(
+    return ee.Image(
         ee.Algorithms.If(
             ndvi_col.size().gt(0),
             ndvi_col.median().multiply(0.0001).rename("ndvi"),
@@ -160,33 +130,13 @@ def _get_ndvi_mean(point_geom, end_dt):
         )
     )
 
-    # take NDVI value at the selected point
-    ndvi_value = _safe_number(
-        ndvi_img.reduceRegion(
-            reducer=ee.Reducer.mean(),
-            geometry=region_geom,
-            scale=SCALE_M,
-            bestEffort=True,
-            maxPixels=1e8
-        ).get("ndvi"),
-        -9999
-    ).getInfo()
-
-    if ndvi_value is None:
-        return -9999
-
-    return round(float(ndvi_value), 3)
-
-
-def _get_ndwi_mean(point_geom, end_dt):
-    # use recent 16 days to get surface reflectance
-    start_dt = end_dt.advance(-16, "day")
 
-    # load MODIS surface reflectance using the same bands as the training file
+def _ndwi_image(region, end_dt):
+    # recent 16 days of MODIS surface reflectance, same bands as the training file
     sr_col = (
         ee.ImageCollection("MODIS/061/MOD09GA")
-        .filterBounds(point_geom)
-        .filterDate(start_dt, end_dt)
+        .filterBounds(region)
+        .filterDate(end_dt.advance(-16, "day"), end_dt)
         .select(["sur_refl_b04", "sur_refl_b02"])
     )
 
@@ -199,34 +149,60 @@ def _get_ndwi_mean(point_geom, end_dt):
         )
     )
 
-    # convert bands to real values
+    # NDWI = (green - nir) / (green + nir)
     green = sr_img.select("sur_refl_b04").multiply(0.0001)
     nir = sr_img.select("sur_refl_b02").multiply(0.0001)
+    return green.subtract(nir).divide(green.add(nir)).rename("ndwi")
 
-    # NDWI = (green - nir) / (green + nir)
-    ndwi = green.subtract(nir).divide(green.add(nir)).rename("ndwi")
 
-    # take NDWI value at the selected point
-    ndwi_value = _safe_number(
-        ndwi.reduceRegion(
+def _build_ee_features(point_geom, end_dt):
+    # terrain, LULC, NDVI and NDWI of one point as one server-side dictionary (one getInfo)
+    def first_at_point(img):
+        return img.reduceRegion(
             reducer=ee.Reducer.first(),
             geometry=point_geom,
             scale=SCALE_M,
             bestEffort=True,
             maxPixels=1e8
-        ).get("ndwi"),
-        -9999
-    ).getInfo()
+        )
 
-    return round(float(ndwi_value or -9999), 3)
+    # NDVI is the mean of a buffer around the point, MODIS NDVI is often masked at a single pixel
+    region_geom = point_geom.buffer(1500)
+    ndvi = _ndvi_image(region_geom, end_dt).reduceRegion(
+        reducer=ee.Reducer.mean(),
+        geometry=region_geom,
+        scale=SCALE_M,
+        bestEffort=True,
+        maxPixels=1e8
+    )
 
+    return ee.Dictionary({
+        "terrain": first_at_point(_terrain_image()),
+        "lulc": _safe_number(first_at_point(_lulc_image()).get("lulc"), -9999),
+        "ndvi": _safe_number(ndvi.get("ndvi"), -9999),
+        "ndwi": _safe_number(first_at_point(_ndwi_image(point_geom, end_dt)).get("ndwi"), -9999)
+    })
 
-def _get_weather_features(lat, lon, when_iso):
-    when_dt = _coerce_utc_datetime(when_iso)
+
+def _ee_features_from_values(values):
+    terrain = values.get("terrain") or {}
+    ndvi_value = values.get("ndvi")
+    return {
+        "elevation": round(_safe_float(terrain.get("elevation"), -9999), 3),
+        "slope": round(_safe_float(terrain.get("slope"), -9999), 3),
+        "aspect": round(_safe_float(terrain.get("aspect"), -9999), 3),
+        "lulc": int(float(values.get("lulc") or -9999)),
+        "ndvi": -9999 if ndvi_value is None else round(float(ndvi_value), 3),
+        "ndwi": round(float(values.get("ndwi") or -9999), 3)
+    }
+
+
+def _open_meteo_request(when_dt):
+    # url and params of the day of when_dt, latitude / longitude are added by the weather client
     now_utc = datetime.now(timezone.utc)
 
+    # the whole day is requested so it can be cached
     target_hour = when_dt.replace(minute=0, second=0, microsecond=0)
-    end_hour = target_hour + timedelta(hours=1)
 
     hourly_vars = "temperature_2m,dew_point_2m,precipitation,vapour_pressure_deficit,wind_speed_10m"
 
@@ -234,8 +210,6 @@ def _get_weather_features(lat, lon, when_iso):
     if target_hour < now_utc.replace(minute=0, second=0, microsecond=0):
         url = "https://archive-api.open-meteo.com/v1/archive"
         params = {
-            "latitude": lat,
-            "longitude": lon,
             "hourly": hourly_vars,
             "start_date": target_hour.strftime("%Y-%m-%d"),
             "end_date": target_hour.strftime("%Y-%m-%d"),
@@ -248,11 +222,9 @@ def _get_weather_features(lat, lon, when_iso):
     else:
         url = "https://api.open-meteo.com/v1/forecast"
         params = {
-            "latitude": lat,
-            "longitude": lon,
             "hourly": hourly_vars,
-            "start_hour": target_hour.strftime("%Y-%m-%dT%H:%M"),
-            "end_hour": end_hour.strftime("%Y-%m-%dT%H:%M"),
+            "start_date": target_hour.strftime("%Y-%m-%d"),
+            "end_date": target_hour.strftime("%Y-%m-%d"),
             "timezone": "GMT",
             "temperature_unit": "celsius",
             "wind_speed_unit": "ms",
@@ -260,16 +232,10 @@ def _get_weather_features(lat, lon, when_iso):
         }
         mode = "forecast"
 
-    response = requests.get(url, params=params, timeout=20)
-    print("OPEN-METEO MODE:", mode)
-    print("OPEN-METEO STATUS:", response.status_code)
-    print("OPEN-METEO URL:", response.url)
-    print("OPEN-METEO TEXT:", response.text[:500])
-    response.raise_for_status()
+    return url, params, mode, target_hour
 
-    payload = response.json()
-    hourly = payload.get("hourly") or {}
 
+def _weather_from_hourly(hourly, target_hour):
     times = hourly.get("time") or []
     temps = hourly.get("temperature_2m") or []
     dews = hourly.get("dew_point_2m") or []
@@ -280,7 +246,7 @@ def _get_weather_features(lat, lon, when_iso):
     if not times:
         raise ValueError("Open-Meteo returned no hourly weather data.")
 
-    # archive returns whole day; forecast request above usually returns one hour
+    # both endpoints return the whole day
     target_key = target_hour.strftime("%Y-%m-%dT%H:00")
     idx = 0
     for i, t in enumerate(times):
@@ -297,59 +263,270 @@ def _get_weather_features(lat, lon, when_iso):
     if None in (temperature, dew_point, precipitation, vpd, wind_speed):
         raise ValueError("Open-Meteo response is missing required weather fields.")
 
-    print("OPEN-METEO lat/lon:", lat, lon)
-    print("OPEN-METEO target hour UTC:", target_hour.isoformat())
-    print("OPEN-METEO values:", {
+    return {
         "temperature": temperature,
         "dew_point": dew_point,
         "precipitation": precipitation,
         "vpd": vpd,
         "wind_speed": wind_speed
-    })
-    print(f"lat={lat}, lon={lon}")
-    # print(f"probability={probability}")
-    # print(f"threshold={threshold}")
+    }
 
+
+def _round_weather(values):
     return {
-        "temperature": round(float(temperature), 3),
-        "wind_speed": round(float(wind_speed), 3),
-        "precipitation": round(float(precipitation), 6),
-        "vpd": round(float(vpd), 3)
+        "temperature": round(float(values["temperature"]), 3),
+        "wind_speed": round(float(values["wind_speed"]), 3),
+        "precipitation": round(float(values["precipitation"]), 6),
+        "vpd": round(float(values["vpd"]), 3)
+    }
+
+
+def _weather_days(points, when_dt):
+    # hourly block of the day of every point: from the local cache, or one pooled Open-Meteo request per chunk of missing points
+    cache = get_weather_cache() if WEATHER_CACHE_ENABLED else None
+    day = when_dt.date()
+    days = [cache.get(lat, lon, day) if cache is not None else None for lat, lon in points]
+    # a cached day without the requested hour is asked again, maybe from the other endpoint
+    days = [hourly if hourly is not None and hour_is_complete(hourly, when_dt) else None for hourly in days]
+    missing = [i for i, hourly in enumerate(days) if hourly is None]
+
+    if missing:
+        snapped = [snap(*points[i]) for i in missing]
+        url, params, mode, _ = _open_meteo_request(when_dt)
+        payloads = WeatherClient.get_instance().get_locations(url, params, snapped, chunk_size=OPEN_METEO_MAX_LOCATIONS)
+        print("OPEN-METEO:", mode, len(missing), "locations")
+
+        for k, i in enumerate(missing):
+            hourly = payloads[k].get("hourly") or {}
+            days[i] = hourly
+            if cache is not None and hourly.get("time"):
+                cache.set(*snapped[k], day, hourly, weather_expiry(mode, hourly, day))
+
+    return days
+
+
+def _get_weather_features(lat, lon, when_iso):
+    when_dt = _coerce_utc_datetime(when_iso)
+    target_hour = when_dt.replace(minute=0, second=0, microsecond=0)
+
+    hourly = _weather_days([(lat, lon)], when_dt)[0]
+    values = _weather_from_hourly(hourly, target_hour)
+
+    print("OPEN-METEO lat/lon:", lat, lon)
+    print("OPEN-METEO target hour UTC:", target_hour.isoformat())
+    print("OPEN-METEO values:", values)
+
+    return _round_weather(values)
+
+
+def _get_weather_features_many(points, when_iso):
+    # weather of many points, cached days first and one Open-Meteo request per chunk of the others
+    # returns one dict per point, or the exception when that point has no usable data
+    when_dt = _coerce_utc_datetime(when_iso)
+    target_hour = when_dt.replace(minute=0, second=0, microsecond=0)
+
+    results = []
+    for hourly in _weather_days(points, when_dt):
+        try:
+            results.append(_round_weather(_weather_from_hourly(hourly, target_hour)))
+        except ValueError as e:
+            results.append(e)
+    return results
+
+def _timed_call(func, *args):
+    # (result or exception, seconds)
+    start = time.perf_counter()
+    try:
+        result = func(*args)
+    except Exception as e:
+        result = e
+    return result, time.perf_counter() - start
+
+
+def _run_feature_lookups(ee_values, weather_func, *weather_args):
+    # getInfo of the Earth Engine dictionary and the weather lookup on the feature threads,
+    # so a prediction waits for the slowest of them instead of their sum
+    futures = {
+        "earth_engine": _feature_executor.submit(_timed_call, ee_values.getInfo),
+        "weather": _feature_executor.submit(_timed_call, weather_func, *weather_args)
     }
 
+    timings = {}
+    results = {}
+    for name, future in futures.items():
+        result, seconds = future.result()
+        timings[name] = round(seconds * 1000, 1)
+        FEATURE_LATENCY.observe(seconds, name, "error" if isinstance(result, Exception) else "ok")
+        results[name] = result
+    print("PREDICTION FEATURE TIMINGS (ms):", timings)
+
+    for result in results.values():
+        if isinstance(result, Exception):
+            raise result
+    return results["earth_engine"], results["weather"]
+
+
 def _build_prediction_features(lat, lon, when_iso=None):
     # if there is no datetime from frontend, use current UTC time
     ref_dt = _coerce_utc_datetime(when_iso)
     ref_iso = ref_dt.isoformat()
 
-    # build selected point
-    point_geom = _build_point(lat, lon)
-
-    # convert datetime to ee.Date
-    end_dt = ee.Date(ref_iso)
-
-    # extract static and dynamic features
-    terrain = _get_terrain_features(point_geom)
-    weather = _get_weather_features(lat, lon, ref_iso)
-    ndvi_mean = _get_ndvi_mean(point_geom, end_dt)
-    ndwi_mean = _get_ndwi_mean(point_geom, end_dt)
-    lulc_class = _get_lulc_class(point_geom)
+    # one Earth Engine evaluation for terrain, NDVI, NDWI and LULC, run at the same time as the Open-Meteo fetch
+    values, weather = _run_feature_lookups(
+        _build_ee_features(_build_point(lat, lon), ee.Date(ref_iso)),
+        _get_weather_features, lat, lon, ref_iso
+    )
+    ee_features = _ee_features_from_values(values or {})
 
     # return all raw features in the same structure used by the model
     return {
-        "elevation": terrain["elevation"],
-        "slope": terrain["slope"],
-        "aspect": terrain["aspect"],
-        "lulc": lulc_class,
+        "elevation": ee_features["elevation"],
+        "slope": ee_features["slope"],
+        "aspect": ee_features["aspect"],
+        "lulc": ee_features["lulc"],
         "temperature": weather["temperature"],
         "wind_speed": weather["wind_speed"],
         "precipitation": weather["precipitation"],
         "vpd": weather["vpd"],
-        "ndvi": ndvi_mean,
-        "ndwi": ndwi_mean
+        "ndvi": ee_features["ndvi"],
+        "ndwi": ee_features["ndwi"]
     }, ref_iso
 
 
+def _build_batch_ee_features(points, end_dt):
+    # terrain, LULC, NDVI and NDWI of every point as one server-side dictionary,
+    # same images and scales as the single point dictionary
+    point_fc = ee.FeatureCollection([
+        ee.Feature(_build_point(lat, lon), {"point": i}) for i, (lat, lon) in enumerate(points)
+    ])
+    ndvi_fc = ee.FeatureCollection([
+        ee.Feature(_build_point(lat, lon).buffer(1500), {"point": i}) for i, (lat, lon) in enumerate(points)
+    ])
+
+    lulc_img = _lulc_image()
+    ndwi = _ndwi_image(point_fc, end_dt)
+    ndvi_img = _ndvi_image(ndvi_fc, end_dt)
+
+    # point values of every band in one reduceRegions pass
+    point_img = (
+        _terrain_image()
+        .addBands(lulc_img)
+        .addBands(ndwi)
+    )
+    point_values = point_img.reduceRegions(
+        collection=point_fc,
+        reducer=ee.Reducer.first(),
+        scale=SCALE_M
+    ).select(["point", "elevation", "slope", "aspect", "lulc", "ndwi"], None, False)
+
+    # NDVI mean around every point
+    ndvi_values = ndvi_img.reduceRegions(
+        collection=ndvi_fc,
+        reducer=ee.Reducer.mean().setOutputs(["ndvi"]),
+        scale=SCALE_M
+    ).select(["point", "ndvi"], None, False)
+
+    return ee.Dictionary({"points": point_values, "ndvi": ndvi_values})
+
+
+def _rows_by_point(feature_collection):
+    rows = {}
+    for feature in (feature_collection or {}).get("features") or []:
+        props = feature.get("properties") or {}
+        rows[int(float(props.get("point", -1)))] = props
+    return rows
+
+
+def _build_prediction_features_many(points, when_iso=None):
+    # features of many points: one Earth Engine evaluation and one Open-Meteo request per chunk, run at the same time
+    ref_dt = _coerce_utc_datetime(when_iso)
+    ref_iso = ref_dt.isoformat()
+
+    values, weather = _run_feature_lookups(
+        _build_batch_ee_features(points, ee.Date(ref_iso)),
+        _get_weather_features_many, points, ref_iso
+    )
+    values = values or {}
+    point_rows = _rows_by_point(values.get("points"))
+    ndvi_rows = _rows_by_point(values.get("ndvi"))
+
+    features = []
+    for i in range(len(points)):
+        if isinstance(weather[i], Exception):
+            features.append(weather[i])
+            continue
+
+        row = point_rows.get(i) or {}
+        ndvi_value = _safe_float(ndvi_rows.get(i, {}).get("ndvi"), -9999)
+        features.append({
+            "elevation": round(_safe_float(row.get("elevation"), -9999), 3),
+            "slope": round(_safe_float(row.get("slope"), -9999), 3),
+            "aspect": round(_safe_float(row.get("aspect"), -9999), 3),
+            "lulc": int(float(_safe_float(row.get("lulc"), -9999))),
+            "temperature": weather[i]["temperature"],
+            "wind_speed": weather[i]["wind_speed"],
+            "precipitation": weather[i]["precipitation"],
+            "vpd": weather[i]["vpd"],
+            "ndvi": round(ndvi_value, 3),
+            "ndwi": round(_safe_float(row.get("ndwi"), -9999), 3)
+        })
+
+    return features, ref_iso
+
+
+def _score_feature_rows(rows, model, preprocessor):
+    # fire probability of every feature row with one transform and one predict_proba
+    if COMPILED_INFERENCE:
+        # the loaded bundle is compiled once when it is loaded
+        bundle = PredictionModel.loaded()
+        if bundle is not None and bundle.model is model and bundle.compiled is not None:
+            return bundle.compiled.predict_proba(rows)
+
+    return sklearn_predict_proba(rows, model, preprocessor)
+
+
+def _unscored_result(status, features, predicted_at, threshold):
+    # NDVI outside the model scope, no probability is computed
+    if status == "ndvi_unavailable":
+        message_ar = "تعذر تحديد نطاق الغطاء النباتي لأن قيمة NDVI غير متوفرة."
+    else:
+        message_ar = "هذه المنطقة لا تُعد منطقة ذات غطاء نباتي كافٍ للتنبؤ بحرائق الغابات."
+
+    return {
+        "ok": True,
+        "status": status,
+        "is_predicted": False,
+        "probability": None,
+        "threshold": float(threshold),
+        "predicted_at": predicted_at,
+        "features": features,
+        "risk_level": "safe",
+        "message_ar": message_ar
+    }
+
+
+def _predicted_result(probability, features, predicted_at, threshold):
+    probability = float(probability)
+
+    # determine if the probability passes the saved threshold
+    is_predicted = probability >= threshold
+
+    # determine risk level and Arabic label
+    risk_level, risk_label_ar = _get_risk_level(probability, threshold)
+
+    return {
+        "ok": True,
+        "status": "predicted",
+        "is_predicted": bool(is_predicted),
+        "probability": round(probability, 4),
+        "threshold": float(threshold),
+        "risk_level": risk_level,
+        "risk_label_ar": risk_label_ar,
+        "predicted_at": predicted_at,
+        "features": features
+    }
+
+
 # get the fire
 def _get_risk_level(probability, threshold):
     probability = float(probability)
@@ -378,74 +555,214 @@ def predict_fire_risk(lat, lon, when_iso=None):
 
     # if NDVI is missing, prediction cannot continue
     if ndvi_value is None or ndvi_value == -9999:
-        return {
-            "ok": True,
-            "status": "ndvi_unavailable",
-            "is_predicted": False,
-            "probability": None,
-            "threshold": float(threshold),
-            "predicted_at": predicted_at,
-            "features": features,
-            "risk_level": "safe",
-            "message_ar": "تعذر تحديد نطاق الغطاء النباتي لأن قيمة NDVI غير متوفرة."
-        }
+        return _unscored_result("ndvi_unavailable", features, predicted_at, threshold)
 
     # if NDVI is below the vegetation threshold, the point is outside forest scope
     if ndvi_value < NDVI_SCOPE_THRESHOLD:
-        return {
-            "ok": True,
-            "status": "outside_forest_scope",
-            "is_predicted": False,
-            "probability": None,
-            "threshold": float(threshold),
-            "predicted_at": predicted_at,
-            "features": features,
-            "risk_level": "safe",
-            "message_ar": "هذه المنطقة لا تُعد منطقة ذات غطاء نباتي كافٍ للتنبؤ بحرائق الغابات."
-        }
+        return _unscored_result("outside_forest_scope", features, predicted_at, threshold)
 
-    # convert features dictionary into one-row dataframe for prediction
-    X_new = pd.DataFrame([features])
+    # get probability of class 1 = fire
+    probability = _score_feature_rows([features], model, preprocessor)[0]
 
-    # reorder columns to match the columns used during training
-    if hasattr(preprocessor, "feature_names_in_"):
-        X_new = X_new.reindex(columns=list(preprocessor.feature_names_in_))
+    # return final prediction result
+    return _predicted_result(probability, features, predicted_at, threshold)
 
-    # apply preprocessing pipeline
-    X_processed = preprocessor.transform(X_new)
 
-    # convert sparse matrix to normal array if needed
-    if hasattr(X_processed, "toarray"):
-        X_processed = X_processed.toarray()
+def _scope_masks(features):
+    # points without weather data get an error result
+    has_features = np.array([not isinstance(f, Exception) for f in features], dtype=bool)
 
-    # get processed feature names from preprocessor
-    processed_feature_names = preprocessor.get_feature_names_out()
+    # NDVI scope as vectorized masks
+    ndvi = np.array([
+        f.get("ndvi") if ok and f.get("ndvi") is not None else np.nan
+        for f, ok in zip(features, has_features)
+    ], dtype=float)
+    unavailable = has_features & (np.isnan(ndvi) | (ndvi == -9999))
+    outside = has_features & ~unavailable & (ndvi < NDVI_SCOPE_THRESHOLD)
+    in_scope = has_features & ~unavailable & ~outside
+    return has_features, unavailable, outside, in_scope
 
-    # convert processed data into dataframe for model input
-    X_processed_df = pd.DataFrame(X_processed, columns=processed_feature_names)
 
-    # get probability of class 1 = fire
-    probability = float(model.predict_proba(X_processed_df)[0, 1])
+def predict_fire_risk_many(points, when_iso=None):
+    # points: list of (lat, lon), all scored for the same datetime
+    model, preprocessor, threshold = _load_prediction_artifacts()
+    features, predicted_at = _build_prediction_features_many(points, when_iso)
+
+    has_features, unavailable, outside, in_scope = _scope_masks(features)
+
+    # one transform and one predict_proba for every point in scope
+    probabilities = np.full(len(points), np.nan)
+    if in_scope.any():
+        scored_rows = [features[i] for i in np.flatnonzero(in_scope)]
+        probabilities[in_scope] = _score_feature_rows(scored_rows, model, preprocessor)
+
+    results = []
+    for i, (lat, lon) in enumerate(points):
+        if not has_features[i]:
+            result = {"ok": False, "error": "weather_unavailable", "message": str(features[i])}
+        elif unavailable[i]:
+            result = _unscored_result("ndvi_unavailable", features[i], predicted_at, threshold)
+        elif outside[i]:
+            result = _unscored_result("outside_forest_scope", features[i], predicted_at, threshold)
+        else:
+            result = _predicted_result(probabilities[i], features[i], predicted_at, threshold)
+        results.append(dict(result, lat=lat, lon=lon))
+    return results
 
-    # determine if the probability passes the saved threshold
-    is_predicted = probability >= threshold
+# -----------------------------
+# RISK GRID
+# -----------------------------
 
-    # determine risk level and Arabic label
-    risk_level, risk_label_ar = _get_risk_level(probability, threshold)
+GRID_BANDS = ("elevation", "slope", "aspect", "lulc", "ndvi", "ndwi")
+GRID_WEATHER = ("temperature", "wind_speed", "precipitation", "vpd")
+GRID_CLASSES = ("no_data", "safe", "low", "medium", "high")
+
+
+def _build_grid_ee_image(bbox, end_dt):
+    # terrain, LULC, NDVI and NDWI bands of the whole box, same images as the point features
+    region = ee.Geometry.Rectangle(list(bbox))
+
+    # NDVI mean of a 1500 m disc around every cell, like the buffer used for one point
+    ndvi = _ndvi_image(region, end_dt).reduceNeighborhood(
+        reducer=ee.Reducer.mean(),
+        kernel=ee.Kernel.circle(1500, "meters")
+    ).rename("ndvi")
+
+    return (
+        _terrain_image()
+        .addBands(_lulc_image())
+        .addBands(ndvi)
+        .addBands(_ndwi_image(region, end_dt))
+        .select(list(GRID_BANDS))
+        .toDouble()
+        .unmask(-9999)
+    )
 
-    # return final prediction result
-    return {
-        "ok": True,
-        "status": "predicted",
-        "is_predicted": bool(is_predicted),
-        "probability": round(probability, 4),
+
+def _sample_grid(bbox, cell_deg, rows, cols, end_dt):
+    # every band of every cell with one computePixels request
+    pixels = ee.data.computePixels({
+        "expression": _build_grid_ee_image(bbox, end_dt),
+        "fileFormat": "NUMPY_NDARRAY",
+        "grid": grid_spec(bbox, cell_deg, rows, cols)
+    })
+    return {band: np.asarray(pixels[band], dtype=float) for band in GRID_BANDS}
+
+
+def _grid_weather_nodes(bbox, lats, lons):
+    # (lat, lon) of the weather grid nodes the cells fall in, and the node index of every cell
+    min_lon, _, _, max_lat = bbox
+    node_rows = np.floor((max_lat - lats) / GRID_WEATHER_DEG).astype(int).ravel()
+    node_cols = np.floor((lons - min_lon) / GRID_WEATHER_DEG).astype(int).ravel()
+    keys, cell_node = np.unique(np.stack([node_rows, node_cols], axis=1), axis=0, return_inverse=True)
+
+    nodes = [
+        (round(max_lat - (r + 0.5) * GRID_WEATHER_DEG, 4), round(min_lon + (c + 0.5) * GRID_WEATHER_DEG, 4))
+        for r, c in keys
+    ]
+    return nodes, cell_node
+
+
+def _grid_weather(bbox, lats, lons, ref_iso):
+    # weather of the coarse weather grid, copied to every cell inside each weather cell
+    nodes, cell_node = _grid_weather_nodes(bbox, lats, lons)
+    node_values = np.array([
+        [np.nan] * len(GRID_WEATHER) if isinstance(w, Exception) else [w[name] for name in GRID_WEATHER]
+        for w in _get_weather_features_many(nodes, ref_iso)
+    ], dtype=float).reshape(len(nodes), len(GRID_WEATHER))
+
+    cell_values = node_values[cell_node.ravel()].reshape(lats.shape + (len(GRID_WEATHER),))
+    return {name: cell_values[..., j] for j, name in enumerate(GRID_WEATHER)}, len(nodes)
+
+
+def _risk_classes(probability, threshold):
+    # index in GRID_CLASSES, same limits as _get_risk_level
+    classes = np.select(
+        [probability < threshold, probability < RISK_MEDIUM_THRESHOLD, probability < RISK_HIGH_THRESHOLD],
+        [1, 2, 3],
+        4
+    )
+    return np.where(np.isnan(probability), 0, classes).astype(np.uint8)
+
+
+def predict_fire_risk_grid(bbox, cell_deg=GRID_DEFAULT_CELL_DEG, when_iso=None):
+    # daily risk tile of a box: (arrays, meta, tile path), read from the tile cache when it is there
+    model, preprocessor, threshold = _load_prediction_artifacts()
+    rows, cols = grid_shape(bbox, cell_deg)
+
+    day = _coerce_utc_datetime(when_iso).date()
+    ref_iso = datetime(day.year, day.month, day.day, GRID_RISK_HOUR_UTC, tzinfo=timezone.utc).isoformat()
+
+    bundle = PredictionModel.loaded()
+    model_version = bundle.version if bundle is not None else None
+    path = tile_path("risk", day, [round(v, 4) for v in bbox], cell_deg, ref_iso, model_version, threshold)
+    cached = load_tile(path)
+    if cached is not None:
+        return cached[0], cached[1], path
+
+    # Earth Engine bands on a feature thread while the weather is fetched here
+    lats, lons = grid_cell_centres(bbox, cell_deg, rows, cols)
+    bands_future = _feature_executor.submit(_sample_grid, bbox, cell_deg, rows, cols, ee.Date(ref_iso))
+    weather, weather_nodes = _grid_weather(bbox, lats, lons, ref_iso)
+    bands = bands_future.result()
+
+    # same rounding and NDVI scope as the point predictions, as masks over the grid
+    features = {name: np.round(bands[name], 3).ravel() for name in ("elevation", "slope", "aspect", "ndvi", "ndwi")}
+    features["lulc"] = bands["lulc"].astype(int).ravel()
+    features.update({name: weather[name].ravel() for name in GRID_WEATHER})
+
+    has_weather = ~np.isnan(features["temperature"])
+    in_scope = has_weather & (features["ndvi"] != -9999) & (features["ndvi"] >= NDVI_SCOPE_THRESHOLD)
+
+    # one model call for every cell in scope
+    probability = np.full(rows * cols, np.nan)
+    cells = np.flatnonzero(in_scope)
+    if cells.size:
+        columns = {name: values[cells].tolist() for name, values in features.items()}
+        scored_rows = [dict(zip(columns, values)) for values in zip(*columns.values())]
+        probability[cells] = _score_feature_rows(scored_rows, model, preprocessor)
+
+    probability = probability.reshape(rows, cols).astype(np.float32)
+    risk_class = _risk_classes(probability, threshold)
+    counts = np.bincount(risk_class.ravel(), minlength=len(GRID_CLASSES))
+
+    meta = {
+        "bbox": list(bbox),
+        "cell_deg": cell_deg,
+        "rows": rows,
+        "cols": cols,
+        "day": day.isoformat(),
+        "predicted_at": ref_iso,
         "threshold": float(threshold),
-        "risk_level": risk_level,
-        "risk_label_ar": risk_label_ar,
-        "predicted_at": predicted_at,
-        "features": features
+        "model_version": model_version,
+        "weather_points": weather_nodes,
+        "classes": list(GRID_CLASSES),
+        "counts": {name: int(count) for name, count in zip(GRID_CLASSES, counts)}
     }
 
+    # tiles of past days with weather for every cell do not change, the others expire with the next forecast run
+    complete = day < datetime.now(timezone.utc).date() and bool(has_weather.all())
+    arrays = {"probability": probability, "risk_class": risk_class}
+    save_tile(path, arrays, meta, None if complete else next_forecast_run().timestamp())
+    prune_tiles("risk")
+    return arrays, meta, path
+
+
+def compute_fire_risk_grid(bbox, cell_deg=GRID_DEFAULT_CELL_DEG, when_iso=None):
+    # JSON form of the risk tile, also the async job handler
+    arrays, meta, _ = predict_fire_risk_grid(tuple(bbox), cell_deg, when_iso)
+    probability = np.round(arrays["probability"].astype(float), 4)
+    return dict(
+        meta,
+        ok=True,
+        probability=[[None if np.isnan(v) else float(v) for v in row] for row in probability],
+        risk_class=arrays["risk_class"].tolist()
+    )
+
+
+register_job_handler("fire-prediction-grid", compute_fire_risk_grid)
+
+
 # -----------------------------
 # ROUTE
 # -----------------------------
@@ -499,3 +816,162 @@ def fire_prediction_route(): # function that analyze fire prediction
             "error": "internal_server_error",
             "message": str(e)
         }), 500
+
+
+# route used to score many candidate points at once
+@fire_prediction_bp.route("/fire-prediction/batch", methods=["POST"])
+@login_required
+def fire_prediction_batch_route():
+    user_id = g.user_uid
+
+    data = request.get_json(silent=True) or {}
+    points = data.get("points")
+    when_iso = data.get("datetime")
+
+    if not isinstance(points, list) or not points:
+        return jsonify({
+            "ok": False,
+            "error": "missing_points",
+            "message": "Missing points list"
+        }), 400
+
+    if len(points) > MAX_BATCH_POINTS:
+        return jsonify({
+            "ok": False,
+            "error": "too_many_points",
+            "message": f"At most {MAX_BATCH_POINTS} points are allowed per request"
+        }), 400
+
+    try:
+        results = [None] * len(points)
+        valid_points = []
+        valid_indexes = []
+
+        # validate every point, invalid points get their own error result
+        parsed = []
+        for i, point in enumerate(points):
+            point = point if isinstance(point, dict) else {}
+            try:
+                parsed.append((i, float(point.get("lat")), float(point.get("lon"))))
+            except (TypeError, ValueError):
+                results[i] = {"ok": False, "error": "missing_lat_lon", "message": "Missing lat/lon"}
+
+        # the boundary check of all points at once
+        for (i, lat_f, lon_f), inside in zip(parsed, _inside_saudi_many([(lat, lon) for _, lat, lon in parsed])):
+            if not inside:
+                results[i] = {"ok": False, "error": "outside_saudi", "message": "Selected location is outside Saudi Arabia",
+                              "lat": lat_f, "lon": lon_f}
+                continue
+
+            valid_points.append((lat_f, lon_f))
+            valid_indexes.append(i)
+
+        # score all valid points together
+        if valid_points:
+            for i, result in zip(valid_indexes, predict_fire_risk_many(valid_points, when_iso)):
+                results[i] = result
+
+        return jsonify({
+            "ok": True,
+            "count": len(results),
+            "results": results
+        }), 200
+
+    except Exception as e:
+        print(f">>> ERROR in /fire-prediction/batch for user {user_id}")
+        traceback.print_exc()
+        return jsonify({
+            "ok": False,
+            "error": "internal_server_error",
+            "message": str(e)
+        }), 500
+
+
+# route used to build the risk map of a bounding box
+@fire_prediction_bp.route("/fire-prediction/grid", methods=["POST"])
+@login_required
+def fire_prediction_grid_route():
+    user_id = g.user_uid
+
+    data = request.get_json(silent=True) or {}
+    when_iso = data.get("datetime")
+    out_format = str(data.get("format") or request.args.get("format") or "json").lower()
+
+    try:
+        bbox = parse_bbox(data.get("bbox"))
+        cell_deg = float(data.get("cell_deg") or GRID_DEFAULT_CELL_DEG)
+    except (TypeError, ValueError) as e:
+        return jsonify({
+            "ok": False,
+            "error": "invalid_bbox",
+            "message": str(e)
+        }), 400
+
+    if not GRID_MIN_CELL_DEG <= cell_deg <= GRID_MAX_CELL_DEG:
+        return jsonify({
+            "ok": False,
+            "error": "invalid_cell_deg",
+            "message": f"cell_deg must be between {GRID_MIN_CELL_DEG} and {GRID_MAX_CELL_DEG}"
+        }), 400
+
+    rows, cols = grid_shape(bbox, cell_deg)
+    if rows * cols > GRID_MAX_CELLS:
+        return jsonify({
+            "ok": False,
+            "error": "too_many_cells",
+            "message": f"At most {GRID_MAX_CELLS} cells are allowed per request, got {rows * cols}"
+        }), 400
+
+    # one Open-Meteo location per weather node, whatever the cell size
+    weather_points = len(_grid_weather_nodes(bbox, *grid_cell_centres(bbox, cell_deg, rows, cols))[0])
+    if weather_points > GRID_MAX_WEATHER_POINTS:
+        return jsonify({
+            "ok": False,
+            "error": "too_many_weather_points",
+            "message": f"At most {GRID_MAX_WEATHER_POINTS} weather points ({GRID_WEATHER_DEG} deg) are allowed per request, got {weather_points}"
+        }), 400
+
+    if out_format not in ("json", "npz", "png"):
+        return jsonify({
+            "ok": False,
+            "error": "invalid_format",
+            "message": "format must be json, npz or png"
+        }), 400
+
+    try:
+        # the centre of the box must be inside Saudi Arabia
+        _ensure_inside_saudi((bbox[1] + bbox[3]) / 2, (bbox[0] + bbox[2]) / 2)
+
+        if out_format == "json":
+            if wants_async(data, request.args):
+                return submit_job_response("fire-prediction-grid", user_id, {
+                    "bbox": list(bbox),
+                    "cell_deg": cell_deg,
+                    "when_iso": when_iso
+                })
+            return jsonify(compute_fire_risk_grid(bbox, cell_deg, when_iso)), 200
+
+        arrays, meta, path = predict_fire_risk_grid(bbox, cell_deg, when_iso)
+        if out_format == "npz":
+            return Response(
+                path.read_bytes(),
+                mimetype="application/octet-stream",
+                headers={"Content-Disposition": f"attachment; filename=fire_risk_{meta['day']}.npz"}
+            )
+        return Response(class_png(arrays["risk_class"], GRID_PALETTE), mimetype="image/png")
+
+    except OutsideSaudiError as e:
+        return jsonify({
+            "ok": False,
+            "error": "outside_saudi",
+            "message": str(e)
+        }), 400
+
+    except Exception as e:
+        print(f">>> ERROR in /fire-prediction/grid for user {user_id}")
+        traceback.print_exc()
+        return jsonify({
+            "ok": False,
+            "error": "internal_server_error",
+            "message": str(e)
+        }), 500
@@ -1,7 +1,20 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, Response, request, jsonify, g
+from datetime import datetime, timedelta, timezone
 import ee
+import numpy as np
 import traceback
 from auth_utils import login_required
+from job_utils import register_job_handler, submit_job_response, wants_async
+from fwi_utils import DC_START, DMC_START, FFMC_START, FWI_CODES, fwi_cell, fwi_series, get_fwi_state_store
+from scheduler_utils import run_daily
+from threat_utils import (
+    FRP_PENDING_TTL_S, SPREAD_PENDING_TTL_S, THREAT_COMPONENTS, THREAT_LEVELS, component_cell, fire_power_expiry,
+    get_component_cache, normalize_weights, parse_weight_sets, score_grid, spread_index_expiry, threat_classes,
+    threat_response
+)
+from tile_utils import (
+    class_png, grid_cell_centres, grid_shape, grid_spec, load_tile, parse_bbox, prune_tiles, save_tile, tile_path
+)
 
 fire_threat_bp = Blueprint("fire_threat", __name__) #fire threat blue print
 
@@ -12,6 +25,40 @@ FRP_MAX = 200.0
 POP_MAX = 500.0
 FWI_CAP = 50.0
 
+# days of weather the moisture codes are spun up over before the requested day
+FWI_SPINUP_DAYS = 14
+
+# "numpy": the daily weather of the point is fetched once and the FWI codes are computed locally (fwi_utils),
+# "earth_engine": the codes are iterated image-wide on the server
+FWI_ENGINE = "numpy"
+
+# last FFMC/DMC/DC of every cell kept on disk, a request only iterates the days after the stored state
+FWI_STATE_ENABLED = True
+FWI_STATE_HOUR_UTC = 6 # daily advance of the stored cells
+FWI_STATE_CELLS_PER_EVALUATION = 100
+FWI_STATE_KEEP_DAYS = 60
+
+# exposure and slope factor kept for good per cell, fire power per cell and VIIRS day (threat_utils.ComponentCache)
+COMPONENT_CACHE_ENABLED = True
+
+# values of every day of the optional daily series of a threat request
+SERIES_BANDS = ("T", "RH", "W", "R") + FWI_CODES
+CACHED_COMPONENTS = ("fire_power", "spread_index", "exposure", "slope_factor")
+
+# threat grid of a bounding box
+GRID_DEFAULT_CELL_DEG = 0.01 # ~1 km
+GRID_MIN_CELL_DEG = 0.005
+GRID_MAX_CELL_DEG = 0.1 # the whole Kingdom fits in one tile of ~210 x 160 cells
+GRID_MAX_CELLS = 40000 # 200 x 200 cells
+
+# colours of the PNG tile by threat class: no data, low, medium, high
+GRID_PALETTE = [
+    (0, 0, 0, 0),
+    (253, 216, 53, 150),
+    (251, 140, 0, 190),
+    (198, 40, 40, 220)
+]
+
 # Weights
 W_FIRE = 0.25
 W_SPREAD = 0.35
@@ -74,18 +121,18 @@ def ffmc_next(ffmc_prev, T_c, RH, W_kmh, R_mm):
     # Rain effect (only if rain > 0.5 mm)
     rf = ee.Image(R_mm).subtract(0.5).max(0)
 
-    # Calculate moisture increase after rainfall (standard FWI formula)
-    mr1 = mo.expression(
+    # Calculate moisture increase after rainfall (standard FWI formula), no change without rain
+    mr1 = mo.where(rf.gt(0), mo.expression(
         "mo + 42.5*rf*exp(-100.0/(251.0-mo))*(1-exp(-6.93/rf))",
         {"mo": mo, "rf": rf}
-    )
+    ))
     # Additional adjustment for very wet fuels
     mr2 = mr1.expression(
         "mr1 + 0.0015*(mo-150.0)**2*sqrt(rf)",
         {"mr1": mr1, "mo": mo, "rf": rf}
     )
     # Apply conditional rain correction
-    mr = ee.Image(ee.Algorithms.If(mo.gt(150), mr2, mr1)).min(250)
+    mr = mr1.where(mo.gt(150), mr2).min(250)
 
     # Drying/wetting equilibrium
     Ed = T_c.expression(
@@ -115,12 +162,8 @@ def ffmc_next(ffmc_prev, T_c, RH, W_kmh, R_mm):
     m_wet = Ew.subtract(Ew.subtract(mr).multiply(kw.multiply(-1).exp())) # Moisture after wetting
     m_mid = mr # Keep moisture unchanged
 
-    m = ee.Image(
-        ee.Algorithms.If(
-            mr.gt(Ed), m_dry,
-            ee.Algorithms.If(mr.lt(Ew), m_wet, m_mid)
-        )
-    )
+    # per pixel: drying above Ed, wetting below Ew, unchanged in between
+    m = m_mid.where(mr.lt(Ew), m_wet).where(mr.gt(Ed), m_dry)
 
     ffmc = m.expression("(59.5*(250.0-m))/(147.2+m)", {"m": m})
     return ee.Image(ffmc).clamp(0, 101)
@@ -193,12 +236,7 @@ def dmc_next(dmc_prev, T_c, RH, R_mm, lat, date):
     b_13c = P0.expression("6.2*log(P) - 17.2", {"P": P0})              
 
     # Select the correct b equation based on the previous DMC value
-    b = ee.Image(
-        ee.Algorithms.If(
-            P0.lte(33), b_13a,
-            ee.Algorithms.If(P0.lte(65), b_13b, b_13c)
-        )
-    )
+    b = b_13a.where(P0.gt(33), b_13b).where(P0.gt(65), b_13c)
 
     # Calculate moisture content after rainfall
     Mr = Mo.add(re.multiply(1000).divide(ee.Image.constant(48.77).add(b.multiply(re))))
@@ -210,7 +248,7 @@ def dmc_next(dmc_prev, T_c, RH, R_mm, lat, date):
     Pr = Pr.max(0)
 
     # Use rainfall-adjusted DMC if rain is significant; otherwise use previous DMC
-    P_base = ee.Image(ee.Algorithms.If(rain_event, Pr, P0))
+    P_base = P0.where(rain_event, Pr)
     # Add the daily drying effect to get the updated DMC
     P = P_base.add(K.multiply(100))
 
@@ -228,7 +266,7 @@ def dc_next(dc_prev, T, R):
     dc_rain = dc_prev.subtract(re.multiply(400).divide(re.add(800))) # Calculate DC after rainfall effect
     dc_no_rain = dc_prev.add(T.multiply(0.05)) # Calculate DC when there is no significant rain
 
-    return ee.Image(ee.Algorithms.If(R.gt(2.8), dc_rain, dc_no_rain)).max(0)
+    return dc_no_rain.where(R.gt(2.8), dc_rain).max(0)
 
 def bui_from_dmc_dc(dmc, dc):
     # Convert to an Earth Engine image
@@ -255,7 +293,7 @@ def bui_from_dmc_dc(dmc, dc):
         )
     )
     # Select the correct BUI formula based on the relationship between DMC and DC
-    bui = ee.Image(ee.Algorithms.If(dmc.lte(c04dc), bui_case1, bui_case2))
+    bui = bui_case1.where(dmc.gt(c04dc), bui_case2)
     return bui.max(0)
 
 def fwi_from_isi_bui(isi, bui):
@@ -271,7 +309,7 @@ def fwi_from_isi_bui(isi, bui):
         )
     )
     # Select the correct drying factor based on the BUI value
-    fD = ee.Image(ee.Algorithms.If(bui.lte(80), fD_case1, fD_case2))
+    fD = fD_case1.where(bui.gt(80), fD_case2)
     # Calculate the intermediate fire intensity value
     B = isi.multiply(fD).multiply(0.1)
     # Use B directly when it is less than or equal to 1
@@ -282,7 +320,7 @@ def fwi_from_isi_bui(isi, bui):
     ).exp()
 
     # Select the correct FWI formula based on the B value
-    fwi = ee.Image(ee.Algorithms.If(B.lte(1), fwi_case1, fwi_case2))
+    fwi = fwi_case1.where(B.gt(1), fwi_case2)
     return fwi.max(0)
 
 
@@ -295,29 +333,27 @@ def compute_threat_score(fire_power, spread_index, exposure, w_fire, w_spread, w
     )
 
 # Core compute
-def compute_fire_threat(lat: float, lon: float, when_iso: str, w_fire: float, w_spread: float, w_exposure: float):
-    # Create the area of interest around the selected location
-    AOI = ee.Geometry.Point([lon, lat]).buffer(BUFFER_M)
-    # Time setup 
-    WHEN = ee.Date(when_iso)
-    DAY_START = ee.Date(WHEN.format("YYYY-MM-dd"))
-    DAY_END   = DAY_START.advance(1, "day")
 
-    # Load VIIRS active fire data for the selected area and day
-    active_fire_collection = (
+# VIIRS active fire images of the selected area and day
+def viirs_fire_collection(AOI, DAY_START, DAY_END):
+    return (
         ee.ImageCollection("NASA/VIIRS/002/VNP14A1")
         .filterBounds(AOI)
         .filterDate(DAY_START, DAY_END)
     )
 
+# Load VIIRS active fire data for the selected area and day, normalized max FRP
+def fire_power_in_aoi(AOI, DAY_START, DAY_END):
+    active_fire_collection = viirs_fire_collection(AOI, DAY_START, DAY_END)
+
     # Use the first fire image if data exists; otherwise create an empty image, make sure its not null
     active_fire_img = ee.Image(
-    ee.Algorithms.If(
-        active_fire_collection.size().gt(0),
-        active_fire_collection.first(),
-        ee.Image.constant([0, 0]).rename(["FireMask", "MaxFRP"])
+        ee.Algorithms.If(
+            active_fire_collection.size().gt(0),
+            active_fire_collection.first(),
+            ee.Image.constant([0, 0]).rename(["FireMask", "MaxFRP"])
+        )
     )
-)
 
     # Select active fire pixels only; FireMask values 7, 8, and 9 indicate active fire
     fire_mask = active_fire_img.select("FireMask").gte(7)
@@ -333,12 +369,10 @@ def compute_fire_threat(lat: float, lon: float, when_iso: str, w_fire: float, w_
 
     # Replace null FRP values with 0 to avoid calculation errors
     frp_max = safe_number(frp_max, 0)
-    fire_power = normalize(frp_max, FRP_MAX)
-
-    # ---------- FWI spin-up (daily, 14 days before fire day) ----------
-    FWI_START = DAY_START.advance(-14, "day")
-    FWI_END   = DAY_END
+    return normalize(frp_max, FRP_MAX)
 
+# Daily ERA5-Land weather of the FWI spin-up window: (ERA5 collection, list of dates, function date -> daily T/RH/W/R image)
+def era5_daily_weather(AOI, FWI_START, FWI_END):
     # Load ERA5-Land weather data
     era_ic = (ee.ImageCollection("ECMWF/ERA5_LAND/HOURLY")
               .filterBounds(AOI)
@@ -377,13 +411,42 @@ def compute_fire_threat(lat: float, lon: float, when_iso: str, w_fire: float, w_
     dates = ee.List.sequence(0, n_days.subtract(1)).map(
         lambda d: ee.Date(FWI_START).advance(ee.Number(d), "day")
     )
+    return era_ic, dates, daily_fwi_weather
+
+# Slope modifier of the spread index, 1.0 on flat ground up to 1.3 on 45 degrees and more
+def slope_factor_image():
+    # Load the Digital Elevation Model (DEM) data
+    dem = ee.Image("USGS/SRTMGL1_003")
+    # Calculate the slope degree from the elevation data
+    slope = ee.Terrain.slope(dem)
+    return slope.divide(45).clamp(0, 1).multiply(0.3).add(1.0)
+
+# Exposure (WorldPop), normalized mean population in the AOI
+def exposure_in_aoi(AOI):
+    population = (
+        ee.ImageCollection("WorldPop/GP/100m/pop")
+        .filterDate("2020-01-01", "2021-01-01")
+        .mean()
+    )
+
+    pop_mean = mean_in_aoi(population, AOI, 100)
+    return normalize(pop_mean, POP_MAX)
+
+def _threat_components_ee(AOI, lat, DAY_START, DAY_END, include_series=False):
+    fire_power = fire_power_in_aoi(AOI, DAY_START, DAY_END)
+
+    # ---------- FWI spin-up (daily, 14 days before fire day) ----------
+    FWI_START = DAY_START.advance(-FWI_SPINUP_DAYS, "day")
+    FWI_END   = DAY_END
+
+    _, dates, daily_fwi_weather = era5_daily_weather(AOI, FWI_START, FWI_END)
     daily = ee.ImageCollection(dates.map(daily_fwi_weather))
 
     # ---- Iterate FWI over DAILY collection ----
     # Initial values
-    FFMC0 = ee.Image.constant(85)
-    DMC0  = ee.Image.constant(6)
-    DC0   = ee.Image.constant(15)
+    FFMC0 = ee.Image.constant(FFMC_START)
+    DMC0  = ee.Image.constant(DMC_START)
+    DC0   = ee.Image.constant(DC_START)
 
     def step(img, state):
         # Convert the current state to an Earth Engine dictionary
@@ -438,47 +501,404 @@ def compute_fire_threat(lat: float, lon: float, when_iso: str, w_fire: float, w_
     fwi_day_img = day_img.select("FWI")
 
     # ---- Slope modifier
-    # Load the Digital Elevation Model (DEM) data
-    dem = ee.Image("USGS/SRTMGL1_003")
-    # Calculate the slope degree from the elevation data
-    slope = ee.Terrain.slope(dem)
-    slope_factor = slope.divide(45).clamp(0, 1).multiply(0.3).add(1.0)
-
     fwi_norm = fwi_day_img.divide(FWI_CAP).clamp(0, 1)
-    spread_img = fwi_norm.multiply(slope_factor).clamp(0, 1)
+    spread_img = fwi_norm.multiply(slope_factor_image()).clamp(0, 1)
     spread_index = mean_in_aoi(spread_img, AOI, 500)
 
     # ---- Exposure (WorldPop)
-    population = (
-        ee.ImageCollection("WorldPop/GP/100m/pop")
-        .filterDate("2020-01-01", "2021-01-01")
-        .mean()
-    )
+    exposure = exposure_in_aoi(AOI)
 
-    pop_mean = mean_in_aoi(population, AOI, 100)
-    exposure = normalize(pop_mean, POP_MAX)
+    # the three components, and the daily series when asked for, in one evaluation, the weights are applied locally
+    values = {
+        "fire_power": fire_power,
+        "spread_index": spread_index,
+        "exposure": exposure
+    }
+    if include_series:
+        def day_values(img):
+            img = ee.Image(img)
+            return img.reduceRegion(
+                reducer=ee.Reducer.mean(),
+                geometry=AOI,
+                scale=500,
+                bestEffort=True,
+                maxPixels=1e9
+            ).set("time", img.get("system:time_start"))
+        values["series"] = fwi_daily.toList(FWI_SPINUP_DAYS + 1).map(day_values)
+    values = ee.Dictionary(values).getInfo() or {}
+
+    components = {name: float(values.get(name) or 0.0) for name in THREAT_COMPONENTS}
+    if not include_series:
+        return components, None
+    daily = values.get("series") or []
+    days = [datetime.fromtimestamp(item["time"] / 1000, timezone.utc).date() for item in daily]
+    table = {band: np.array([np.nan if item.get(band) is None else float(item[band]) for item in daily]) for band in SERIES_BANDS}
+    return components, series_rows(days, table)
+
+# ---------- FWI state per cell (fwi_utils.FwiStateStore) ----------
+
+def _utc_day(when_iso):
+    when = datetime.fromisoformat(str(when_iso).replace("Z", "+00:00"))
+    if when.tzinfo is not None:
+        when = when.astimezone(timezone.utc)
+    return when.date()
+
+def _parse_point(lat, lon, when_iso):
+    # (lat, lon) as floats, ValueError for values that are not coordinates or a bad datetime
+    try:
+        lat, lon = float(lat), float(lon)
+        _utc_day(when_iso)
+    except (TypeError, ValueError):
+        raise ValueError("lat/lon must be numbers and datetime an ISO date")
+    if not (-90 <= lat <= 90 and -180 <= lon <= 180):
+        raise ValueError("lat/lon out of range")
+    return lat, lon
+
+def cell_aoi(cell_lat, cell_lon):
+    return ee.Geometry.Point([cell_lon, cell_lat]).buffer(BUFFER_M)
+
+# ee.List with the mean T/RH/W/R of every day from first_day to last_day (dates),
+# days without ERA5-Land data (the last few days before today) give an empty dictionary
+def daily_weather_values(AOI, first_day, last_day):
+    FWI_START = ee.Date(first_day.isoformat())
+    FWI_END = ee.Date((last_day + timedelta(days=1)).isoformat())
+    era_ic, dates, daily_fwi_weather = era5_daily_weather(AOI, FWI_START, FWI_END)
+
+    def daily_values(date):
+        date = ee.Date(date)
+        values = daily_fwi_weather(date).reduceRegion(
+            reducer=ee.Reducer.mean(),
+            geometry=AOI,
+            scale=500,
+            bestEffort=True,
+            maxPixels=1e9
+        )
+        has_data = era_ic.filterDate(date, date.advance(1, "day")).size().gt(0)
+        return ee.Dictionary(ee.Algorithms.If(has_data, values, ee.Dictionary({})))
+
+    return dates.map(daily_values)
+
+# one dictionary per day with the weather and the six codes, None where the day had no weather
+def series_rows(days, values):
+    return [
+        {"date": day.isoformat(), **{
+            band: None if np.isnan(values[band][i]) else round(float(values[band][i]), 4) for band in SERIES_BANDS
+        }}
+        for i, day in enumerate(days)
+    ]
+
+# Run the fetched days (first_day onwards) from the stored state of the cell, or from the start values without one,
+# and save every day that had weather. Returns (day and codes of the last day with weather or of the state, rows saved,
+# weather and codes of every fetched day)
+def advance_fwi_state(store, cell_lat, cell_lon, state, first_day, daily):
+    if state is not None:
+        base_day, codes, base_spinup = state
+        ffmc0, dmc0, dc0 = codes["FFMC"], codes["DMC"], codes["DC"]
+    else:
+        base_day, codes, base_spinup = first_day - timedelta(days=1), None, 0
+        ffmc0, dmc0, dc0 = FFMC_START, DMC_START, DC_START
+
+    days = [first_day + timedelta(days=i) for i in range(len(daily))]
+    inputs = {
+        band: np.array([np.nan if values.get(band) is None else float(values[band]) for values in daily])
+        for band in ("T", "RH", "W", "R")
+    }
+    series = fwi_series(inputs["T"], inputs["RH"], inputs["W"], inputs["R"], cell_lat,
+                        [day.timetuple().tm_yday for day in days], ffmc0, dmc0, dc0)
+
+    codes_day = base_day if state is not None else None
+    rows = []
+    for i, day in enumerate(days):
+        if np.isnan(series["FWI"][i]):
+            continue
+        codes_day, codes = day, {code: float(series[code][i]) for code in FWI_CODES}
+        rows.append((day, codes, base_spinup + (day - base_day).days))
+
+    if rows and store is not None:
+        store.save(cell_lat, cell_lon, rows)
+    return codes_day, codes, len(rows), series_rows(days, {**inputs, **series})
+
+# Daily job: every cell asked for in the last FWI_SPINUP_DAYS is moved on from its newest state to yesterday,
+# usually one day. ERA5-Land lags a few days behind, days it does not cover yet are tried again the next day
+def advance_fwi_states(today=None):
+    store = get_fwi_state_store()
+    today = today or datetime.now(timezone.utc).date()
+    yesterday = today - timedelta(days=1)
+    cells = [cell for cell in store.cells(since=yesterday - timedelta(days=FWI_SPINUP_DAYS)) if cell[2] < yesterday]
+
+    advanced = 0
+    for start in range(0, len(cells), FWI_STATE_CELLS_PER_EVALUATION):
+        chunk = cells[start:start + FWI_STATE_CELLS_PER_EVALUATION]
+        try:
+            daily = ee.List([
+                daily_weather_values(cell_aoi(lat, lon), last_day + timedelta(days=1), yesterday)
+                for lat, lon, last_day in chunk
+            ]).getInfo() or []
+            for (lat, lon, last_day), days in zip(chunk, daily):
+                _, _, saved, _ = advance_fwi_state(store, lat, lon, store.latest(lat, lon, last_day, 0),
+                                             last_day + timedelta(days=1), days or [])
+                advanced += saved > 0
+        except Exception:
+            print(f">>> ERROR advancing FWI state of {len(chunk)} cells:\n{traceback.format_exc()}")
+
+    store.prune(today - timedelta(days=FWI_STATE_KEEP_DAYS))
+    return {"cells": len(cells), "advanced": advanced}
+
+def start_fwi_state_advance():
+    return run_daily("fwi-state-advance", advance_fwi_states, hour_utc=FWI_STATE_HOUR_UTC, run_now=False)
+
+# Fire power, exposure, slope factor and the daily weather the cell's FWI state is missing, from Earth Engine
+# in one evaluation, then the FWI codes and the spread index computed locally with fwi_utils.
+# with the component cache only the components it does not hold are asked for, taken around the cell centre
+# include_series: the whole spin-up window is fetched and iterated again, returned as the daily series
+def _threat_components_local(AOI, lat, lon, day, DAY_START, DAY_END, include_series=False):
+    cache = get_component_cache() if COMPONENT_CACHE_ENABLED else None
+    cached = {}
+    if cache is not None:
+        comp_lat, comp_lon = component_cell(lat, lon)
+        AOI = ee.Geometry.Point([comp_lon, comp_lat]).buffer(BUFFER_M)
+        cached = cache.get(lat, lon, day, CACHED_COMPONENTS)
+
+    values = {}
+    if "fire_power" not in cached:
+        values["fire_power"] = fire_power_in_aoi(AOI, DAY_START, DAY_END)
+        if cache is not None:
+            values["frp_images"] = viirs_fire_collection(AOI, DAY_START, DAY_END).size()
+    if "exposure" not in cached:
+        values["exposure"] = exposure_in_aoi(AOI)
+
+    need_spread = "spread_index" not in cached or include_series
+    series = None
+    if need_spread:
+        cell_lat, cell_lon = fwi_cell(lat, lon)
+        store = get_fwi_state_store() if FWI_STATE_ENABLED else None
+        if include_series:
+            # the window starts from the state of the day before it when there is one
+            first_day = day - timedelta(days=FWI_SPINUP_DAYS)
+            state = store.latest(cell_lat, cell_lon, first_day - timedelta(days=1), 0) if store is not None else None
+        else:
+            state = store.latest(cell_lat, cell_lon, day, FWI_SPINUP_DAYS) if store is not None else None
+            # a recent state leaves one or two days to iterate, without one the codes are spun up from the start values
+            first_day = state[0] + timedelta(days=1) if state is not None else day - timedelta(days=FWI_SPINUP_DAYS)
+
+        if "slope_factor" not in cached:
+            values["slope_factor"] = mean_in_aoi(slope_factor_image(), AOI, 500, default=1)
+        if first_day <= day:
+            values["daily"] = daily_weather_values(cell_aoi(cell_lat, cell_lon), first_day, day)
+    values = {**((ee.Dictionary(values).getInfo() or {}) if values else {}), **cached}
+
+    components = {
+        "fire_power": float(values.get("fire_power") or 0.0),
+        "exposure": float(values.get("exposure") or 0.0),
+        "spread_index": values.get("spread_index")
+    }
+    if need_spread:
+        # FWI of the requested day, or of the last day ERA5-Land already covers
+        codes_day, codes, _, series = advance_fwi_state(store, cell_lat, cell_lon, state, first_day, values.get("daily") or [])
+        fwi_day = codes["FWI"] if codes is not None else 0.0
+        slope_factor = float(values.get("slope_factor") or 1.0)
+        spread_index = min(max(fwi_day / FWI_CAP, 0.0), 1.0) * slope_factor
+        components["spread_index"] = min(max(spread_index, 0.0), 1.0)
+
+    if cache is not None:
+        static = {name: values[name] for name in ("exposure", "slope_factor") if name not in cached and values.get(name) is not None}
+        if static:
+            cache.set(lat, lon, day, static)
+        if "fire_power" not in cached and values.get("fire_power") is not None:
+            cache.set(lat, lon, day, {"fire_power": values["fire_power"]}, fire_power_expiry(values.get("frp_images")))
+        if need_spread:
+            cache.set(lat, lon, day, {"spread_index": components["spread_index"]}, spread_index_expiry(codes_day == day))
+    return components, series
+
+# Components of a point and day already in the cache, None when one of them is missing
+def cached_threat_components(lat, lon, when_iso):
+    if not COMPONENT_CACHE_ENABLED:
+        return None
+    components = get_component_cache().get(lat, lon, _utc_day(when_iso), THREAT_COMPONENTS)
+    return components if len(components) == len(THREAT_COMPONENTS) else None
+
+def compute_fire_threat(lat: float, lon: float, when_iso: str, w_fire: float, w_spread: float, w_exposure: float,
+                        weight_sets=None, include_series=False):
+    # Create the area of interest around the selected location
+    AOI = ee.Geometry.Point([lon, lat]).buffer(BUFFER_M)
+    # Time setup 
+    WHEN = ee.Date(when_iso)
+    DAY_START = ee.Date(WHEN.format("YYYY-MM-dd"))
+    DAY_END   = DAY_START.advance(1, "day")
 
-    # Threat Score
-    threat_score = compute_threat_score(
-    fire_power, spread_index, exposure,
-    w_fire, w_spread, w_exposure
+    if FWI_ENGINE == "numpy":
+        components, series = _threat_components_local(AOI, lat, lon, _utc_day(when_iso), DAY_START, DAY_END, include_series)
+    else:
+        components, series = _threat_components_ee(AOI, lat, DAY_START, DAY_END, include_series)
+
+    out = threat_response(components, (w_fire, w_spread, w_exposure), weight_sets)
+    if include_series:
+        # weather and FWI codes of every day of the spin-up window, for the trend charts of the Details page
+        out["series"] = series
+    return out
+
+
+# -----------------------------
+# THREAT GRID
+# -----------------------------
+
+GRID_CLASSES = ("no_data",) + THREAT_LEVELS
+GRID_WEATHER = ("T", "RH", "W", "R")
+
+def _grid_days(day):
+    # the FWI spin-up window of a grid, the requested day last
+    return [day - timedelta(days=FWI_SPINUP_DAYS - i) for i in range(FWI_SPINUP_DAYS + 1)]
+
+# fire power, exposure, slope factor and the daily weather of the spin-up window as bands of one image.
+# exposure and slope factor are the means of the BUFFER_M disc around every cell, like a point request,
+# fire power is the max of the cell so a fire between two cell centres is not lost
+def _build_threat_grid_image(bbox, day):
+    region = ee.Geometry.Rectangle(list(bbox))
+    DAY_START = ee.Date(day.isoformat())
+    DAY_END = DAY_START.advance(1, "day")
+
+    viirs = viirs_fire_collection(region, DAY_START, DAY_END)
+    fire_img = ee.Image(ee.Algorithms.If(
+        viirs.size().gt(0),
+        viirs.mosaic(),
+        ee.Image.constant([0, 0]).rename(["FireMask", "MaxFRP"])
+    ))
+    # the max is taken over the native 1 km pixels of each output cell, not over pixels resampled to the cell size
+    native = ee.Image(ee.ImageCollection("NASA/VIIRS/002/VNP14A1").first()).projection()
+    frp = fire_img.select("MaxFRP").updateMask(fire_img.select("FireMask").gte(7)).unmask(0)
+    fire_power = (
+        frp.setDefaultProjection(native)
+        .reduceResolution(reducer=ee.Reducer.max(), maxPixels=1024)
+        .divide(FRP_MAX).clamp(0, 1).rename("fire_power")
     )
 
-    threat_level = ee.Algorithms.If(
-        threat_score.lt(0.33), "منخفضة",
-        ee.Algorithms.If(threat_score.lt(0.66), "متوسطة", "عالية")
-    )
+    population = ee.ImageCollection("WorldPop/GP/100m/pop").filterDate("2020-01-01", "2021-01-01").mean()
+    disc = ee.Kernel.circle(BUFFER_M, "meters")
+    exposure = population.reduceNeighborhood(reducer=ee.Reducer.mean(), kernel=disc).divide(POP_MAX).clamp(0, 1).rename("exposure")
+    slope_factor = slope_factor_image().reduceNeighborhood(reducer=ee.Reducer.mean(), kernel=disc).rename("slope_factor")
 
-    # Output
-    result = {
-        "threat_score": threat_score.getInfo(),
-        "threat_level": threat_level.getInfo(),
+    days = _grid_days(day)
+    era_ic, _, daily_fwi_weather = era5_daily_weather(
+        region, ee.Date(days[0].isoformat()), ee.Date((day + timedelta(days=1)).isoformat())
+    )
+    bands = [fire_power, exposure, slope_factor, ee.Image.constant(viirs.size()).rename("frp_images")]
+    for i, weather_day in enumerate(days):
+        date = ee.Date(weather_day.isoformat())
+        # days without ERA5-Land data are masked
+        has_data = era_ic.filterDate(date, date.advance(1, "day")).size().gt(0)
+        weather = ee.Image(ee.Algorithms.If(
+            has_data,
+            daily_fwi_weather(date).select(list(GRID_WEATHER)),
+            ee.Image.constant([0] * len(GRID_WEATHER)).rename(list(GRID_WEATHER)).updateMask(0)
+        ))
+        bands.append(weather.rename([f"{band}_{i}" for band in GRID_WEATHER]))
+
+    return ee.Image.cat(bands).toFloat().unmask(-9999)
+
+def _sample_threat_grid(bbox, cell_deg, rows, cols, day):
+    # every band of every cell with one computePixels request, NaN where there is no data
+    pixels = ee.data.computePixels({
+        "expression": _build_threat_grid_image(bbox, day),
+        "fileFormat": "NUMPY_NDARRAY",
+        "grid": grid_spec(bbox, cell_deg, rows, cols)
+    })
+    names = ["fire_power", "exposure", "slope_factor", "frp_images"] + [
+        f"{band}_{i}" for i in range(len(_grid_days(day))) for band in GRID_WEATHER
+    ]
+    bands = {name: np.asarray(pixels[name], dtype=float) for name in names}
+    return {name: np.where(values == -9999, np.nan, values) for name, values in bands.items()}
+
+def threat_grid_components(bbox, cell_deg, day):
+    # (component arrays, meta) of a box and day, read from the tile cache when it is there
+    rows, cols = grid_shape(bbox, cell_deg)
+    path = tile_path("threat-components", day, [round(v, 4) for v in bbox], cell_deg)
+    cached = load_tile(path)
+    if cached is not None:
+        return cached
+
+    bands = _sample_threat_grid(bbox, cell_deg, rows, cols, day)
+    lats, _ = grid_cell_centres(bbox, cell_deg, rows, cols)
+    days = _grid_days(day)
+
+    # FWI codes of every cell with NumPy, the FWI of the requested day or of the last day ERA5-Land covers
+    weather = {band: np.stack([bands[f"{band}_{i}"] for i in range(len(days))]) for band in GRID_WEATHER}
+    series = fwi_series(weather["T"], weather["RH"], weather["W"], weather["R"], lats,
+                        [d.timetuple().tm_yday for d in days])
+    fwi_day = np.zeros((rows, cols))
+    for d in range(len(days)):
+        fwi_day = np.where(np.isnan(series["FWI"][d]), fwi_day, series["FWI"][d])
+
+    no_data = np.isnan(bands["exposure"]) | np.isnan(bands["slope_factor"])
+    spread_index = np.clip(np.clip(fwi_day / FWI_CAP, 0, 1) * bands["slope_factor"], 0, 1)
+    components = {
+        "fire_power": np.where(no_data, np.nan, np.nan_to_num(bands["fire_power"])),
+        "spread_index": np.where(no_data, np.nan, spread_index),
+        "exposure": bands["exposure"]
     }
-
-    return result
+    components = {name: values.astype(np.float32) for name, values in components.items()}
+
+    # final once the day is over, VIIRS has its image and ERA5-Land covers the day in every cell
+    frp_final = bool(np.nan_to_num(bands["frp_images"]).max(initial=0) > 0)
+    fwi_final = bool((~np.isnan(series["FWI"][-1]) | no_data).all())
+    now = datetime.now(timezone.utc)
+    pending = [FRP_PENDING_TTL_S] * (not frp_final or day >= now.date()) + [SPREAD_PENDING_TTL_S] * (not fwi_final)
+    expires_at = now.timestamp() + min(pending) if pending else None
+
+    meta = {
+        "bbox": list(bbox),
+        "cell_deg": cell_deg,
+        "rows": rows,
+        "cols": cols,
+        "day": day.isoformat(),
+        "fwi_days": len(days),
+        "expires_at": expires_at
+    }
+    save_tile(path, components, meta, expires_at)
+    prune_tiles("threat-components")
+    return components, meta
+
+def predict_fire_threat_grid(bbox, cell_deg=GRID_DEFAULT_CELL_DEG, when_iso=None, weights=(W_FIRE, W_SPREAD, W_EXPOSURE)):
+    # threat tile of a box, day and weight set: (arrays, meta, tile path).
+    # the components are shared by every weight set of the day, so new weights never go to Earth Engine
+    day = _utc_day(when_iso) if when_iso else datetime.now(timezone.utc).date()
+    weights = tuple(round(float(w), 6) for w in weights)
+    path = tile_path("threat", day, [round(v, 4) for v in bbox], cell_deg, weights)
+    cached = load_tile(path)
+    if cached is not None:
+        return cached[0], cached[1], path
+
+    components, component_meta = threat_grid_components(tuple(bbox), cell_deg, day)
+    threat_score = score_grid(components, weights).astype(np.float32)
+    threat_class = threat_classes(threat_score)
+    counts = np.bincount(threat_class.ravel(), minlength=len(GRID_CLASSES))
+
+    meta = dict(
+        component_meta,
+        weights=dict(zip(("w_fire", "w_spread", "w_exposure"), weights)),
+        classes=list(GRID_CLASSES),
+        counts={name: int(count) for name, count in zip(GRID_CLASSES, counts)}
+    )
+    arrays = {**components, "threat_score": threat_score, "threat_class": threat_class}
+    save_tile(path, arrays, meta, component_meta.get("expires_at"))
+    prune_tiles("threat")
+    return arrays, meta, path
+
+def compute_fire_threat_grid(bbox, cell_deg=GRID_DEFAULT_CELL_DEG, when_iso=None, w_fire=W_FIRE, w_spread=W_SPREAD, w_exposure=W_EXPOSURE):
+    # JSON form of the threat tile, also the async job handler
+    arrays, meta, _ = predict_fire_threat_grid(tuple(bbox), cell_deg, when_iso, (w_fire, w_spread, w_exposure))
+    threat_score = np.round(arrays["threat_score"].astype(float), 4)
+    return dict(
+        meta,
+        ok=True,
+        threat_score=[[None if np.isnan(v) else float(v) for v in row] for row in threat_score],
+        threat_class=arrays["threat_class"].tolist()
+    )
 
 
 # Route
+register_job_handler("fire-threat", compute_fire_threat)
+register_job_handler("fire-threat-grid", compute_fire_threat_grid)
+
 @fire_threat_bp.route("/fire-threat", methods=["POST"])
 @login_required
 def fire_threat_route():
@@ -489,28 +909,132 @@ def fire_threat_route():
     lon = data.get("lon")
     when_iso = data.get("datetime")
 
-    # ---- user weights ----
-    def clamp(x, lo, hi):
-        return max(lo, min(hi, x))
-
-    w_fire = clamp(float(data.get("w_fire", W_FIRE)), 0.10, 1.0)
-    w_spread = clamp(float(data.get("w_spread", W_SPREAD)), 0.10, 1.0)
-    w_exposure = clamp(float(data.get("w_exposure", W_EXPOSURE)), 0.10, 1.0)
-
-    total = w_fire + w_spread + w_exposure
-    w_fire /= total
-    w_spread /= total
-    w_exposure /= total
+    # optional daily weather and FWI codes of the spin-up window
+    include_series = str(data.get("series", request.args.get("series", ""))).lower() in ("1", "true", "yes")
 
     # ---- validation ----
     if lat is None or lon is None or not when_iso:
         return jsonify({"error": "Missing lat/lon/datetime"}), 400
 
     try:
-        out = compute_fire_threat(float(lat), float(lon), str(when_iso), w_fire, w_spread, w_exposure)
+        lat, lon = _parse_point(lat, lon, when_iso)
+        # ---- user weights ----
+        w_fire, w_spread, w_exposure = normalize_weights(
+            data.get("w_fire", W_FIRE), data.get("w_spread", W_SPREAD), data.get("w_exposure", W_EXPOSURE)
+        )
+        # optional extra weight sets, each scored on the same components
+        weight_sets = parse_weight_sets(data["weights"]) if data.get("weights") is not None else None
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    try:
+        # async mode: answer with a job id and run the calculation in the worker pool
+        if wants_async(data, request.args):
+            return submit_job_response("fire-threat", g.user_uid, {
+                "lat": lat, "lon": lon, "when_iso": str(when_iso),
+                "w_fire": w_fire, "w_spread": w_spread, "w_exposure": w_exposure, "weight_sets": weight_sets,
+                "include_series": include_series
+            })
+
+        out = compute_fire_threat(lat, lon, str(when_iso), w_fire, w_spread, w_exposure, weight_sets, include_series)
         return jsonify(out), 200
 
     except Exception as e:
         tb = traceback.format_exc()
         print(">>> ERROR in fire-threat:\n", tb)
         return jsonify({"error": "calculation_failed"}), 500
+
+
+# New weights on components the client already has, or on the cached components of a point and day.
+# no Earth Engine call, only the weighted sum
+@fire_threat_bp.route("/fire-threat/rescore", methods=["POST"])
+@login_required
+def fire_threat_rescore_route():
+    data = request.get_json(silent=True) or {}
+
+    try:
+        weights = normalize_weights(
+            data.get("w_fire", W_FIRE), data.get("w_spread", W_SPREAD), data.get("w_exposure", W_EXPOSURE)
+        )
+        weight_sets = parse_weight_sets(data["weights"]) if data.get("weights") is not None else None
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    components = data.get("components")
+    if components is not None:
+        if not isinstance(components, dict) or any(not isinstance(components.get(name), (int, float)) for name in THREAT_COMPONENTS):
+            return jsonify({"error": f"components needs {', '.join(THREAT_COMPONENTS)}"}), 400
+    else:
+        if data.get("lat") is None or data.get("lon") is None or not data.get("datetime"):
+            return jsonify({"error": "Missing components or lat/lon/datetime"}), 400
+        try:
+            lat, lon = _parse_point(data["lat"], data["lon"], data["datetime"])
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        components = cached_threat_components(lat, lon, str(data["datetime"]))
+        if components is None:
+            return jsonify({"error": "components_not_cached"}), 404
+
+    return jsonify(threat_response(components, weights, weight_sets)), 200
+
+
+# route used to build the threat map of a bounding box
+@fire_threat_bp.route("/fire-threat/grid", methods=["POST"])
+@login_required
+def fire_threat_grid_route():
+    data = request.get_json(silent=True) or {}
+    when_iso = data.get("datetime")
+    out_format = str(data.get("format") or request.args.get("format") or "json").lower()
+
+    try:
+        bbox = parse_bbox(data.get("bbox"))
+        cell_deg = float(data.get("cell_deg") or GRID_DEFAULT_CELL_DEG)
+    except (TypeError, ValueError) as e:
+        return jsonify({"ok": False, "error": "invalid_bbox", "message": str(e)}), 400
+
+    if not GRID_MIN_CELL_DEG <= cell_deg <= GRID_MAX_CELL_DEG:
+        return jsonify({
+            "ok": False,
+            "error": "invalid_cell_deg",
+            "message": f"cell_deg must be between {GRID_MIN_CELL_DEG} and {GRID_MAX_CELL_DEG}"
+        }), 400
+
+    rows, cols = grid_shape(bbox, cell_deg)
+    if rows * cols > GRID_MAX_CELLS:
+        return jsonify({
+            "ok": False,
+            "error": "too_many_cells",
+            "message": f"At most {GRID_MAX_CELLS} cells are allowed per request, got {rows * cols}"
+        }), 400
+
+    if out_format not in ("json", "npz", "png"):
+        return jsonify({"ok": False, "error": "invalid_format", "message": "format must be json, npz or png"}), 400
+
+    try:
+        w_fire, w_spread, w_exposure = normalize_weights(
+            data.get("w_fire", W_FIRE), data.get("w_spread", W_SPREAD), data.get("w_exposure", W_EXPOSURE)
+        )
+    except ValueError as e:
+        return jsonify({"ok": False, "error": "invalid_weights", "message": str(e)}), 400
+
+    try:
+        if out_format == "json":
+            if wants_async(data, request.args):
+                return submit_job_response("fire-threat-grid", g.user_uid, {
+                    "bbox": list(bbox), "cell_deg": cell_deg, "when_iso": when_iso,
+                    "w_fire": w_fire, "w_spread": w_spread, "w_exposure": w_exposure
+                })
+            return jsonify(compute_fire_threat_grid(bbox, cell_deg, when_iso, w_fire, w_spread, w_exposure)), 200
+
+        arrays, meta, path = predict_fire_threat_grid(bbox, cell_deg, when_iso, (w_fire, w_spread, w_exposure))
+        if out_format == "npz":
+            return Response(
+                path.read_bytes(),
+                mimetype="application/octet-stream",
+                headers={"Content-Disposition": f"attachment; filename=fire_threat_{meta['day']}.npz"}
+            )
+        return Response(class_png(arrays["threat_class"], GRID_PALETTE), mimetype="image/png")
+
+    except Exception as e:
+        print(">>> ERROR in /fire-threat/grid:\n", traceback.format_exc())
+        return jsonify({"ok": False, "error": "internal_server_error", "message": str(e)}), 500
@@ -1,20 +1,40 @@
+import os
 from flask import Flask #import Flask calss from flask library
 from flask_cors import CORS
-from Data.predicted_fire_data import predictions_bp 
+from Data.predicted_fire_data import predictions_bp, start_prediction_rescoring # saved prediction sites, re-scored once a day
 from Data.detected_fire_data import detections_bp
 
 from Singleton.gee_connection import GEEConnection #import GEEConnection calss from gee_connection file
+from Singleton.saudi_boundary import SaudiBoundary # local Saudi boundary index used to validate points
+from Singleton.fire_archive import start_fire_archive_refresh # local daily fire-pixel archive used by the persistence check
+from Singleton.prediction_model import PredictionModel # fire prediction model, loaded at startup and swapped when a new bundle is published
 from FireSpreadEstimator import fire_spread_bluePrint #import fire_spread_bluePrint from FireSpreadEstimator file
-from FireThreatEstimator import fire_threat_bp 
+from FireThreatEstimator import fire_threat_bp, start_fwi_state_advance # FWI state of the asked cells, advanced once a day
 from FireAreaEstimator import fire_area_bp # import active fire area Blueprint
 from FireDetection import fire_detection_bp
 from FirePrediction import fire_prediction_bp
 from auth import auth_bp
+from job_utils import jobs_bp # async job mode of the heavy analysis endpoints
+from metrics_utils import init_metrics # latency histograms of routes and dependency calls
 
 GEEConnection.get_instance() # initalize google earth engine connection once turning on the server, so whenever connection needed after that it will be returned
+SaudiBoundary.get_instance() # load the local Saudi boundary index once so point checks do not need Earth Engine
+PredictionModel.get_instance() # load and warm up the model before the workers are forked (gunicorn --preload) so they share it
+
+# daily background jobs, left off with DAILY_JOBS=0 (the tests import this module)
+DAILY_JOBS_ENABLED = os.environ.get("DAILY_JOBS", "1") != "0"
+
+def start_daily_jobs():
+    start_fire_archive_refresh() # keep the last days of fire masks on disk, refreshed once a day in the background
+    start_prediction_rescoring() # current risk level of every saved prediction site, refreshed once a day in the background
+    start_fwi_state_advance() # move the stored FWI codes of every recent cell on to yesterday's weather
+
+if DAILY_JOBS_ENABLED:
+    start_daily_jobs()
 
 
 app = Flask(__name__) # create the server
+init_metrics(app) # time every request and outbound call, exposed at /metrics
 
 # enable CORS for frontend requests
 CORS(
@@ -41,6 +61,7 @@ app.register_blueprint(fire_detection_bp)
 app.register_blueprint(fire_prediction_bp)
 
 app.register_blueprint(auth_bp)
+app.register_blueprint(jobs_bp) # jobs cut by the last restart are run again by the first worker that uses the job routes
 
 if __name__ == "__main__":
     app.run(debug=True)
\ No newline at end of file
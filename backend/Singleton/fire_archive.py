@@ -0,0 +1,240 @@
+import os
+import threading
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+import numpy as np
+
+# folder of the local daily fire-pixel archive, one sub folder per fire product
+ARCHIVE_DIR = Path(__file__).resolve().parent.parent / "Cache" / "fire_archive"
+
+# Saudi Arabia bounding box covered by the archive (min_lat, min_lon, max_lat, max_lon)
+ARCHIVE_BOUNDS = (16.0, 34.0, 32.5, 56.0)
+
+# size of one archive cell in degrees (~1 km, close to the product resolution)
+ARCHIVE_CELL_DEG = 0.01
+
+# number of past days kept, enough for the persistence window of any request made today
+ARCHIVE_DAYS = 10
+
+# refresh the archive once a day at this UTC hour
+ARCHIVE_REFRESH_HOUR_UTC = 3
+
+# NRT pixels of a day keep coming in for about this long, so these last days are fetched again on every refresh
+ARCHIVE_LATENCY_DAYS = 2
+
+
+def days_in_window(start_dt, end_dt):
+    # daily products are stamped at 00:00 UTC, so a [start, end) window holds every day whose midnight is inside it
+    first = datetime(start_dt.year, start_dt.month, start_dt.day, tzinfo=timezone.utc)
+    if first < start_dt:
+        first += timedelta(days=1)
+
+    days = []
+    day = first
+    while day < end_dt:
+        days.append(day.date())
+        day += timedelta(days=1)
+    return days
+
+
+class FireArchive:
+    # daily fire masks stored as bit-packed rows (np.packbits), one file per product and day,
+    # read through memory maps so a lookup only touches the few bytes around the AOI
+
+    __instance = None
+
+    def __init__(self, root=ARCHIVE_DIR, bounds=ARCHIVE_BOUNDS, cell_deg=ARCHIVE_CELL_DEG):
+        self.root = Path(root)
+        self.min_lat, self.min_lon, self.max_lat, self.max_lon = bounds
+        self.cell_deg = float(cell_deg)
+        self.rows = int(round((self.max_lat - self.min_lat) / self.cell_deg))
+        self.cols = int(round((self.max_lon - self.min_lon) / self.cell_deg))
+        self.row_bytes = (self.cols + 7) // 8
+        self._maps = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def get_instance():
+        if FireArchive.__instance is None:
+            FireArchive.__instance = FireArchive()
+        return FireArchive.__instance
+
+    def _path(self, label, day):
+        return self.root / label / f"{day:%Y%m%d}.bin"
+
+    def has_day(self, label, day):
+        return self._path(label, day).exists()
+
+    def write_day(self, label, day, mask):
+        # mask: rows x cols array, row 0 is the northern edge of the archive
+        mask = np.asarray(mask, dtype=bool)
+        if mask.shape != (self.rows, self.cols):
+            raise ValueError(f"Fire mask shape {mask.shape} does not match the archive grid {(self.rows, self.cols)}")
+
+        path = self._path(label, day)
+        path.parent.mkdir(parents=True, exist_ok=True)
+
+        # write to a temporary file first so readers never see a half written day
+        tmp_path = path.with_suffix(".tmp")
+        np.packbits(mask, axis=1).tofile(tmp_path)
+        os.replace(tmp_path, path)
+
+        with self._lock:
+            self._maps.pop((label, day), None)
+
+    def _day_map(self, label, day):
+        # the map is opened again when the refresh of another process replaced the day file
+        key = (label, day)
+        path = self._path(label, day)
+        try:
+            version = path.stat().st_mtime_ns
+        except FileNotFoundError:
+            return None
+        with self._lock:
+            if key not in self._maps or self._maps[key][0] != version:
+                self._maps[key] = (version, np.memmap(path, dtype=np.uint8, mode="r", shape=(self.rows, self.row_bytes)))
+            return self._maps[key][1]
+
+    def _cell_range(self, min_lat, min_lon, max_lat, max_lon):
+        # archive cells covering the box, None when the box leaves the archive
+        if not (self.min_lat <= min_lat and max_lat <= self.max_lat
+                and self.min_lon <= min_lon and max_lon <= self.max_lon):
+            return None
+
+        r0 = int((self.max_lat - max_lat) / self.cell_deg)
+        r1 = min(self.rows - 1, int((self.max_lat - min_lat) / self.cell_deg))
+        c0 = int((min_lon - self.min_lon) / self.cell_deg)
+        c1 = min(self.cols - 1, int((max_lon - self.min_lon) / self.cell_deg))
+        return r0, r1, c0, c1
+
+    def window_has_fire(self, label, days, box):
+        # True if any day of the window has a fire cell in the box, None if the archive cannot answer
+        cells = self._cell_range(*box)
+        if cells is None or not days:
+            return None
+        r0, r1, c0, c1 = cells
+
+        # OR the packed bytes of every day, then unpack the small block once
+        block = None
+        for day in days:
+            day_map = self._day_map(label, day)
+            if day_map is None:
+                return None
+            day_block = day_map[r0:r1 + 1, c0 // 8:c1 // 8 + 1]
+            block = np.array(day_block) if block is None else block | day_block
+
+        bits = np.unpackbits(block, axis=1)[:, c0 % 8:c0 % 8 + (c1 - c0 + 1)]
+        return bool(bits.any())
+
+    def count_detected(self, labels, days, box):
+        # number of products with fire in the box during the window, None if any product is missing a day
+        count = 0
+        for label in labels:
+            has_fire = self.window_has_fire(label, days, box)
+            if has_fire is None:
+                return None
+            if has_fire:
+                count += 1
+        return count
+
+    def prune(self, keep_from_day):
+        # remove days older than keep_from_day
+        for path in self.root.glob("*/*.bin"):
+            try:
+                day = datetime.strptime(path.stem, "%Y%m%d").date()
+            except ValueError:
+                continue
+            if day < keep_from_day:
+                with self._lock:
+                    self._maps.pop((path.parent.name, day), None)
+                path.unlink(missing_ok=True)
+
+    def grid(self):
+        # pixel grid of the archive in the format used by ee.data.computePixels
+        return {
+            "dimensions": {"width": self.cols, "height": self.rows},
+            "affineTransform": {
+                "scaleX": self.cell_deg,
+                "shearX": 0,
+                "translateX": self.min_lon,
+                "shearY": 0,
+                "scaleY": -self.cell_deg,
+                "translateY": self.max_lat
+            },
+            "crsCode": "EPSG:4326"
+        }
+
+
+def fetch_daily_fire_mask(archive, product, day):
+    # fire mask of one product and day on the archive grid, None when the product has no image for that day yet
+    import ee
+    from FireDetection import FIREMASK_THRESHOLD
+
+    start = ee.Date(datetime(day.year, day.month, day.day, tzinfo=timezone.utc).isoformat())
+    region = ee.Geometry.Rectangle([archive.min_lon, archive.min_lat, archive.max_lon, archive.max_lat])
+    collection = (
+        ee.ImageCollection(product["dataset_id"])
+        .filterDate(start, start.advance(1, "day"))
+        .filterBounds(region)
+        .select("FireMask")
+    )
+    if collection.size().getInfo() == 0:
+        return None
+
+    # keep the native projection so every fire pixel inside an archive cell marks the cell
+    fire = (
+        collection.max()
+        .setDefaultProjection(ee.Image(collection.first()).projection())
+        .gte(FIREMASK_THRESHOLD)
+        .unmask(0)
+        .reduceResolution(reducer=ee.Reducer.max(), maxPixels=1024)
+        .toUint8()
+        .rename("fire")
+    )
+
+    pixels = ee.data.computePixels({
+        "expression": fire,
+        "fileFormat": "NUMPY_NDARRAY",
+        "grid": archive.grid()
+    })
+    return pixels["fire"]
+
+
+def refresh_fire_archive(archive=None, today=None):
+    # ingest the missing days of every product, fetch the days still inside the product latency again,
+    # and drop days that are too old
+    from FireDetection import PRODUCTS
+
+    archive = archive or FireArchive.get_instance()
+    today = today or datetime.now(timezone.utc).date()
+    first_day = today - timedelta(days=ARCHIVE_DAYS)
+
+    ingested = 0
+    for offset in range(ARCHIVE_DAYS, 0, -1):
+        day = today - timedelta(days=offset)
+        for product in PRODUCTS:
+            if offset > ARCHIVE_LATENCY_DAYS and archive.has_day(product["label"], day):
+                continue
+            # days without an image are left out (or kept as they were) and tried again on the next refresh
+            mask = fetch_daily_fire_mask(archive, product, day)
+            if mask is not None:
+                archive.write_day(product["label"], day, mask)
+                ingested += 1
+
+    archive.prune(first_day)
+    print(f"Fire archive refreshed: {ingested} daily masks written")
+    return ingested
+
+
+def start_fire_archive_refresh():
+    # daily background refresh of the archive
+    from scheduler_utils import run_daily
+    return run_daily("fire-archive-refresh", refresh_fire_archive, hour_utc=ARCHIVE_REFRESH_HOUR_UTC)
+
+
+if __name__ == "__main__":
+    # fill the archive once: python -m Singleton.fire_archive
+    from Singleton.gee_connection import GEEConnection
+    GEEConnection.get_instance()
+    refresh_fire_archive()
@@ -0,0 +1,163 @@
+import os
+import threading
+import time
+import traceback
+import warnings
+from pathlib import Path
+
+import joblib
+
+from model_utils import CompiledFireModel, sklearn_predict_proba
+
+# folder of the model files shipped with the repo
+MODEL_DIR = Path(__file__).resolve().parent.parent / "Model"
+
+# new model versions are published as Model/bundles/<version>/ with the three pickles,
+# and a READY file written last so a half copied bundle is never loaded.
+# the bundle with the greatest version name wins.
+BUNDLES_DIR = MODEL_DIR / "bundles"
+READY_FILE = "READY"
+
+MODEL_FILE = "gb_model.pkl"
+PREPROCESSOR_FILE = "preprocessor.pkl"
+THRESHOLD_FILE = "threshold.pkl"
+
+DEFAULT_THRESHOLD = 0.35 # used when a bundle has no threshold file
+
+# how often every process looks for a new bundle
+MODEL_WATCH_INTERVAL_S = 60
+
+
+class ModelBundle:
+    # one loaded model version, never changed after loading so requests can keep using it during a swap
+
+    def __init__(self, version, model, preprocessor, threshold):
+        self.version = version
+        self.model = model
+        self.preprocessor = preprocessor
+        self.threshold = float(threshold)
+
+        # NumPy form of the model, None when the artifacts cannot be compiled
+        try:
+            self.compiled = CompiledFireModel(model, preprocessor)
+        except (TypeError, AttributeError) as e:
+            print(f"Compiled inference unavailable for model {version}: {e}")
+            self.compiled = None
+
+    def predict_proba(self, rows):
+        if self.compiled is not None:
+            return self.compiled.predict_proba(rows)
+        return sklearn_predict_proba(rows, self.model, self.preprocessor)
+
+    def warm_up(self):
+        # one inference so the first request does not pay for lazy imports and first allocations
+        columns = getattr(self.preprocessor, "feature_names_in_", [])
+        self.predict_proba([{column: 0.0 for column in columns}])
+
+
+def _load(path):
+    # numpy arrays inside the pickles are memory mapped when joblib can, so forked workers share the pages
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        return joblib.load(path, mmap_mode="r")
+
+
+def load_bundle(folder, version):
+    folder = Path(folder)
+    threshold_path = folder / THRESHOLD_FILE
+    bundle = ModelBundle(
+        version,
+        _load(folder / MODEL_FILE),
+        _load(folder / PREPROCESSOR_FILE),
+        _load(threshold_path) if threshold_path.exists() else DEFAULT_THRESHOLD
+    )
+    bundle.warm_up()
+    return bundle
+
+
+def latest_bundle(bundles_dir=BUNDLES_DIR):
+    # (folder, version) of the newest complete bundle, the shipped model files when there is none
+    if bundles_dir.is_dir():
+        ready = [
+            folder for folder in bundles_dir.iterdir()
+            if (folder / READY_FILE).exists() and (folder / MODEL_FILE).exists() and (folder / PREPROCESSOR_FILE).exists()
+        ]
+        if ready:
+            folder = max(ready, key=lambda f: f.name)
+            return folder, folder.name
+    return MODEL_DIR, "base"
+
+
+class PredictionModel:
+    # the fire prediction model of this process: loaded once at startup (before the server forks its workers),
+    # then swapped in one step when a new bundle is published
+
+    __instance = None
+
+    def __init__(self, bundles_dir=BUNDLES_DIR, watch_interval_s=MODEL_WATCH_INTERVAL_S):
+        self.bundles_dir = Path(bundles_dir)
+        self.watch_interval_s = watch_interval_s
+        self._lock = threading.Lock()
+        self._watcher_lock = threading.Lock()
+        self._failed_version = None
+        self._watcher_pid = None
+
+        folder, version = latest_bundle(self.bundles_dir)
+        self._bundle = load_bundle(folder, version)
+        print(f"Prediction model {version} loaded")
+
+    @staticmethod
+    def get_instance():
+        if PredictionModel.__instance is None:
+            PredictionModel.__instance = PredictionModel()
+        return PredictionModel.__instance
+
+    @staticmethod
+    def loaded():
+        # the current bundle without loading anything, None before startup
+        instance = PredictionModel.__instance
+        return None if instance is None else instance._bundle
+
+    def current(self):
+        # threads do not survive a fork, so every worker starts its own watcher on first use
+        if self._watcher_pid != os.getpid():
+            self._start_watcher()
+        return self._bundle
+
+    def check_for_update(self):
+        # load the newest bundle next to the current one and swap the reference, True when the model changed
+        folder, version = latest_bundle(self.bundles_dir)
+        if version == self._bundle.version or version == self._failed_version:
+            return False
+
+        with self._lock:
+            if version == self._bundle.version:
+                return False
+            try:
+                bundle = load_bundle(folder, version)
+            except Exception:
+                print(f">>> ERROR loading prediction model {version}:\n{traceback.format_exc()}")
+                self._failed_version = version
+                return False
+
+            # requests that already took the old bundle finish with it
+            self._bundle = bundle
+
+        print(f"Prediction model swapped to {version}")
+        return True
+
+    def _start_watcher(self):
+        with self._watcher_lock:
+            if self._watcher_pid == os.getpid():
+                return
+            self._watcher_pid = os.getpid()
+
+        def loop():
+            while True:
+                time.sleep(self.watch_interval_s)
+                try:
+                    self.check_for_update()
+                except Exception:
+                    print(f">>> ERROR in prediction model watcher:\n{traceback.format_exc()}")
+
+        threading.Thread(target=loop, name="prediction-model-watcher", daemon=True).start()
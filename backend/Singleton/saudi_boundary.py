@@ -0,0 +1,221 @@
+import json
+import math
+from pathlib import Path
+
+# local snapshot of the USDOS/LSIB_SIMPLE/2017 Saudi Arabia boundary (GeoJSON geometry)
+BOUNDARY_PATH = Path(__file__).resolve().parent.parent / "Data" / "saudi_boundary.geojson"
+
+# size of one grid cell of the index in degrees (~11 km)
+GRID_CELL_DEG = 0.1
+
+# cell states
+OUTSIDE = 0
+INSIDE = 1
+BORDER = 2
+
+
+def _segments_cross(p1, p2, q1, q2):
+    # True if segment p1-p2 crosses segment q1-q2
+    def orient(a, b, c):
+        return (b[0] - a[0]) * (c[1] - a[1]) - (b[1] - a[1]) * (c[0] - a[0])
+
+    d1 = orient(q1, q2, p1)
+    d2 = orient(q1, q2, p2)
+    d3 = orient(p1, p2, q1)
+    d4 = orient(p1, p2, q2)
+    return ((d1 > 0) != (d2 > 0)) and ((d3 > 0) != (d4 > 0))
+
+
+def _segment_hits_box(x1, y1, x2, y2, min_x, min_y, max_x, max_y):
+    # Liang-Barsky clipping: True if the segment touches the box
+    t0, t1 = 0.0, 1.0
+    dx, dy = x2 - x1, y2 - y1
+    for p, q in ((-dx, x1 - min_x), (dx, max_x - x1), (-dy, y1 - min_y), (dy, max_y - y1)):
+        if p == 0:
+            if q < 0:
+                return False
+            continue
+        t = q / p
+        if p < 0:
+            t0 = max(t0, t)
+        else:
+            t1 = min(t1, t)
+        if t0 > t1:
+            return False
+    return True
+
+
+class BoundaryIndex:
+    # point-in-polygon index: bounding box prefilter, then a grid of cells marked
+    # inside / outside / border. Only points in border cells look at polygon edges,
+    # and only at the few edges that touch their cell.
+
+    def __init__(self, geometry, cell_deg=GRID_CELL_DEG):
+        self.cell_deg = float(cell_deg)
+        self.edges = self._read_edges(geometry)
+        if not self.edges:
+            raise ValueError("Boundary geometry has no polygon edges.")
+
+        xs = [x for edge in self.edges for x in (edge[0], edge[2])]
+        ys = [y for edge in self.edges for y in (edge[1], edge[3])]
+        self.min_lon, self.max_lon = min(xs), max(xs)
+        self.min_lat, self.max_lat = min(ys), max(ys)
+
+        self.cols = max(1, int(math.ceil((self.max_lon - self.min_lon) / self.cell_deg)))
+        self.rows = max(1, int(math.ceil((self.max_lat - self.min_lat) / self.cell_deg)))
+
+        self._build_grid()
+
+    @staticmethod
+    def _read_edges(geometry):
+        # GeoJSON Polygon / MultiPolygon / GeometryCollection into a flat list of (x1, y1, x2, y2) edges
+        geom_type = geometry.get("type")
+        if geom_type == "Polygon":
+            polygons = [geometry.get("coordinates") or []]
+        elif geom_type == "MultiPolygon":
+            polygons = geometry.get("coordinates") or []
+        elif geom_type == "GeometryCollection":
+            edges = []
+            for part in geometry.get("geometries") or []:
+                edges.extend(BoundaryIndex._read_edges(part))
+            return edges
+        else:
+            return []
+
+        edges = []
+        for polygon in polygons:
+            for ring in polygon:
+                for (x1, y1), (x2, y2) in zip(ring, ring[1:] + ring[:1]):
+                    if (x1, y1) != (x2, y2):
+                        edges.append((float(x1), float(y1), float(x2), float(y2)))
+        return edges
+
+    def _cell_of(self, lat, lon):
+        col = min(self.cols - 1, int((lon - self.min_lon) / self.cell_deg))
+        row = min(self.rows - 1, int((lat - self.min_lat) / self.cell_deg))
+        return row, col
+
+    def _cell_center(self, row, col):
+        return (
+            self.min_lon + (col + 0.5) * self.cell_deg,
+            self.min_lat + (row + 0.5) * self.cell_deg
+        )
+
+    def _build_grid(self):
+        # edges touching every cell
+        cell_edges = {}
+        for i, (x1, y1, x2, y2) in enumerate(self.edges):
+            r0, c0 = self._cell_of(min(y1, y2), min(x1, x2))
+            r1, c1 = self._cell_of(max(y1, y2), max(x1, x2))
+            for row in range(r0, r1 + 1):
+                for col in range(c0, c1 + 1):
+                    cell_min_x = self.min_lon + col * self.cell_deg
+                    cell_min_y = self.min_lat + row * self.cell_deg
+                    if _segment_hits_box(x1, y1, x2, y2, cell_min_x, cell_min_y,
+                                         cell_min_x + self.cell_deg, cell_min_y + self.cell_deg):
+                        cell_edges.setdefault(row * self.cols + col, []).append(i)
+
+        self.states = bytearray(self.rows * self.cols)
+        self.center_inside = bytearray(self.rows * self.cols)
+        self.cell_edges = cell_edges
+
+        for row in range(self.rows):
+            center_lat = self.min_lat + (row + 0.5) * self.cell_deg
+
+            # crossings of the polygon edges with the row center line (even-odd rule)
+            crossings = []
+            for x1, y1, x2, y2 in self.edges:
+                if (y1 > center_lat) != (y2 > center_lat):
+                    crossings.append(x1 + (center_lat - y1) * (x2 - x1) / (y2 - y1))
+            crossings.sort()
+
+            k = 0
+            for col in range(self.cols):
+                center_lon = self.min_lon + (col + 0.5) * self.cell_deg
+                while k < len(crossings) and crossings[k] < center_lon:
+                    k += 1
+                idx = row * self.cols + col
+                self.center_inside[idx] = k % 2
+                if idx in cell_edges:
+                    self.states[idx] = BORDER
+                else:
+                    self.states[idx] = INSIDE if k % 2 else OUTSIDE
+
+    def contains(self, lat, lon):
+        # bounding box prefilter
+        if not (self.min_lat <= lat <= self.max_lat and self.min_lon <= lon <= self.max_lon):
+            return False
+
+        row, col = self._cell_of(lat, lon)
+        idx = row * self.cols + col
+        state = self.states[idx]
+        if state != BORDER:
+            return state == INSIDE
+
+        # border cell: the cell center state flips once for every edge crossed on the way to the point
+        center = self._cell_center(row, col)
+        point = (lon, lat)
+        inside = bool(self.center_inside[idx])
+        for i in self.cell_edges[idx]:
+            x1, y1, x2, y2 = self.edges[i]
+            if _segments_cross(point, center, (x1, y1), (x2, y2)):
+                inside = not inside
+        return inside
+
+    def contains_box(self, min_lat, min_lon, max_lat, max_lon):
+        # True only when every cell covering the box is fully inside
+        if not (self.min_lat <= min_lat and max_lat <= self.max_lat
+                and self.min_lon <= min_lon and max_lon <= self.max_lon):
+            return False
+
+        r0, c0 = self._cell_of(min_lat, min_lon)
+        r1, c1 = self._cell_of(max_lat, max_lon)
+        for row in range(r0, r1 + 1):
+            for col in range(c0, c1 + 1):
+                if self.states[row * self.cols + col] != INSIDE:
+                    return False
+        return True
+
+
+def box_around(lat, lon, radius_m):
+    # lat/lon box that contains a buffer of radius_m around the point
+    dlat = radius_m / 111320.0
+    dlon = radius_m / (111320.0 * max(math.cos(math.radians(lat)), 1e-6))
+    return lat - dlat, lon - dlon, lat + dlat, lon + dlon
+
+
+def snapshot_saudi_boundary(path=BOUNDARY_PATH):
+    # fetch the Saudi boundary from Earth Engine once and save it as the local snapshot
+    from FireDetection import _get_saudi_geometry
+
+    geometry = _get_saudi_geometry().getInfo()
+    Path(path).write_text(json.dumps(geometry), encoding="utf-8")
+    return path
+
+
+class SaudiBoundary:
+    __instance = None
+    __loaded = False
+
+    @staticmethod
+    def get_instance():
+        # build the index once from the local snapshot, None if the snapshot was not created yet
+        if not SaudiBoundary.__loaded:
+            SaudiBoundary.__loaded = True
+            if BOUNDARY_PATH.exists():
+                try:
+                    geometry = json.loads(BOUNDARY_PATH.read_text(encoding="utf-8"))
+                    SaudiBoundary.__instance = BoundaryIndex(geometry)
+                    print(f"Saudi boundary index loaded: {SaudiBoundary.__instance.rows}x{SaudiBoundary.__instance.cols} cells")
+                except Exception as e:
+                    print(f"Saudi boundary index failed to load: {e}")
+            else:
+                print(f"Saudi boundary snapshot not found at {BOUNDARY_PATH}, using Earth Engine checks")
+        return SaudiBoundary.__instance
+
+
+if __name__ == "__main__":
+    # create the local snapshot: python -m Singleton.saudi_boundary
+    from Singleton.gee_connection import GEEConnection
+    GEEConnection.get_instance()
+    print("Saved boundary snapshot to", snapshot_saudi_boundary())
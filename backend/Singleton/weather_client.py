@@ -0,0 +1,78 @@
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# connections kept open per host (archive-api and api.open-meteo.com each get their own pool)
+POOL_CONNECTIONS = 4 # hosts with a pool
+POOL_MAXSIZE = 8 # open connections per host, extra threads wait for a free one
+
+# retries with exponential backoff (0.5 s, 1 s, 2 s) on connection errors and these statuses
+MAX_RETRIES = 3
+BACKOFF_FACTOR = 0.5
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+CONNECT_TIMEOUT_S = 5
+READ_TIMEOUT_S = 30
+
+# Open-Meteo accepts up to ~100 comma separated locations per request
+MAX_LOCATIONS_PER_REQUEST = 100
+
+
+class WeatherClient:
+    # one pooled keep-alive session for every Open-Meteo call of the process
+
+    __instance = None
+    __lock = threading.Lock()
+
+    def __init__(self, max_retries=MAX_RETRIES, pool_maxsize=POOL_MAXSIZE):
+        retry = Retry(
+            total=max_retries,
+            connect=max_retries,
+            read=max_retries,
+            status=max_retries,
+            backoff_factor=BACKOFF_FACTOR,
+            status_forcelist=RETRY_STATUSES,
+            allowed_methods=frozenset(["GET"]),
+            respect_retry_after_header=True,
+            raise_on_status=False # the last response is returned and raise_for_status reports it
+        )
+        adapter = HTTPAdapter(
+            pool_connections=POOL_CONNECTIONS,
+            pool_maxsize=pool_maxsize,
+            pool_block=True,
+            max_retries=retry
+        )
+
+        self.session = requests.Session()
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    @staticmethod
+    def get_instance():
+        with WeatherClient.__lock:
+            if WeatherClient.__instance is None:
+                WeatherClient.__instance = WeatherClient()
+            return WeatherClient.__instance
+
+    def get_json(self, url, params, read_timeout_s=READ_TIMEOUT_S):
+        response = self.session.get(url, params=params, timeout=(CONNECT_TIMEOUT_S, read_timeout_s))
+        response.raise_for_status()
+        return response.json()
+
+    def get_locations(self, url, params, points, chunk_size=MAX_LOCATIONS_PER_REQUEST, read_timeout_s=READ_TIMEOUT_S):
+        # one response per (lat, lon), with one request per chunk of points (comma separated latitude / longitude)
+        results = []
+        for start in range(0, len(points), chunk_size):
+            chunk = points[start:start + chunk_size]
+            payload = self.get_json(url, dict(
+                params,
+                latitude=",".join(str(lat) for lat, _ in chunk),
+                longitude=",".join(str(lon) for _, lon in chunk)
+            ), read_timeout_s)
+
+            # one location returns an object, many locations return a list in the same order
+            payloads = payload if isinstance(payload, list) else [payload]
+            results.extend(payloads[i] if i < len(payloads) else {} for i in range(len(chunk)))
+        return results
@@ -0,0 +1,2 @@
+# offline benchmarks for the analysis engines, run from the backend folder:
+#   python -m benchmarks.bench_fire_product_summary
@@ -0,0 +1,76 @@
+import time
+import warnings
+
+import joblib
+import numpy as np
+
+import FirePrediction as fp
+from model_utils import CompiledFireModel
+from Singleton.prediction_model import MODEL_DIR, MODEL_FILE, PREPROCESSOR_FILE
+
+REPEATS = 200
+BATCH_SIZE = 1000
+
+
+def _rows(count, seed=0):
+    rng = np.random.default_rng(seed)
+    return [{
+        "elevation": float(rng.uniform(0, 3000)),
+        "slope": float(rng.uniform(0, 30)),
+        "aspect": float(rng.uniform(0, 360)),
+        "lulc": int(rng.choice([7, 8, 9, 10, 12, 13])),
+        "temperature": float(rng.uniform(5, 45)),
+        "wind_speed": float(rng.uniform(0, 10)),
+        "precipitation": float(rng.uniform(0, 2)),
+        "vpd": float(rng.uniform(0, 5)),
+        "ndvi": float(rng.uniform(0.15, 0.8)),
+        "ndwi": float(rng.uniform(-0.6, 0.2))
+    } for _ in range(count)]
+
+
+def _ms_per_call(score, rows, repeats):
+    score(rows)
+    started = time.perf_counter()
+    for _ in range(repeats):
+        score(rows)
+    return (time.perf_counter() - started) * 1000 / repeats
+
+
+def run():
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        model = joblib.load(MODEL_DIR / MODEL_FILE)
+        preprocessor = joblib.load(MODEL_DIR / PREPROCESSOR_FILE)
+    compiled = CompiledFireModel(model, preprocessor)
+
+    def sklearn_score(rows):
+        fp.COMPILED_INFERENCE = False
+        try:
+            return fp._score_feature_rows(rows, model, preprocessor)
+        finally:
+            fp.COMPILED_INFERENCE = True
+
+    single, batch = _rows(1), _rows(BATCH_SIZE, seed=1)
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        max_diff = float(np.abs(sklearn_score(batch) - compiled.predict_proba(batch)).max())
+        return {
+            "sklearn": {
+                "single_ms": round(_ms_per_call(sklearn_score, single, REPEATS), 4),
+                "batch_ms": round(_ms_per_call(sklearn_score, batch, REPEATS // 10), 4)
+            },
+            "compiled": {
+                "single_ms": round(_ms_per_call(compiled.predict_proba, single, REPEATS), 4),
+                "batch_ms": round(_ms_per_call(compiled.predict_proba, batch, REPEATS // 10), 4)
+            },
+            "max_abs_diff": max_diff
+        }
+
+
+if __name__ == "__main__":
+    results = run()
+    print(f"{'variant':<12}{'1 row ms':>10}{f'{BATCH_SIZE} rows ms':>16}")
+    for name in ("sklearn", "compiled"):
+        row = results[name]
+        print(f"{name:<12}{row['single_ms']:>10}{row['batch_ms']:>16}")
+    print(f"max |p_sklearn - p_compiled| = {results['max_abs_diff']:.2e}")
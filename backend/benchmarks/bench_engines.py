@@ -0,0 +1,312 @@
+import argparse
+import io
+import json
+import platform
+import sys
+import threading
+import time
+import tracemalloc
+from contextlib import ExitStack, redirect_stdout
+from datetime import datetime, timezone
+from pathlib import Path
+from unittest.mock import patch
+
+import numpy as np
+import requests
+from flask import Flask
+
+import auth_utils
+import FireAreaEstimator as fa
+import FireDetection as fd
+import FirePrediction as fp
+import FireSpreadEstimator as fs
+import FireThreatEstimator as ft
+from tests.ee_stub import GraphRecorder, graph_size, stub_ee
+from Singleton.saudi_boundary import SaudiBoundary
+
+# every analysis engine driven through its route against recorded Earth Engine and Open-Meteo responses.
+# fixtures/<engine>.json holds the request, and the responses in the order the engine asks for them
+# (with the latency measured when they were recorded), and optionally module settings for the run
+# ({"FireThreatEstimator": {"FWI_ENGINE": "earth_engine"}}).
+#
+#   python -m benchmarks.bench_engines                      run every engine, save results/engines-<time>.json
+#   python -m benchmarks.bench_engines --compare <file>     same, and print the change against an older run
+#   python -m benchmarks.bench_engines --latency            also replay the recorded server latencies (slow)
+#   python -m benchmarks.bench_engines --record             refresh the fixtures from live Earth Engine / Open-Meteo
+
+FIXTURES_DIR = Path(__file__).resolve().parent / "fixtures"
+RESULTS_DIR = Path(__file__).resolve().parent / "results"
+
+ENGINES = ("fire_detection", "fire_prediction", "fire_threat", "fire_threat_ee", "fire_burned_area", "fire_spread")
+
+# modules whose ee is replaced by the recording stub
+EE_MODULES = (fd, fp, ft, fa, fs)
+
+REPEATS = 50
+
+
+class ReplayRecorder(GraphRecorder):
+    # graph recorder that also measures the Python time spent before every evaluation,
+    # and replays the recorded server latency as a sleep
+
+    def __init__(self, fixture, replay_latency=False):
+        super().__init__([entry["response"] for entry in fixture["earth_engine"]])
+        self.latencies = [entry.get("latency_ms", 0.0) for entry in fixture["earth_engine"]]
+        self.replay_latency = replay_latency
+        self.build_s = 0.0
+        self._lock = threading.Lock()
+        self._mark = time.perf_counter()
+
+    def evaluate(self, obj):
+        started = time.perf_counter()
+        with self._lock:
+            # time since the request started or since the previous evaluation came back
+            self.build_s += started - self._mark
+            index = len(self.evaluations)
+            value = super().evaluate(obj)
+
+        if self.replay_latency and index < len(self.latencies):
+            time.sleep(self.latencies[index] / 1000)
+        self._mark = time.perf_counter()
+        return value
+
+
+class _ReplayedResponse:
+    def __init__(self, payload):
+        self._payload = payload
+        self.status_code = 200
+
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        return self._payload
+
+
+def _fake_http(fixture, replay_latency, calls):
+    # stands in for requests.Session.get, answers with the recorded Open-Meteo payloads in order
+    entries = list(fixture["open_meteo"])
+
+    def get(session, url, params=None, **kwargs):
+        calls.append(url)
+        if not entries:
+            raise RuntimeError(f"No recorded response left for {url}")
+        entry = entries.pop(0)
+        if replay_latency:
+            time.sleep(entry.get("latency_ms", 0.0) / 1000)
+        return _ReplayedResponse(entry["response"])
+    return get
+
+
+def load_fixture(name):
+    with open(FIXTURES_DIR / f"{name}.json", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def create_app():
+    # the engine blueprints only, FlaskMain would connect to Earth Engine and Firebase
+    app = Flask(__name__)
+    app.config["TESTING"] = True
+    for blueprint in (fd.fire_detection_bp, fp.fire_prediction_bp, ft.fire_threat_bp, fa.fire_area_bp, fs.fire_spread_bluePrint):
+        app.register_blueprint(blueprint)
+    return app
+
+
+def _offline(stack):
+    # no login, no local caches or archives, so every request asks Earth Engine / Open-Meteo like a cold one
+    stack.enter_context(patch.object(auth_utils, "verify_request_token", return_value=({"uid": "benchmark"}, None)))
+    stack.enter_context(patch.object(SaudiBoundary, "get_instance", return_value=None))
+    stack.enter_context(patch.object(fd, "DETECTION_CACHE_ENABLED", False))
+    stack.enter_context(patch.object(fd, "FIRE_ARCHIVE_ENABLED", False))
+    stack.enter_context(patch.object(fp, "WEATHER_CACHE_ENABLED", False))
+    stack.enter_context(patch.object(ft, "FWI_STATE_ENABLED", False))
+    stack.enter_context(patch.object(ft, "COMPONENT_CACHE_ENABLED", False))
+
+
+def _settings(stack, fixture):
+    for module, values in fixture.get("settings", {}).items():
+        for name, value in values.items():
+            stack.enter_context(patch.object(sys.modules[module], name, value))
+
+
+def run_request(client, fixture, replay_latency=False):
+    # one request of the fixture, returns its measurements
+    recorder = ReplayRecorder(fixture, replay_latency)
+    http_calls = []
+    request = fixture["request"]
+
+    with ExitStack() as stack:
+        _settings(stack, fixture)
+        stack.enter_context(stub_ee(*EE_MODULES, recorder=recorder))
+        stack.enter_context(patch.object(requests.Session, "get", _fake_http(fixture, replay_latency, http_calls)))
+        stack.enter_context(redirect_stdout(io.StringIO()))
+        started = time.perf_counter()
+        recorder._mark = started
+        response = client.post(request["path"], json=request["json"])
+        elapsed_s = time.perf_counter() - started
+
+    # a fixture that no longer matches the engine would silently measure a different code path
+    if response.status_code != 200:
+        raise RuntimeError(f"{request['path']} answered {response.status_code}: {response.get_data(as_text=True)[:500]}")
+    if len(recorder.evaluations) != len(fixture["earth_engine"]) or len(http_calls) != len(fixture["open_meteo"]):
+        raise RuntimeError(
+            f"{request['path']} made {len(recorder.evaluations)} evaluations and {len(http_calls)} HTTP requests, "
+            f"the fixture has {len(fixture['earth_engine'])} and {len(fixture['open_meteo'])}, record it again"
+        )
+
+    return {
+        "elapsed_ms": elapsed_s * 1000,
+        "ee_evaluations": len(recorder.evaluations),
+        "http_requests": len(http_calls),
+        "graph_nodes": sum(graph_size(obj) for obj in recorder.evaluations),
+        "build_ms": recorder.build_s * 1000
+    }
+
+
+def bench_engine(client, name, repeats=REPEATS, replay_latency=False):
+    fixture = load_fixture(name)
+
+    # first request pays for imports, model loading and thread start up
+    run_request(client, fixture, replay_latency)
+
+    samples = [run_request(client, fixture, replay_latency) for _ in range(repeats)]
+    elapsed = np.array([s["elapsed_ms"] for s in samples])
+    build = np.array([s["build_ms"] for s in samples])
+
+    # peak Python memory of one more request (tracemalloc slows it down, so it is not timed)
+    tracemalloc.start()
+    try:
+        run_request(client, fixture, replay_latency=False)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    last = samples[-1]
+    return {
+        "p50_ms": round(float(np.percentile(elapsed, 50)), 3),
+        "p95_ms": round(float(np.percentile(elapsed, 95)), 3),
+        "round_trips": last["ee_evaluations"] + last["http_requests"],
+        "ee_evaluations": last["ee_evaluations"],
+        "http_requests": last["http_requests"],
+        "graph_nodes": last["graph_nodes"],
+        # sum of the recorded server latencies, what the round trips cost when they run one after the other
+        "recorded_server_ms": round(sum(entry.get("latency_ms", 0.0) for entry in fixture["earth_engine"] + fixture["open_meteo"]), 1),
+        "build_ms_p50": round(float(np.percentile(build, 50)), 3),
+        "peak_kib": round(peak / 1024, 1)
+    }
+
+
+def run(engines=ENGINES, repeats=REPEATS, replay_latency=False):
+    app = create_app()
+    with ExitStack() as stack:
+        _offline(stack)
+        with app.test_client() as client:
+            results = {name: bench_engine(client, name, repeats, replay_latency) for name in engines}
+
+    return {
+        "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "repeats": repeats,
+        "replay_latency": replay_latency,
+        "engines": results
+    }
+
+
+def save(results, path=None):
+    if path is None:
+        stamp = datetime.fromisoformat(results["created_at"]).strftime("%Y%m%dT%H%M%SZ")
+        path = RESULTS_DIR / f"engines-{stamp}.json"
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(results, indent=2) + "\n", encoding="utf-8")
+    return path
+
+
+# ---------------------------- RECORDING ----------------------------
+
+def record(engines=ENGINES):
+    # run every fixture request once against live Earth Engine and Open-Meteo and store the answers
+    import ee
+    from Singleton.gee_connection import GEEConnection
+    GEEConnection.get_instance()
+
+    compute_value = ee.data.computeValue
+    http_get = requests.Session.get
+    app = create_app()
+
+    for name in engines:
+        fixture = load_fixture(name)
+        captured = {"earth_engine": [], "open_meteo": []}
+
+        def recorded_compute_value(obj):
+            started = time.perf_counter()
+            value = compute_value(obj)
+            captured["earth_engine"].append({"latency_ms": round((time.perf_counter() - started) * 1000, 1), "response": value})
+            return value
+
+        def recorded_get(session, url, **kwargs):
+            started = time.perf_counter()
+            response = http_get(session, url, **kwargs)
+            captured["open_meteo"].append({"latency_ms": round((time.perf_counter() - started) * 1000, 1), "response": response.json()})
+            return response
+
+        with ExitStack() as stack:
+            _offline(stack)
+            _settings(stack, fixture)
+            stack.enter_context(patch.object(ee.data, "computeValue", recorded_compute_value))
+            stack.enter_context(patch.object(requests.Session, "get", recorded_get))
+            with app.test_client() as client:
+                response = client.post(fixture["request"]["path"], json=fixture["request"]["json"])
+        if response.status_code != 200:
+            raise RuntimeError(f"{name}: {response.status_code} {response.get_data(as_text=True)[:500]}")
+
+        fixture.update(captured)
+        with open(FIXTURES_DIR / f"{name}.json", "w", encoding="utf-8") as f:
+            json.dump(fixture, f, ensure_ascii=False, indent=2)
+            f.write("\n")
+        print(f"recorded {name}: {len(captured['earth_engine'])} evaluations, {len(captured['open_meteo'])} HTTP requests")
+
+
+# ---------------------------- REPORT ----------------------------
+
+COLUMNS = ("p50_ms", "p95_ms", "round_trips", "recorded_server_ms", "graph_nodes", "build_ms_p50", "peak_kib")
+
+
+def report(results, baseline=None):
+    print(f"{'engine':<18}" + "".join(f"{column:>20}" for column in COLUMNS))
+    for name, row in results["engines"].items():
+        print(f"{name:<18}" + "".join(f"{row[column]:>20}" for column in COLUMNS))
+
+        old = (baseline or {}).get("engines", {}).get(name)
+        if old:
+            deltas = []
+            for column in COLUMNS:
+                if old.get(column):
+                    deltas.append(f"{(row[column] - old[column]) / old[column] * 100:>+19.1f}%")
+                else:
+                    deltas.append(f"{'-':>20}")
+            print(f"{'  vs baseline':<18}" + "".join(deltas))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Offline benchmark of the analysis engines")
+    parser.add_argument("engines", nargs="*", default=list(ENGINES), help=f"any of {', '.join(ENGINES)}")
+    parser.add_argument("--repeats", type=int, default=REPEATS)
+    parser.add_argument("--latency", action="store_true", help="replay the recorded server latencies")
+    parser.add_argument("--output", help="results file, default results/engines-<time>.json")
+    parser.add_argument("--compare", help="results file of an earlier run")
+    parser.add_argument("--record", action="store_true", help="refresh the fixtures from live services")
+    args = parser.parse_args()
+    unknown = set(args.engines) - set(ENGINES)
+    if unknown:
+        parser.error(f"unknown engines: {', '.join(sorted(unknown))}")
+
+    if args.record:
+        record(args.engines)
+    else:
+        results = run(args.engines, args.repeats, args.latency)
+        baseline = json.loads(Path(args.compare).read_text(encoding="utf-8")) if args.compare else None
+        if baseline and baseline.get("replay_latency") != results["replay_latency"]:
+            print("warning: the baseline was run with a different --latency setting")
+        report(results, baseline)
+        print(f"saved {save(results, args.output)}")
@@ -0,0 +1,72 @@
+import time
+
+import FireDetection as fd
+from tests.ee_stub import graph_size, serialize, stub_ee
+
+REPEATS = 200
+
+
+# the original summary: four separate reduceRegion passes over the same merged image
+def _legacy_fire_product_summary(aoi, start_dt, end_dt, product):
+    ee = fd.ee
+    scale_m = product["scale_m"]
+    collection_count, merged_img, latest_img = fd._fire_product_images(aoi, start_dt, end_dt, product)
+    fire_mask = merged_img.select("FireMask").gte(fd.FIREMASK_THRESHOLD)
+
+    def reduce(img, reducer, band):
+        return fd._safe_number(
+            img.reduceRegion(
+                reducer=reducer,
+                geometry=aoi,
+                scale=scale_m,
+                bestEffort=True,
+                maxPixels=1e9
+            ).get(band),
+            0
+        )
+
+    return ee.Dictionary({
+        "collection_count": collection_count,
+        "fire_pixels": reduce(fire_mask.unmask(0), ee.Reducer.sum(), "FireMask"),
+        "max_firemask_class": reduce(merged_img.select("FireMask").updateMask(fire_mask), ee.Reducer.max(), "FireMask"),
+        "max_any_firemask": reduce(merged_img.select("FireMask"), ee.Reducer.max(), "FireMask"),
+        "frp_max": reduce(merged_img.select("MaxFRP").updateMask(fire_mask), ee.Reducer.max(), "MaxFRP"),
+        "dataset_time_ms": latest_img.get("system:time_start")
+    })
+
+
+def _measure(build):
+    with stub_ee(fd) as recorder:
+        ee = fd.ee
+        aoi = fd._build_aoi(18.2, 42.5, fd.STRICT_BUFFER_M)
+        end_dt = ee.Date("2025-06-16T11:00:00+00:00")
+        start_dt = end_dt.advance(-fd.WINDOW_HOURS, "hour")
+
+        started = time.perf_counter()
+        for _ in range(REPEATS):
+            summary = build(aoi, start_dt, end_dt, fd.PRODUCTS[0])
+        build_ms = (time.perf_counter() - started) * 1000 / REPEATS
+
+        recorder.calls.clear()
+        summary = build(aoi, start_dt, end_dt, fd.PRODUCTS[0])
+        return {
+            "reduce_region_passes": recorder.count("reduceRegion"),
+            "graph_nodes": graph_size(summary),
+            "request_bytes": len(serialize(summary)),
+            "build_ms": round(build_ms, 4)
+        }
+
+
+def run():
+    return {
+        "legacy_four_pass": _measure(_legacy_fire_product_summary),
+        "combined_reducer": _measure(fd._fire_product_summary)
+    }
+
+
+if __name__ == "__main__":
+    results = run()
+    print(f"{'variant':<20}{'passes':>8}{'nodes':>8}{'bytes':>9}{'build ms':>10}")
+    for name, row in results.items():
+        print(f"{name:<20}{row['reduce_region_passes']:>8}{row['graph_nodes']:>8}"
+              f"{row['request_bytes']:>9}{row['build_ms']:>10}")
@@ -0,0 +1,70 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+# bounded, thread-safe LRU cache where every entry has its own time to live
+class TTLCache:
+    def __init__(self, max_entries, default_ttl_s, clock=time.monotonic):
+        self.max_entries = int(max_entries)
+        self.default_ttl_s = float(default_ttl_s)
+        self._clock = clock
+        self._entries = OrderedDict()  # key -> (expires_at, value), oldest first
+        self._lock = threading.Lock()
+
+        # counters
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+
+            expires_at, value = entry
+            if expires_at <= self._clock():
+                # expired entries are dropped when they are read
+                del self._entries[key]
+                self.expirations += 1
+                self.misses += 1
+                return default
+
+            # mark as most recently used
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value, ttl_s=None):
+        ttl_s = self.default_ttl_s if ttl_s is None else float(ttl_s)
+        with self._lock:
+            self._entries[key] = (self._clock() + ttl_s, value)
+            self._entries.move_to_end(key)
+
+            # evict the least recently used entries when the cache is full
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations
+            }
@@ -0,0 +1,249 @@
+import sqlite3
+import threading
+from datetime import date
+from pathlib import Path
+
+import numpy as np
+
+# Canadian Forest Fire Weather Index System on NumPy arrays.
+# same equations as the Earth Engine version in FireThreatEstimator, every branch is chosen per element,
+# inputs are daily T (C), RH (%), W (km/h) and R (mm) of any shape (one value per cell)
+
+# moisture codes used when there is no earlier state
+FFMC_START = 85.0
+DMC_START = 6.0
+DC_START = 15.0
+
+FWI_CODES = ("FFMC", "DMC", "DC", "ISI", "BUI", "FWI")
+
+# daily codes of every cell that was asked for, so a request only iterates the days after the last stored one
+FWI_STATE_PATH = Path(__file__).resolve().parent / "Cache" / "fwi_state.sqlite3"
+FWI_STATE_CELL_DEG = 0.1 # ~11 km, the ERA5-Land grid
+
+
+# ---------------------------- WEATHER ----------------------------
+
+def to_celsius(temp_k):
+    return np.asarray(temp_k, dtype=float) - 273.15
+
+
+def wind_speed_kmh(u, v):
+    # ERA5 wind components (m/s) -> speed (km/h)
+    return np.sqrt(np.square(u) + np.square(v)) * 3.6
+
+
+def rel_humidity_pct(temp_c, dew_c):
+    # Magnus approximation, clamped to [0, 100]
+    es = 6.112 * np.exp((17.67 * temp_c) / (temp_c + 243.5))
+    e = 6.112 * np.exp((17.67 * dew_c) / (dew_c + 243.5))
+    return np.clip(e / es * 100, 0, 100)
+
+
+# ---------------------------- MOISTURE CODES ----------------------------
+
+def ffmc_next(ffmc_prev, T, RH, W, R):
+    ffmc_prev = np.clip(ffmc_prev, 0, 101)
+    mo = 147.2 * (101.0 - ffmc_prev) / (59.5 + ffmc_prev)
+
+    # rain effect only above 0.5 mm, extra term for very wet fuels
+    rf = np.maximum(R - 0.5, 0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        mr1 = mo + 42.5 * rf * np.exp(-100.0 / (251.0 - mo)) * (1 - np.exp(-6.93 / rf))
+    mr1 = np.where(rf > 0, mr1, mo)
+    mr2 = mr1 + 0.0015 * (mo - 150.0) ** 2 * np.sqrt(rf)
+    mr = np.minimum(np.where(mo > 150, mr2, mr1), 250)
+
+    # drying / wetting equilibrium and rates
+    Ed = 0.942 * RH ** 0.679 + 11 * np.exp((RH - 100) / 10) + 0.18 * (21.1 - T) * (1 - np.exp(-0.115 * RH))
+    Ew = 0.618 * RH ** 0.753 + 10 * np.exp((RH - 100) / 10) + 0.18 * (21.1 - T) * (1 - np.exp(-0.115 * RH))
+    ko = (0.424 * (1 - (RH / 100) ** 1.7) + 0.0694 * np.sqrt(W) * (1 - (RH / 100) ** 8)) * 0.581 * np.exp(0.0365 * T)
+    kw = (0.424 * (1 - ((100 - RH) / 100) ** 1.7) + 0.0694 * np.sqrt(W) * (1 - ((100 - RH) / 100) ** 8)) * 0.581 * np.exp(0.0365 * T)
+
+    m = np.where(
+        mr > Ed, Ed + (mr - Ed) * np.exp(-ko),
+        np.where(mr < Ew, Ew - (Ew - mr) * np.exp(-kw), mr)
+    )
+    return np.clip((59.5 * (250.0 - m)) / (147.2 + m), 0, 101)
+
+
+def daylight_hours(lat, day_of_year):
+    lat_rad = np.radians(lat)
+    decl = np.radians(23.44) * np.sin(np.radians(360.0 * (day_of_year + 284) / 365))
+    sunset_angle = np.arccos(np.clip(-np.tan(lat_rad) * np.tan(decl), -1, 1))
+    return sunset_angle * 24 / np.pi
+
+
+def dmc_next(dmc_prev, T, RH, R, lat, day_of_year):
+    P0 = np.asarray(dmc_prev, dtype=float)
+    T = np.maximum(T, -1.1)
+
+    # daily drying
+    K = 1.894 * (T + 1.1) * (100 - RH) * daylight_hours(lat, day_of_year) * 1e-6
+
+    # rain effect above 1.5 mm
+    re = np.maximum(R * 0.92 - 1.27, 0)
+    Mo = 20 + np.exp(5.6348 - P0 / 43.43)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        b = np.where(
+            P0 <= 33, 100 / (0.5 + 0.3 * P0),
+            np.where(P0 <= 65, 14 - 1.3 * np.log(P0), 6.2 * np.log(P0) - 17.2)
+        )
+        Mr = Mo + re * 1000 / (48.77 + b * re)
+        Pr = np.maximum(244.72 - 43.43 * np.log(Mr - 20), 0)
+
+    P_base = np.where(R > 1.5, Pr, P0)
+    return np.maximum(P_base + K * 100, 0)
+
+
+def dc_next(dc_prev, T, R):
+    re = np.maximum(R * 0.83 - 1.27, 0)
+    dc_rain = dc_prev - re * 400 / (re + 800)
+    dc_no_rain = dc_prev + T * 0.05
+    return np.maximum(np.where(R > 2.8, dc_rain, dc_no_rain), 0)
+
+
+# ---------------------------- FIRE BEHAVIOUR INDEXES ----------------------------
+
+def isi_from_ffmc_wind(ffmc, W):
+    ffmc = np.clip(ffmc, 0, 101)
+    m = 147.2 * (101.0 - ffmc) / (59.5 + ffmc)
+    fW = np.exp(0.05039 * W)
+    fF = 91.9 * np.exp(-0.1386 * m) * (1 + m ** 5.31 / 4.93e7)
+    return np.maximum(fW * fF * 0.208, 0)
+
+
+def bui_from_dmc_dc(dmc, dc):
+    with np.errstate(divide="ignore", invalid="ignore"):
+        case1 = dmc * dc * 0.8 / (dmc + dc * 0.4)
+        case2 = dmc - (1 - dc * 0.8 / (dmc + dc * 0.4)) * (0.92 + (0.0114 * dmc) ** 1.7)
+    bui = np.where(dmc <= dc * 0.4, case1, case2)
+    # DMC = DC = 0 gives 0 / 0
+    return np.maximum(np.nan_to_num(bui, nan=0.0), 0)
+
+
+def fwi_from_isi_bui(isi, bui):
+    fD = np.where(bui <= 80, 0.626 * bui ** 0.809 + 2, 1000 / (25 + 108.64 * np.exp(-0.023 * bui)))
+    B = isi * fD * 0.1
+    with np.errstate(divide="ignore", invalid="ignore"):
+        fwi = np.where(B <= 1, B, np.exp(2.72 * (0.434 * np.log(B)) ** 0.647))
+    return np.maximum(fwi, 0)
+
+
+# ---------------------------- DAILY ITERATION ----------------------------
+
+def fwi_step(ffmc, dmc, dc, T, RH, W, R, lat, day_of_year):
+    # one day of the system -> dict of the six codes
+    ffmc = ffmc_next(ffmc, T, RH, W, R)
+    dmc = dmc_next(dmc, T, RH, R, lat, day_of_year)
+    dc = dc_next(dc, T, R)
+    isi = isi_from_ffmc_wind(ffmc, W)
+    bui = bui_from_dmc_dc(dmc, dc)
+    return {"FFMC": ffmc, "DMC": dmc, "DC": dc, "ISI": isi, "BUI": bui, "FWI": fwi_from_isi_bui(isi, bui)}
+
+
+def fwi_series(T, RH, W, R, lat, days_of_year, ffmc0=FFMC_START, dmc0=DMC_START, dc0=DC_START):
+    # daily inputs of shape (days, ...) -> dict of the six codes with the same shape.
+    # a day with missing weather keeps the moisture codes of the day before and has NaN indexes
+    T, RH, W, R = (np.asarray(a, dtype=float) for a in (T, RH, W, R))
+    shape = T.shape[1:]
+    state = {
+        "FFMC": np.broadcast_to(np.asarray(ffmc0, dtype=float), shape),
+        "DMC": np.broadcast_to(np.asarray(dmc0, dtype=float), shape),
+        "DC": np.broadcast_to(np.asarray(dc0, dtype=float), shape)
+    }
+    series = {code: np.full(T.shape, np.nan) for code in FWI_CODES}
+
+    for d in range(T.shape[0]):
+        valid = ~(np.isnan(T[d]) | np.isnan(RH[d]) | np.isnan(W[d]) | np.isnan(R[d]))
+        with np.errstate(invalid="ignore"):
+            day = fwi_step(state["FFMC"], state["DMC"], state["DC"], T[d], RH[d], W[d], R[d], lat, days_of_year[d])
+
+        for code in ("FFMC", "DMC", "DC"):
+            state[code] = np.where(valid, day[code], state[code])
+            series[code][d] = state[code]
+        for code in ("ISI", "BUI", "FWI"):
+            series[code][d] = np.where(valid, day[code], np.nan)
+    return series
+
+
+# ---------------------------- STATE STORE ----------------------------
+
+def fwi_cell(lat, lon):
+    # centre of the state cell of a point
+    return round(round(lat / FWI_STATE_CELL_DEG) * FWI_STATE_CELL_DEG, 4), round(round(lon / FWI_STATE_CELL_DEG) * FWI_STATE_CELL_DEG, 4)
+
+
+class FwiStateStore:
+    # one row per cell and day with the six codes of that day.
+    # spinup_days: days iterated since the start values, a row is only replaced by one with a longer history
+
+    def __init__(self, path=FWI_STATE_PATH):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS fwi_state ("
+                " lat REAL NOT NULL, lon REAL NOT NULL, day TEXT NOT NULL,"
+                " ffmc REAL, dmc REAL, dc REAL, isi REAL, bui REAL, fwi REAL,"
+                " spinup_days INTEGER NOT NULL,"
+                " PRIMARY KEY (lat, lon, day))"
+            )
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=10)
+
+    def latest(self, lat, lon, day, max_age_days):
+        # (day, codes, spinup_days) of the newest row of the cell between day - max_age_days and day, None when there is none
+        oldest = date.fromordinal(day.toordinal() - max_age_days)
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT day, ffmc, dmc, dc, isi, bui, fwi, spinup_days FROM fwi_state"
+                " WHERE lat = ? AND lon = ? AND day <= ? AND day >= ? ORDER BY day DESC LIMIT 1",
+                (*fwi_cell(lat, lon), day.isoformat(), oldest.isoformat())
+            ).fetchone()
+        if row is None:
+            return None
+        return date.fromisoformat(row[0]), dict(zip(FWI_CODES, row[1:7])), row[7]
+
+    def save(self, lat, lon, rows):
+        # rows: (day, codes, spinup_days)
+        with self._connect() as conn:
+            conn.executemany(
+                "INSERT INTO fwi_state (lat, lon, day, ffmc, dmc, dc, isi, bui, fwi, spinup_days)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)"
+                " ON CONFLICT (lat, lon, day) DO UPDATE SET"
+                " ffmc = excluded.ffmc, dmc = excluded.dmc, dc = excluded.dc,"
+                " isi = excluded.isi, bui = excluded.bui, fwi = excluded.fwi, spinup_days = excluded.spinup_days"
+                " WHERE excluded.spinup_days >= fwi_state.spinup_days",
+                [
+                    (*fwi_cell(lat, lon), day.isoformat(), *(float(codes[code]) for code in FWI_CODES), int(spinup_days))
+                    for day, codes, spinup_days in rows
+                ]
+            )
+
+    def cells(self, since):
+        # (lat, lon, newest day) of every cell with a row on or after since
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT lat, lon, MAX(day) FROM fwi_state GROUP BY lat, lon HAVING MAX(day) >= ?",
+                (since.isoformat(),)
+            ).fetchall()
+        return [(lat, lon, date.fromisoformat(day)) for lat, lon, day in rows]
+
+    def prune(self, before):
+        with self._connect() as conn:
+            conn.execute("DELETE FROM fwi_state WHERE day < ?", (before.isoformat(),))
+
+
+_fwi_state_store = None
+_fwi_state_store_lock = threading.Lock()
+
+
+def get_fwi_state_store():
+    # one store per process, the sqlite file is shared by all of them
+    global _fwi_state_store
+    with _fwi_state_store_lock:
+        if _fwi_state_store is None:
+            _fwi_state_store = FwiStateStore()
+        return _fwi_state_store
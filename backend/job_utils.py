@@ -0,0 +1,324 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+import traceback
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from flask import Blueprint, jsonify, g
+from auth_utils import login_required
+
+jobs_bp = Blueprint("jobs", __name__) # Blueprint for job status route
+
+# ---------------------------- CONFIGURATION ----------------------------
+
+# local job store, results survive a restart of the server
+JOB_DB_PATH = Path(__file__).resolve().parent / "Cache" / "jobs.sqlite3"
+
+JOB_WORKERS = 4 # heavy analyses that run at the same time
+JOB_MAX_PENDING = 100 # queued + running jobs accepted before new jobs are refused
+JOB_RETENTION_S = 24 * 3600 # finished jobs are kept for one day
+
+# job states
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+
+# job kind -> function that runs it, filled by the feature modules when they are imported
+JOB_HANDLERS = {}
+
+
+class QueueFullError(Exception):
+    pass
+
+
+# ---------------------------- JOB STORE ----------------------------
+
+class JobStore:
+    # jobs in a small sqlite table: kind, owner, params, status and the JSON result
+
+    def __init__(self, path=JOB_DB_PATH):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS jobs ("
+                " id TEXT PRIMARY KEY, kind TEXT NOT NULL, user_id TEXT, params TEXT NOT NULL,"
+                " status TEXT NOT NULL, result TEXT, error TEXT,"
+                " created_at REAL NOT NULL, updated_at REAL NOT NULL, owner INTEGER)"
+            )
+            # stores created before jobs had an owner
+            if "owner" not in [row[1] for row in conn.execute("PRAGMA table_info(jobs)")]:
+                conn.execute("ALTER TABLE jobs ADD COLUMN owner INTEGER")
+            conn.execute("CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status)")
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=10)
+
+    def create(self, kind, user_id, params):
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT INTO jobs (id, kind, user_id, params, status, created_at, updated_at)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (job_id, kind, user_id, json.dumps(params), QUEUED, now, now)
+            )
+        return job_id
+
+    def set_status(self, job_id, status, result=None, error=None):
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE jobs SET status = ?, result = ?, error = ?, updated_at = ? WHERE id = ?",
+                (status, None if result is None else json.dumps(result), error, time.time(), job_id)
+            )
+
+    def claim(self, job_id):
+        # queued -> running for this process, False when another worker took the job first
+        with self._connect() as conn:
+            cursor = conn.execute(
+                "UPDATE jobs SET status = ?, owner = ?, updated_at = ? WHERE id = ? AND status = ?",
+                (RUNNING, os.getpid(), time.time(), job_id, QUEUED)
+            )
+        return cursor.rowcount == 1
+
+    def requeue(self, job_id, owner):
+        # running -> queued for a job whose process is gone, False when another worker requeued it first
+        with self._connect() as conn:
+            cursor = conn.execute(
+                "UPDATE jobs SET status = ?, owner = NULL, updated_at = ? WHERE id = ? AND status = ? AND owner IS ?",
+                (QUEUED, time.time(), job_id, RUNNING, owner)
+            )
+        return cursor.rowcount == 1
+
+    def get(self, job_id):
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT id, kind, user_id, params, status, result, error, created_at, updated_at, owner"
+                " FROM jobs WHERE id = ?",
+                (job_id,)
+            ).fetchone()
+        if row is None:
+            return None
+        return {
+            "id": row[0],
+            "kind": row[1],
+            "user_id": row[2],
+            "params": json.loads(row[3]),
+            "status": row[4],
+            "result": None if row[5] is None else json.loads(row[5]),
+            "error": row[6],
+            "created_at": row[7],
+            "updated_at": row[8],
+            "owner": row[9]
+        }
+
+    def pending(self):
+        # jobs that were queued or running, in creation order
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT id FROM jobs WHERE status IN (?, ?) ORDER BY created_at",
+                (QUEUED, RUNNING)
+            ).fetchall()
+        return [self.get(row[0]) for row in rows]
+
+    def count_pending(self):
+        with self._connect() as conn:
+            return conn.execute(
+                "SELECT COUNT(*) FROM jobs WHERE status IN (?, ?)", (QUEUED, RUNNING)
+            ).fetchone()[0]
+
+    def delete_finished_before(self, timestamp):
+        with self._connect() as conn:
+            conn.execute(
+                "DELETE FROM jobs WHERE status IN (?, ?) AND updated_at < ?",
+                (DONE, FAILED, timestamp)
+            )
+
+
+# ---------------------------- JOB RUNNER ----------------------------
+
+class JobRunner:
+    # bounded worker pool that runs registered job handlers and keeps their state in the store
+
+    def __init__(self, store, handlers=None, workers=JOB_WORKERS, max_pending=JOB_MAX_PENDING, resume_on_start=False):
+        # resume_on_start: run again the jobs cut by a restart the first time the pool is used in a process
+        self.store = store
+        self.max_pending = max_pending
+        self.handlers = JOB_HANDLERS if handlers is None else handlers
+        self.workers = workers
+        self.resume_on_start = resume_on_start
+        self._executor = None
+        self._executor_pid = None
+        self._lock = threading.Lock()
+        self._executor_lock = threading.Lock()
+
+    def register(self, kind, handler):
+        # handler(**params) returns the JSON result of the job
+        self.handlers[kind] = handler
+
+    def submit(self, kind, user_id, params):
+        if kind not in self.handlers:
+            raise ValueError(f"Unknown job kind: {kind}")
+
+        with self._lock:
+            if self.store.count_pending() >= self.max_pending:
+                raise QueueFullError("Too many jobs are waiting, try again later.")
+            self.store.delete_finished_before(time.time() - JOB_RETENTION_S)
+            job_id = self.store.create(kind, user_id, params)
+
+        self.executor().submit(self._run, job_id, kind, params)
+        return job_id
+
+    def executor(self):
+        # threads do not survive a fork, so every worker process starts its own pool on first use
+        with self._executor_lock:
+            started = self._executor_pid != os.getpid()
+            if started:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="job")
+                self._executor_pid = os.getpid()
+            executor = self._executor
+        if started and self.resume_on_start:
+            self.resume_pending()
+        return executor
+
+    def resume_pending(self):
+        # jobs cut by a restart are run again from their saved params. every worker may try,
+        # the claim in _run lets only one of them run each job
+        resumed = 0
+        for job in self.store.pending():
+            if job["kind"] not in self.handlers:
+                self.store.set_status(job["id"], FAILED, error=f"Unknown job kind: {job['kind']}")
+                continue
+            # a running job is left alone while the worker that claimed it is alive
+            if job["status"] == RUNNING and (_job_alive(job) or not self.store.requeue(job["id"], job["owner"])):
+                continue
+            self.executor().submit(self._run, job["id"], job["kind"], job["params"])
+            resumed += 1
+        return resumed
+
+    def _run(self, job_id, kind, params):
+        # counted before the claim, so a resume never sees the job running without an owner here
+        _count_running(job_id, 1)
+        if not self.store.claim(job_id):
+            _count_running(job_id, -1)
+            return
+        try:
+            result = self.handlers[kind](**params)
+            self.store.set_status(job_id, DONE, result=result)
+        except Exception as e:
+            print(f">>> ERROR in job {kind} {job_id}:\n{traceback.format_exc()}")
+            self.store.set_status(job_id, FAILED, error=str(e) or type(e).__name__)
+        finally:
+            _count_running(job_id, -1)
+
+
+# job id -> threads of this process that run it or are about to claim it
+_running_here = {}
+_running_lock = threading.Lock()
+
+
+def _count_running(job_id, step):
+    with _running_lock:
+        count = _running_here.get(job_id, 0) + step
+        if count > 0:
+            _running_here[job_id] = count
+        else:
+            _running_here.pop(job_id, None)
+
+
+def _job_alive(job):
+    # the job store is a local file, so every owner is a process of this machine.
+    # a job of this pid that is not running here was left by an earlier process with the same pid
+    pid = job["owner"]
+    if pid is None:
+        return False
+    if pid == os.getpid():
+        with _running_lock:
+            return job["id"] in _running_here
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+_runner = None
+_runner_lock = threading.Lock()
+
+
+def get_job_runner():
+    # one runner per process, the store is opened on first use. the pool and the resume of
+    # the jobs cut by a restart happen in the worker that uses it, not in a preloading master
+    global _runner
+    with _runner_lock:
+        if _runner is None:
+            _runner = JobRunner(JobStore(), resume_on_start=True)
+    _runner.executor()
+    return _runner
+
+
+def register_job_handler(kind, handler):
+    # handler(**params) returns the JSON result of the job
+    JOB_HANDLERS[kind] = handler
+
+
+def wants_async(data, args):
+    # async mode is asked with {"async": true} in the body or ?async=1
+    value = data.get("async", args.get("async"))
+    return str(value).lower() in ("1", "true", "yes")
+
+
+def wants_enrichment(data, args):
+    # the enrichment stages are asked with {"enrich": true} in the body or ?enrich=1
+    value = data.get("enrich", args.get("enrich"))
+    return str(value).lower() in ("1", "true", "yes")
+
+
+def submit_job_response(kind, user_id, params):
+    # queue the job and build the 202 response, 503 when the queue is full
+    try:
+        job_id = get_job_runner().submit(kind, user_id, params)
+    except QueueFullError as e:
+        return jsonify({"ok": False, "error": "queue_full", "message": str(e)}), 503
+
+    return jsonify({
+        "ok": True,
+        "job_id": job_id,
+        "status": QUEUED,
+        "status_url": f"/jobs/{job_id}"
+    }), 202
+
+
+# ---------------------------- ROUTE ----------------------------
+
+@jobs_bp.route("/jobs/<job_id>", methods=["GET"])
+@login_required
+def job_status_route(job_id):
+    job = get_job_runner().store.get(job_id)
+
+    # jobs of other users are reported as missing
+    if job is None or job["user_id"] != g.user_uid:
+        return jsonify({"ok": False, "error": "job_not_found"}), 404
+
+    out = {
+        "ok": True,
+        "job_id": job["id"],
+        "kind": job["kind"],
+        "status": job["status"],
+        "created_at": job["created_at"],
+        "updated_at": job["updated_at"]
+    }
+    if job["status"] == DONE:
+        out["result"] = job["result"]
+    elif job["status"] == FAILED:
+        out["error"] = job["error"]
+    return jsonify(out), 200
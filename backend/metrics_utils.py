@@ -0,0 +1,251 @@
+import bisect
+import functools
+import threading
+import time
+from urllib.parse import urlparse
+
+from flask import Blueprint, Response, g, request
+
+metrics_bp = Blueprint("metrics", __name__) # Blueprint for the metrics route
+
+# latency buckets in seconds, Earth Engine calls can take tens of seconds
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _label_text(names, values, extra=None):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_number(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Histogram:
+    # cumulative-bucket histogram per label set, in the Prometheus text format
+
+    def __init__(self, name, help_text, label_names, buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = tuple(label_names)
+        self.buckets = tuple(buckets)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, *label_values):
+        # one counter per bucket (not cumulative), the sum and the count
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def snapshot(self, *label_values):
+        with self._lock:
+            series = self._series.get(tuple(label_values))
+            return None if series is None else (list(series[0]), series[1], series[2])
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            items = [(labels, list(s[0]), s[1], s[2]) for labels, s in sorted(self._series.items())]
+
+        for labels, counts, total, count in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                le = 'le="' + _format_number(bound) + '"'
+                lines.append(f"{self.name}_bucket{_label_text(self.label_names, labels, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_label_text(self.label_names, labels)} {_format_number(total)}")
+            lines.append(f"{self.name}_count{_label_text(self.label_names, labels)} {count}")
+        return "\n".join(lines)
+
+
+class Counter:
+    def __init__(self, name, help_text, label_names):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = tuple(label_names)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values, amount=1):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            items = sorted(self._values.items())
+        for labels, value in items:
+            lines.append(f"{self.name}{_label_text(self.label_names, labels)} {value}")
+        return "\n".join(lines)
+
+
+# ---------------------------- METRICS ----------------------------
+
+REQUEST_LATENCY = Histogram(
+    "wameed_http_request_duration_seconds",
+    "Latency of HTTP requests by route.",
+    ("blueprint", "route", "method", "status")
+)
+
+DEPENDENCY_LATENCY = Histogram(
+    "wameed_dependency_call_duration_seconds",
+    "Latency of outbound dependency calls.",
+    ("dependency", "operation", "outcome")
+)
+
+DEPENDENCY_ERRORS = Counter(
+    "wameed_dependency_call_errors_total",
+    "Outbound dependency calls that raised an exception.",
+    ("dependency", "operation")
+)
+
+REGISTRY = [REQUEST_LATENCY, DEPENDENCY_LATENCY, DEPENDENCY_ERRORS]
+
+
+def register_metric(metric):
+    # extra metrics from other modules, shown by /metrics
+    REGISTRY.append(metric)
+    return metric
+
+
+def render_metrics():
+    return "\n".join(metric.render() for metric in REGISTRY) + "\n"
+
+
+def observe_dependency(dependency, operation, seconds, ok=True):
+    DEPENDENCY_LATENCY.observe(seconds, dependency, operation, "ok" if ok else "error")
+    if not ok:
+        DEPENDENCY_ERRORS.inc(dependency, operation)
+
+
+# ---------------------------- DEPENDENCY TIMING ----------------------------
+
+def _timed(func, dependency, operation):
+    # operation is a string or a function of the call arguments
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        op = operation(*args, **kwargs) if callable(operation) else operation
+        start = time.perf_counter()
+        ok = False
+        try:
+            result = func(*args, **kwargs)
+            ok = True
+            return result
+        finally:
+            observe_dependency(dependency, op, time.perf_counter() - start, ok)
+
+    wrapper.__metrics_wrapped__ = True
+    return wrapper
+
+
+def _timed_stream(func, dependency, operation):
+    # generators are timed until they are fully read or closed
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        ok = False
+        try:
+            yield from func(*args, **kwargs)
+            ok = True
+        finally:
+            observe_dependency(dependency, operation, time.perf_counter() - start, ok)
+
+    wrapper.__metrics_wrapped__ = True
+    return wrapper
+
+
+def _wrap(owner, name, dependency, operation, stream=False):
+    func = getattr(owner, name, None)
+    if func is None or getattr(func, "__metrics_wrapped__", False):
+        return False
+    wrapper = (_timed_stream if stream else _timed)(func, dependency, operation)
+    setattr(owner, name, wrapper)
+    return True
+
+
+def _http_operation(self, method, url, *args, **kwargs):
+    # requests.Session.request(method, url): label with method and host only
+    return f"{str(method).upper()} {urlparse(str(url)).netloc}"
+
+
+def instrument_dependencies():
+    # wrap the client calls of every outbound dependency, safe to call more than once
+    import ee
+    import requests
+
+    # getInfo() of every ee object goes through ee.data.computeValue
+    _wrap(ee.data, "computeValue", "earth_engine", "computeValue")
+    _wrap(ee.data, "computePixels", "earth_engine", "computePixels")
+    _wrap(ee.data, "getMapId", "earth_engine", "getMapId")
+
+    # requests.get / requests.post and every Session go through Session.request
+    _wrap(requests.Session, "request", "http", _http_operation)
+
+    try:
+        from firebase_admin import auth
+        _wrap(auth, "verify_id_token", "firebase_auth", "verify_id_token")
+    except ImportError:
+        pass
+
+    try:
+        from google.cloud.firestore_v1.document import DocumentReference
+        from google.cloud.firestore_v1.collection import CollectionReference
+        from google.cloud.firestore_v1.query import Query
+
+        for name in ("get", "set", "update", "delete", "create"):
+            _wrap(DocumentReference, name, "firestore", f"document.{name}")
+        _wrap(CollectionReference, "add", "firestore", "collection.add")
+        # collection.stream / collection.get and query.get read through Query.stream, it is timed there only
+        _wrap(Query, "stream", "firestore", "query.stream", stream=True)
+    except ImportError:
+        pass
+
+
+# ---------------------------- FLASK HOOKS ----------------------------
+
+def _before_request():
+    g._metrics_start = time.perf_counter()
+
+
+def _after_request(response):
+    start = g.pop("_metrics_start", None)
+    if start is not None:
+        # route pattern instead of the raw path keeps the label set small
+        route = request.url_rule.rule if request.url_rule is not None else "unmatched"
+        REQUEST_LATENCY.observe(
+            time.perf_counter() - start,
+            request.blueprint or "",
+            route,
+            request.method,
+            str(response.status_code)
+        )
+    return response
+
+
+def init_metrics(app):
+    # request timing for every route, dependency timing, and the /metrics route
+    app.before_request(_before_request)
+    app.after_request(_after_request)
+    app.register_blueprint(metrics_bp)
+    instrument_dependencies()
+
+
+# ---------------------------- ROUTE ----------------------------
+
+@metrics_bp.route("/metrics", methods=["GET"])
+def metrics_route():
+    return Response(render_metrics(), mimetype="text/plain; version=0.0.4; charset=utf-8")
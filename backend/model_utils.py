@@ -0,0 +1,197 @@
+import numpy as np
+
+# largest batch scored by the NumPy trees, bigger batches are faster through the fitted model's own (Cython) trees
+NUMPY_TREE_MAX_ROWS = 128
+
+
+# ---------------------------- SKLEARN PATH ----------------------------
+
+def sklearn_predict_proba(rows, model, preprocessor):
+    # fire probability of every feature row with one transform and one predict_proba
+    import pandas as pd
+    X_new = pd.DataFrame(rows)
+
+    # reorder columns to match the columns used during training
+    if hasattr(preprocessor, "feature_names_in_"):
+        X_new = X_new.reindex(columns=list(preprocessor.feature_names_in_))
+
+    # apply preprocessing pipeline
+    X_processed = preprocessor.transform(X_new)
+
+    # convert sparse matrix to normal array if needed
+    if hasattr(X_processed, "toarray"):
+        X_processed = X_processed.toarray()
+
+    # convert processed data into dataframe for model input
+    X_processed_df = pd.DataFrame(X_processed, columns=preprocessor.get_feature_names_out())
+
+    # probability of class 1 = fire
+    return np.asarray(model.predict_proba(X_processed_df))[:, 1]
+
+
+# ---------------------------- PREPROCESSOR ----------------------------
+
+def _compile_steps(steps, n_columns):
+    # pipeline steps -> list of ("fill" | "scale" | "onehot", arrays)
+    from sklearn.impute import SimpleImputer
+    from sklearn.preprocessing import OneHotEncoder, StandardScaler
+
+    ops = []
+    for _, step in steps:
+        if isinstance(step, SimpleImputer):
+            if not (isinstance(step.missing_values, float) and np.isnan(step.missing_values)):
+                raise TypeError("Only NaN imputation can be compiled")
+            if getattr(step, "add_indicator", False):
+                raise TypeError("Imputer missing indicators cannot be compiled")
+            ops.append(("fill", np.asarray(step.statistics_, dtype=float)))
+
+        elif isinstance(step, StandardScaler):
+            mean = np.zeros(n_columns) if step.mean_ is None else np.asarray(step.mean_, dtype=float)
+            scale = np.ones(n_columns) if step.scale_ is None else np.asarray(step.scale_, dtype=float)
+            ops.append(("scale", (mean, scale)))
+
+        elif isinstance(step, OneHotEncoder):
+            if step.handle_unknown != "ignore":
+                raise TypeError("Only handle_unknown='ignore' can be compiled")
+            # kept categories of every column, the dropped category encodes as all zeros like unknown ones
+            drop_idx = step.drop_idx_ if step.drop_idx_ is not None else [None] * len(step.categories_)
+            lookups = []
+            for categories, dropped in zip(step.categories_, drop_idx):
+                kept = np.asarray(categories, dtype=float)
+                if dropped is not None:
+                    kept = np.delete(kept, dropped)
+                lookups.append(kept)
+            ops.append(("onehot", lookups))
+            n_columns = sum(len(kept) for kept in lookups)
+
+        else:
+            raise TypeError(f"Preprocessing step {type(step).__name__} cannot be compiled")
+    return ops
+
+
+def _apply_steps(ops, X):
+    for kind, arrays in ops:
+        if kind == "fill":
+            X = np.where(np.isnan(X), arrays, X)
+        elif kind == "scale":
+            mean, scale = arrays
+            X = (X - mean) / scale
+        else:
+            X = np.concatenate([X[:, [j]] == kept for j, kept in enumerate(arrays)], axis=1).astype(float)
+    return X
+
+
+# ---------------------------- TREES ----------------------------
+
+def _compile_trees(trees):
+    # every tree node in one flat array set, leaves point to themselves so they stay put while descending
+    offsets = np.cumsum([0] + [tree.node_count for tree in trees[:-1]])
+    feature, threshold, left, right, value = [], [], [], [], []
+
+    for offset, tree in zip(offsets, trees):
+        is_leaf = tree.children_left == -1
+        own = np.arange(tree.node_count) + offset
+        feature.append(np.where(is_leaf, 0, tree.feature))
+        threshold.append(tree.threshold)
+        left.append(np.where(is_leaf, own, tree.children_left + offset))
+        right.append(np.where(is_leaf, own, tree.children_right + offset))
+        value.append(tree.value[:, 0, 0])
+
+    return {
+        "roots": np.asarray(offsets, dtype=np.intp),
+        "feature": np.concatenate(feature).astype(np.intp),
+        "threshold": np.concatenate(threshold).astype(float),
+        "left": np.concatenate(left).astype(np.intp),
+        "right": np.concatenate(right).astype(np.intp),
+        "value": np.concatenate(value).astype(float),
+        "depth": max(tree.max_depth for tree in trees)
+    }
+
+
+# ---------------------------- COMPILED MODEL ----------------------------
+
+class CompiledFireModel:
+    # the fitted ColumnTransformer + GradientBoostingClassifier as plain NumPy arrays,
+    # small batches are scored without pandas or sklearn, probabilities match predict_proba
+
+    def __init__(self, model, preprocessor, numpy_tree_max_rows=NUMPY_TREE_MAX_ROWS):
+        from sklearn.compose import ColumnTransformer
+        from sklearn.ensemble import GradientBoostingClassifier
+        from sklearn.pipeline import Pipeline
+
+        if not isinstance(preprocessor, ColumnTransformer) or not isinstance(model, GradientBoostingClassifier):
+            raise TypeError("Only a ColumnTransformer and a GradientBoostingClassifier can be compiled")
+        if model.n_classes_ != 2 or model.loss != "log_loss":
+            raise TypeError("Only binary log_loss gradient boosting can be compiled")
+
+        # (input columns, compiled steps) for every transformer, in output order
+        self.blocks = []
+        for _, transformer, columns in preprocessor.transformers_:
+            if transformer == "drop":
+                continue
+            if not isinstance(transformer, Pipeline):
+                raise TypeError(f"Transformer {type(transformer).__name__} cannot be compiled")
+            self.blocks.append((list(columns), _compile_steps(transformer.steps, len(columns))))
+
+        self.trees = _compile_trees([estimator.tree_ for estimator in model.estimators_[:, 0]])
+        self.learning_rate = float(model.learning_rate)
+        self.init_raw = self._initial_raw_prediction(model)
+        self.n_features = int(model.n_features_in_)
+
+        # large batches go back to the fitted model with the compiled input matrix
+        self.numpy_tree_max_rows = numpy_tree_max_rows
+        self._model = model
+        self._feature_names = list(preprocessor.get_feature_names_out())
+
+    @staticmethod
+    def _initial_raw_prediction(model):
+        # log-odds of the init estimator, clipped like sklearn does
+        if model.init_ == "zero":
+            return 0.0
+        proba = model.init_.predict_proba(np.zeros((1, model.n_features_in_)))[0, 1]
+        eps = np.finfo(np.float32).eps
+        proba = np.clip(proba, eps, 1 - eps)
+        return float(np.log(proba / (1 - proba)))
+
+    def transform(self, rows):
+        # feature dicts -> model input matrix
+        parts = []
+        for columns, ops in self.blocks:
+            X = np.array(
+                [[np.nan if row.get(c) is None else row.get(c) for c in columns] for row in rows],
+                dtype=float
+            ).reshape(len(rows), len(columns))
+            parts.append(_apply_steps(ops, X))
+        X = np.concatenate(parts, axis=1)
+        if X.shape[1] != self.n_features:
+            raise ValueError(f"Compiled preprocessor gives {X.shape[1]} features, the model expects {self.n_features}")
+        return X
+
+    def decision_function(self, X):
+        trees = self.trees
+
+        # sklearn trees compare float32 inputs against the thresholds
+        X = np.asarray(X, dtype=np.float32)
+        rows = np.arange(len(X))[:, None]
+
+        # descend every tree of every row one level per step
+        nodes = np.broadcast_to(trees["roots"], (len(X), len(trees["roots"])))
+        for _ in range(trees["depth"]):
+            go_left = X[rows, trees["feature"][nodes]] <= trees["threshold"][nodes]
+            nodes = np.where(go_left, trees["left"][nodes], trees["right"][nodes])
+
+        return self.init_raw + self.learning_rate * trees["value"][nodes].sum(axis=1)
+
+    def predict_proba(self, rows):
+        # probability of class 1 = fire for every feature dict
+        if not rows:
+            return np.zeros(0)
+        X = self.transform(rows)
+
+        if len(rows) > self.numpy_tree_max_rows:
+            import pandas as pd
+            X = pd.DataFrame(X, columns=self._feature_names)
+            return np.asarray(self._model.predict_proba(X))[:, 1]
+
+        raw = self.decision_function(X)
+        return 1.0 / (1.0 + np.exp(-raw))
@@ -0,0 +1,135 @@
+import sqlite3
+import threading
+import time
+import traceback
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+# ---------------------------- CONFIGURATION ----------------------------
+
+# last run of every daily job, shared by the worker processes so each run happens in one of them only
+SCHEDULE_DB_PATH = Path(__file__).resolve().parent / "Cache" / "schedule.sqlite3"
+
+# a loop that wakes up this much before hour_utc:00 still runs the job of that hour
+SLOT_TOLERANCE_S = 60
+
+# a failed run is tried again after this long, by any worker
+RETRY_INTERVAL_S = 1800
+
+# a run still marked as running after this long was cut with its process and can be claimed again
+RUN_TIMEOUT_S = 6 * 3600
+
+
+def _seconds_until(hour_utc, now=None):
+    # seconds from now until the next hour_utc:00 UTC
+    now = now or datetime.now(timezone.utc)
+    next_run = now.replace(hour=hour_utc, minute=0, second=0, microsecond=0)
+    if next_run <= now:
+        next_run += timedelta(days=1)
+    return (next_run - now).total_seconds()
+
+
+def _last_slot(hour_utc, now=None):
+    # the latest hour_utc:00 UTC that is not after now
+    now = now or datetime.now(timezone.utc)
+    slot = now.replace(hour=hour_utc, minute=0, second=0, microsecond=0)
+    if slot > now:
+        slot -= timedelta(days=1)
+    return slot
+
+
+def _connect(path):
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(path, timeout=30, isolation_level=None)
+    # done: last slot that ran to the end. running: slot taken by a process, with the time it was taken
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS scheduled_runs ("
+        " name TEXT PRIMARY KEY, done TEXT NOT NULL DEFAULT '', running TEXT, running_since REAL)"
+    )
+    return conn
+
+
+def claim_run(name, slot, path=SCHEDULE_DB_PATH, now=None):
+    # True for the first process that asks for a slot of the job that is not done nor being run, False for the others
+    now = time.time() if now is None else now
+    conn = _connect(path)
+    try:
+        # the write lock is taken before reading, so two workers cannot both see the slot free
+        conn.execute("BEGIN IMMEDIATE")
+        conn.execute("INSERT OR IGNORE INTO scheduled_runs (name) VALUES (?)", (name,))
+        done, running, running_since = conn.execute(
+            "SELECT done, running, running_since FROM scheduled_runs WHERE name = ?", (name,)
+        ).fetchone()
+        # a run older than RUN_TIMEOUT_S was cut with its process
+        if done >= slot.isoformat() or (running == slot.isoformat() and running_since > now - RUN_TIMEOUT_S):
+            conn.execute("ROLLBACK")
+            return False
+        conn.execute(
+            "UPDATE scheduled_runs SET running = ?, running_since = ? WHERE name = ?", (slot.isoformat(), now, name)
+        )
+        conn.execute("COMMIT")
+        return True
+    finally:
+        conn.close()
+
+
+def finish_run(name, slot, ok, path=SCHEDULE_DB_PATH):
+    # a slot is done only when its run went through, a failed one can be claimed again
+    conn = _connect(path)
+    try:
+        if ok:
+            conn.execute(
+                "UPDATE scheduled_runs SET done = max(done, ?), running = NULL, running_since = NULL WHERE name = ?",
+                (slot.isoformat(), name)
+            )
+        else:
+            conn.execute(
+                "UPDATE scheduled_runs SET running = NULL, running_since = NULL WHERE name = ? AND running = ?",
+                (name, slot.isoformat())
+            )
+    finally:
+        conn.close()
+
+
+def run_daily(name, func, hour_utc=0, run_now=True, lock_path=SCHEDULE_DB_PATH):
+    # run func once a day at hour_utc in a daemon thread, errors are printed and the loop keeps going.
+    # every worker may start the loop, the run of each day is claimed in lock_path by one of them,
+    # and a failed run is tried again after RETRY_INTERVAL_S
+    stop_event = threading.Event()
+
+    def loop():
+        wait_s = 0 if run_now else _seconds_until(hour_utc)
+        while not stop_event.wait(wait_s):
+            wait_s = _seconds_until(hour_utc)
+            if not _run(name, func, hour_utc, lock_path):
+                wait_s = min(wait_s, RETRY_INTERVAL_S)
+
+    thread = threading.Thread(target=loop, name=name, daemon=True)
+    thread.start()
+    return stop_event
+
+
+def _run(name, func, hour_utc, lock_path):
+    # False when the run of this process failed
+    slot = _last_slot(hour_utc, datetime.now(timezone.utc) + timedelta(seconds=SLOT_TOLERANCE_S))
+    try:
+        if not claim_run(name, slot, lock_path):
+            return True
+    except Exception:
+        print(f">>> ERROR in daily job {name}:\n{traceback.format_exc()}")
+        return False
+
+    try:
+        func()
+    except Exception:
+        print(f">>> ERROR in daily job {name}:\n{traceback.format_exc()}")
+        ok = False
+    else:
+        ok = True
+
+    try:
+        finish_run(name, slot, ok, lock_path)
+    except Exception:
+        print(f">>> ERROR in daily job {name}:\n{traceback.format_exc()}")
+    return ok
@@ -1,4 +1,7 @@
+import os
 import pytest
+
+os.environ.setdefault("DAILY_JOBS", "0") # no archive refresh or re-scoring against the real services while testing
 from FlaskMain import app
 import auth_utils
 
@@ -0,0 +1,121 @@
+import inspect
+import json
+from contextlib import contextmanager
+
+
+# recording stand-in for the Earth Engine client library.
+# every attribute access and call builds a node, so the computation graph
+# built by our helpers can be measured without credentials or network.
+class StubObject:
+    def __init__(self, name, parent=None, args=(), kwargs=None, is_call=False, recorder=None):
+        self._name = name
+        self._parent = parent
+        self._args = args
+        self._kwargs = kwargs or {}
+        self._is_call = is_call
+        self._recorder = recorder
+
+    def __getattr__(self, attr):
+        if attr.startswith("__"):
+            raise AttributeError(attr)
+        return StubObject(attr, parent=self, recorder=self._recorder)
+
+    def __call__(self, *args, **kwargs):
+        # Python functions passed to map / iterate are traced into the graph, like the client library does
+        args = tuple(self._recorder.trace(arg) for arg in args)
+        kwargs = {k: self._recorder.trace(v) for k, v in kwargs.items()}
+        node = StubObject(self._name, self._parent, args, kwargs, True, self._recorder)
+
+        # evaluation is the only place where the client library talks to the server
+        if self._name == "getInfo":
+            return self._recorder.evaluate(self._parent)
+
+        self._recorder.calls.append(node)
+        return node
+
+    def __bool__(self):
+        return True
+
+
+class GraphRecorder:
+    def __init__(self, responses=None):
+        self.calls = []
+        self.evaluations = []
+        self.responses = list(responses or [])
+
+    def evaluate(self, obj):
+        # record the evaluated graph and return the next recorded response
+        self.evaluations.append(obj)
+        if self.responses:
+            return self.responses.pop(0)
+        return None
+
+    def trace(self, value):
+        # call a Python function once with placeholder arguments and keep the graph it returns
+        if not (inspect.isfunction(value) or inspect.ismethod(value)):
+            return value
+        params = [
+            p for p in inspect.signature(value).parameters.values()
+            if p.kind in (p.POSITIONAL_ONLY, p.POSITIONAL_OR_KEYWORD) and p.default is p.empty
+        ]
+        placeholders = [StubObject(f"_MAPPING_VAR_{i}", recorder=self) for i in range(len(params))]
+        return value(*placeholders)
+
+    def count(self, name):
+        # number of calls to one function, e.g. count("reduceRegion")
+        return sum(1 for node in self.calls if node._name == name)
+
+
+def _encode(value, table, ids):
+    # shared sub-graphs are stored once and referenced, like the real serializer does
+    if isinstance(value, StubObject):
+        key = id(value)
+        if key not in ids:
+            encoded = {"name": value._name}
+            if value._parent is not None:
+                encoded["on"] = _encode(value._parent, table, ids)
+            if value._is_call:
+                encoded["args"] = [_encode(arg, table, ids) for arg in value._args]
+                encoded["kwargs"] = {k: _encode(v, table, ids) for k, v in value._kwargs.items()}
+            ids[key] = str(len(table))
+            table.append(encoded)
+        return {"ref": ids[key]}
+    if isinstance(value, dict):
+        return {str(k): _encode(v, table, ids) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_encode(v, table, ids) for v in value]
+    return value
+
+
+def serialize(obj):
+    # serialized request body for one evaluated object
+    table = []
+    root = _encode(obj, table, {})
+    return json.dumps({"result": root, "values": table}, separators=(",", ":"))
+
+
+def graph_size(obj):
+    # number of distinct function calls reachable from the evaluated object
+    table = []
+    _encode(obj, table, {})
+    return sum(1 for node in table if "args" in node)
+
+
+def new_stub(responses=None, recorder=None):
+    recorder = recorder or GraphRecorder(responses)
+    return StubObject("ee", recorder=recorder), recorder
+
+
+@contextmanager
+def stub_ee(*modules, responses=None, recorder=None):
+    # replace the ee module used by the given modules with a recording stub
+    stub, recorder = new_stub(responses, recorder)
+    saved = [(module, module.ee) for module in modules]
+
+    for module in modules:
+        module.ee = stub
+    try:
+        yield recorder
+    finally:
+        for module, original in saved:
+            module.ee = original
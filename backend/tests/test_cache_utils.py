@@ -0,0 +1,50 @@
+import unittest  # unit test library
+from cache_utils import TTLCache
+
+
+# clock that only moves when the test moves it
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestTTLCache(unittest.TestCase):
+
+    def setUp(self):
+        self.clock = FakeClock()
+        self.cache = TTLCache(max_entries=2, default_ttl_s=60, clock=self.clock)
+
+    def test_hit_and_miss_counters(self): # A stored value is a hit, an unknown key is a miss
+        self.cache.set("a", 1)
+        self.assertEqual(self.cache.get("a"), 1)
+        self.assertIsNone(self.cache.get("b"))
+
+        stats = self.cache.stats()
+        self.assertEqual(stats["hits"], 1)
+        self.assertEqual(stats["misses"], 1)
+
+    def test_entry_expires(self): # Entries are dropped after their own ttl
+        self.cache.set("short", 1, ttl_s=5)
+        self.cache.set("long", 2)
+        self.clock.now = 10
+
+        self.assertIsNone(self.cache.get("short"))
+        self.assertEqual(self.cache.get("long"), 2)
+        self.assertEqual(self.cache.stats()["expirations"], 1)
+
+    def test_least_recently_used_is_evicted(self): # The oldest unused entry goes first when full
+        self.cache.set("a", 1)
+        self.cache.set("b", 2)
+        self.cache.get("a")
+        self.cache.set("c", 3)
+
+        self.assertEqual(self.cache.get("a"), 1)
+        self.assertIsNone(self.cache.get("b"))
+        self.assertEqual(self.cache.stats()["evictions"], 1)
+
+
+if __name__ == "__main__":
+    unittest.main() # run test functions
@@ -0,0 +1,92 @@
+import unittest  # unit test library
+import sys
+import tempfile
+import types
+from datetime import date, datetime, timedelta, timezone
+from unittest.mock import patch
+
+import numpy as np
+
+from Singleton import fire_archive
+from Singleton.fire_archive import ARCHIVE_DAYS, ARCHIVE_LATENCY_DAYS, FireArchive, days_in_window
+
+
+class TestFireArchive(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        # 1 x 2 degree archive with 0.1 degree cells: 10 rows, 20 columns
+        self.archive = FireArchive(self.tmp.name, bounds=(20.0, 40.0, 21.0, 42.0), cell_deg=0.1)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def _mask_with_fire(self, row, col):
+        mask = np.zeros((self.archive.rows, self.archive.cols), dtype=bool)
+        mask[row, col] = True
+        return mask
+
+    def test_days_in_window(self): # Check that only days whose midnight is inside the window are used
+        days = days_in_window(
+            datetime(2025, 6, 7, 12, tzinfo=timezone.utc),
+            datetime(2025, 6, 10, 0, tzinfo=timezone.utc)
+        )
+        self.assertEqual(days, [date(2025, 6, 8), date(2025, 6, 9)])
+
+    def test_window_lookup(self): # Check that a fire cell is found only by boxes that cover it
+        days = [date(2025, 6, 8), date(2025, 6, 9)]
+        # cell row 2, col 13 covers lat 20.7-20.8, lon 41.3-41.4
+        self.archive.write_day("VIIRS", days[0], np.zeros((10, 20), dtype=bool))
+        self.archive.write_day("VIIRS", days[1], self._mask_with_fire(2, 13))
+
+        self.assertTrue(self.archive.window_has_fire("VIIRS", days, (20.72, 41.32, 20.78, 41.38)))
+        self.assertFalse(self.archive.window_has_fire("VIIRS", days, (20.42, 41.32, 20.48, 41.38)))
+        self.assertFalse(self.archive.window_has_fire("VIIRS", days[:1], (20.72, 41.32, 20.78, 41.38)))
+
+    def test_missing_day_or_product(self): # Check that the archive does not answer when a day is missing
+        day = date(2025, 6, 8)
+        self.archive.write_day("VIIRS", day, self._mask_with_fire(2, 13))
+        box = (20.72, 41.32, 20.78, 41.38)
+
+        self.assertEqual(self.archive.count_detected(["VIIRS"], [day], box), 1)
+        self.assertIsNone(self.archive.count_detected(["VIIRS", "MODIS_TERRA"], [day], box))
+        self.assertIsNone(self.archive.count_detected(["VIIRS"], [day], (30.0, 41.0, 30.1, 41.1)))
+
+    def test_prune(self): # Check that old days are removed
+        self.archive.write_day("VIIRS", date(2025, 6, 1), np.zeros((10, 20), dtype=bool))
+        self.archive.write_day("VIIRS", date(2025, 6, 9), np.zeros((10, 20), dtype=bool))
+        self.archive.prune(date(2025, 6, 5))
+
+        self.assertFalse(self.archive.has_day("VIIRS", date(2025, 6, 1)))
+        self.assertTrue(self.archive.has_day("VIIRS", date(2025, 6, 9)))
+
+    def test_refresh_fetches_recent_days_again(self): # Check that days inside the product latency are fetched on every refresh
+        today = date(2025, 6, 20)
+        fetched = []
+
+        def fetch(archive, product, day):
+            fetched.append(day)
+            return self._mask_with_fire(2, 13)
+
+        products = types.SimpleNamespace(PRODUCTS=[{"label": "VIIRS"}])
+        with patch.dict(sys.modules, {"FireDetection": products}), patch.object(fire_archive, "fetch_daily_fire_mask", side_effect=fetch):
+            fire_archive.refresh_fire_archive(self.archive, today)
+            self.assertEqual(len(fetched), ARCHIVE_DAYS)
+            fetched.clear()
+            fire_archive.refresh_fire_archive(self.archive, today)
+
+        self.assertEqual(fetched, [today - timedelta(days=offset) for offset in range(ARCHIVE_LATENCY_DAYS, 0, -1)])
+
+    def test_replaced_day_is_read_again(self): # Check that a day rewritten by another process is not served from the old map
+        day = date(2025, 6, 8)
+        box = (20.72, 41.32, 20.78, 41.38)
+        self.archive.write_day("VIIRS", day, np.zeros((10, 20), dtype=bool))
+        self.assertFalse(self.archive.window_has_fire("VIIRS", [day], box))
+
+        other = FireArchive(self.tmp.name, bounds=(20.0, 40.0, 21.0, 42.0), cell_deg=0.1)
+        other.write_day("VIIRS", day, self._mask_with_fire(2, 13))
+        self.assertTrue(self.archive.window_has_fire("VIIRS", [day], box))
+
+
+if __name__ == "__main__":
+    unittest.main() # run test functions
@@ -2,7 +2,7 @@ import unittest  # unit test library
 import sys
 import types
 from datetime import datetime, timezone
-from unittest.mock import patch
+from unittest.mock import MagicMock, patch
 
 sys.modules.setdefault("ee", types.ModuleType("ee")) # Create a fake ee module before importing the target file
 
@@ -12,6 +12,7 @@ fake_auth.login_required = lambda f: f
 sys.modules["auth_utils"] = fake_auth
 
 import FireDetection as fd
+from ee_stub import stub_ee
 
 class TestFireDetection(unittest.TestCase):
 
@@ -74,7 +75,7 @@ class TestFireDetection(unittest.TestCase):
 
         # Replace helper functions with fixed values during the test
         with patch.object(fd, "_coerce_utc_datetime", return_value=ref_dt), \
-             patch.object(fd, "_analyze_aoi", return_value=strict_result):
+             patch.object(fd, "_analyze_zones", return_value=(strict_result, strict_result)):
 
             result = fd.detect_active_fire(18.2, 42.5, "2025-06-16T11:00:00Z")
 
@@ -84,5 +85,213 @@ class TestFireDetection(unittest.TestCase):
         self.assertTrue(result["selected_point_has_fire"])
         self.assertFalse(result["detected_nearby"])
 
+    def test_analyze_aoi_single_evaluation(self): # Check that the whole AOI analysis is fetched with one getInfo
+        ref_dt = datetime(2025, 6, 16, 11, 0, tzinfo= timezone.utc)
+
+        # Fake values returned by the single server-side evaluation
+        analysis = MagicMock()
+        analysis.getInfo.return_value = {
+            "sources": {
+                "VIIRS": {"collection_count": 2, "stats": {"sum": 3, "max": [8, 8, 12.5]},
+                          "dataset_time_ms": 1750068000000},
+                "MODIS_TERRA": {"collection_count": 1, "stats": {"sum": 0, "max": [0, 5, 0]},
+                                "dataset_time_ms": None},
+                "MODIS_AQUA": {"collection_count": 0, "stats": {}, "dataset_time_ms": None}
+            },
+            "ndvi_raw": 2500,
+            "lulc_raw": 7,
+            "previous_sources": {
+                "VIIRS": {"collection_count": 5, "stats": {"sum": 1, "max": [7, 7, 3.0]}}
+            },
+            "weather": {"temperature_2m": 303.15, "dewpoint_temperature_2m": 283.15}
+        }
+
+        with patch.object(fd, "_build_aoi", return_value="aoi"), \
+             patch.object(fd, "_build_aoi_analysis", return_value=analysis):
+            result = fd._analyze_aoi(18.2, 42.5, ref_dt, ref_dt.isoformat(), fd.STRICT_BUFFER_M, enrich=True)
+
+        # Check that the decision rules run on the returned values
+        analysis.getInfo.assert_called_once()
+        self.assertTrue(result["is_detected"])
+        self.assertEqual(result["sensor_agreement_count"], 1)
+        self.assertEqual(result["primary_source"], "VIIRS")
+        self.assertEqual(result["ndvi_mean"], 0.25)
+        self.assertEqual(result["land_type_group"], "shrubland")
+        self.assertTrue(result["persistence_confirmed"])
+        self.assertEqual(result["fused_confidence"], "High")
+        self.assertEqual(result["temperature"], 30.0)
+
+    def test_merge_fire_zones(self): # Check that strict and region answers are rebuilt from grouped records
+        summary = {
+            "collection_count": 2,
+            "dataset_time_ms": 1750068000000,
+            "groups": [
+                {"zone": 0, "sum": 2, "max": [9, 9, 40.0]},
+                {"zone": 1, "sum": 0, "max": [0, 5, 0]}
+            ]
+        }
+
+        strict = fd._merge_fire_zones(summary, (fd.STRICT_ZONE,))
+        region = fd._merge_fire_zones(summary, (fd.STRICT_ZONE, fd.REGION_ZONE))
+
+        strict = fd._parse_fire_product_summary(strict, fd.PRODUCTS[0])
+        region = fd._parse_fire_product_summary(region, fd.PRODUCTS[0])
+
+        self.assertFalse(strict["is_detected"])
+        self.assertEqual(strict["max_any_firemask"], 5)
+        self.assertEqual(region["fire_pixels"], 2)
+        self.assertEqual(region["max_firemask_class"], 9)
+        self.assertEqual(region["frp_max"], 40.0)
+
+    def test_merge_ndvi_and_lulc_zones(self): # Check pixel-weighted NDVI and summed LULC histograms
+        ndvi_groups = [{"zone": 0, "mean": 1000, "count": 30}, {"zone": 1, "mean": 3000, "count": 10}]
+        lulc_groups = [{"zone": 0, "histogram": {"16": 20, "7": 5}}, {"zone": 1, "histogram": {"7": 10}}]
+
+        self.assertEqual(fd._merge_ndvi_zones(ndvi_groups, (fd.STRICT_ZONE,)), 0.3)
+        self.assertEqual(fd._merge_ndvi_zones(ndvi_groups, (fd.STRICT_ZONE, fd.REGION_ZONE)), 0.15)
+        self.assertEqual(fd._merge_lulc_zones(lulc_groups, (fd.STRICT_ZONE,)), 7)
+        self.assertEqual(fd._merge_lulc_zones(lulc_groups, (fd.STRICT_ZONE, fd.REGION_ZONE)), 16)
+        self.assertEqual(fd._merge_lulc_zones([], (fd.STRICT_ZONE,)), 0)
+
+    def test_fire_product_summary_single_pass(self): # Check that one product summary reads the pixels once
+        with stub_ee(fd) as recorder:
+            aoi = fd._build_aoi(18.2, 42.5, fd.STRICT_BUFFER_M)
+            end_dt = fd.ee.Date("2025-06-16T11:00:00+00:00")
+            fd._fire_product_summary(aoi, end_dt.advance(-48, "hour"), end_dt, fd.PRODUCTS[0])
+
+        self.assertEqual(recorder.count("reduceRegion"), 1)
+        self.assertEqual(recorder.evaluations, [])
+
+    def test_boundary_fallback_one_evaluation(self): # Check that points are checked in one evaluation without the local boundary
+        points = [(18.2, 42.5), (30.0, 60.0), (24.7, 46.7)]
+        with stub_ee(fd, responses=[[True, False, True]]) as recorder, \
+                patch.object(fd.SaudiBoundary, "get_instance", return_value=None):
+            inside = fd._inside_saudi_many(points)
+            self.assertEqual(fd._inside_saudi_many([]), [])
+
+        self.assertEqual(inside, [True, False, True])
+        self.assertEqual(len(recorder.evaluations), 1)
+
+    def test_detection_cache_shares_nearby_clicks(self): # Check that close clicks in the same hour reuse one run
+        fd._detection_cache.clear()
+        result = {"ok": True, "is_detected": False, "lat": 18.2, "lon": 42.5,
+                  "detected_at": "2025-06-16T11:05:00+00:00", "fire_datetime": "2025-06-16T11:05:00+00:00"}
+
+        with patch.object(fd, "detect_active_fire", return_value=result) as detect:
+            first = fd.detect_active_fire_cached(18.2, 42.5, "2025-06-16T11:05:00Z")
+            second = fd.detect_active_fire_cached(18.2021, 42.4979, "2025-06-16T11:40:00Z")
+            other_hour = fd.detect_active_fire_cached(18.2, 42.5, "2025-06-16T13:05:00Z")
+
+        self.assertEqual(detect.call_count, 2)
+        self.assertEqual(first["lat"], 18.2)
+        self.assertEqual(second["lat"], 18.2021)
+        self.assertEqual(first["detected_at"], "2025-06-16T11:05:00+00:00")
+        self.assertEqual(second["detected_at"], "2025-06-16T11:40:00+00:00")
+        self.assertEqual(second["fire_datetime"], "2025-06-16T11:40:00+00:00")
+        self.assertFalse(other_hour["is_detected"])
+        fd._detection_cache.clear()
+
+    def test_zoned_analysis_uses_fire_archive(self): # Check that the archive answer replaces the previous window reduction
+        analysis = MagicMock()
+        analysis.getInfo.return_value = {}
+        ref_dt = datetime(2025, 6, 16, 12, tzinfo=timezone.utc)
+
+        with stub_ee(fd), patch.object(fd, "_archived_previous_observations", return_value=2), \
+             patch.object(fd, "_build_zoned_analysis", return_value=analysis) as build:
+            # enrich=True: one evaluation with every stage
+            strict_result, region_result = fd._analyze_zones(18.2, 42.5, ref_dt, ref_dt.isoformat(), enrich=True)
+
+        self.assertFalse(build.call_args[0][4])
+        self.assertEqual(strict_result["previous_fire_observations"], 2)
+        self.assertTrue(region_result["persistence_confirmed"])
+
+    def test_zones_skip_enrichment_without_sensor_fire(self): # Check that a no-fire answer needs only the sensor stage
+        analysis = MagicMock()
+        analysis.getInfo.return_value = {"sources": {}}
+        ref_dt = datetime(2025, 6, 16, 12, tzinfo=timezone.utc)
+
+        with stub_ee(fd), patch.object(fd, "_archived_previous_observations", return_value=None), \
+             patch.object(fd, "_build_zoned_analysis", return_value=analysis) as build:
+            strict_result, region_result = fd._analyze_zones(18.2, 42.5, ref_dt, ref_dt.isoformat())
+            response = fd._detection_response(18.2, 42.5, strict_result, region_result)
+
+        build.assert_called_once()
+        self.assertFalse(build.call_args.kwargs["include_enrichment"])
+        self.assertFalse(response["is_detected"])
+        self.assertEqual(response["skipped_fields"], fd.ENRICHMENT_FIELDS)
+        self.assertIsNone(response["lulc_name"])
+
+    def test_detect_active_fire_batch_one_evaluation(self): # Check that a batch of points is answered from one getInfo
+        fd._detection_cache.clear()
+
+        def fire_rows(sum_value, max_values, count, time_ms):
+            # point 1 is outside the swaths of the window
+            no_image = {"sum": 0, "max": [0, 0, 0], "collection_count": 0, "dataset_time_ms": 1718539200000}
+            return {"type": "FeatureCollection", "features": [
+                {"properties": {"point": 0, "zone": fd.STRICT_ZONE, "sum": sum_value, "max": max_values,
+                                "collection_count": count, "dataset_time_ms": time_ms}},
+                {"properties": {"point": 0, "zone": fd.REGION_ZONE, "sum": sum_value, "max": max_values,
+                                "collection_count": count, "dataset_time_ms": time_ms}},
+                {"properties": {"point": 1, "zone": fd.STRICT_ZONE, **no_image}},
+                {"properties": {"point": 1, "zone": fd.REGION_ZONE, **no_image}},
+            ]}
+
+        def zone_rows(name, value):
+            return {"type": "FeatureCollection", "features": [
+                {"properties": {"point": p, "zone": z, name: value}}
+                for p in (0, 1) for z in (fd.STRICT_ZONE, fd.REGION_ZONE)
+            ]}
+
+        values = {
+            "sources": {
+                product["label"]: {"features": fire_rows(3, [1, 1, 25.0], 2, 1718535600000)}
+                for product in fd.PRODUCTS
+            },
+            "previous_sources": {
+                product["label"]: {"features": fire_rows(0, [0, 0, 0], 0, None)}
+                for product in fd.PRODUCTS
+            },
+            "ndvi": zone_rows("mean", 2500),
+            "lulc": zone_rows("mode", 10),
+            "weather": {"features": [{"properties": {"point": 0, "temperature_2m": 303.15, "dewpoint_temperature_2m": 283.15}}]}
+        }
+
+        analysis = MagicMock()
+        analysis.getInfo.return_value = values
+        points = [(18.2, 42.5, None), (19.0, 43.0, None)]
+
+        with patch.object(fd, "_build_batch_analysis", return_value=analysis) as build:
+            results = fd.detect_active_fire_batch(points, "2025-06-16T12:00:00Z", enrich=True)
+            cached = fd.detect_active_fire_batch(points, "2025-06-16T12:30:00Z", enrich=True)
+
+        self.assertEqual(build.call_count, 1)
+        self.assertEqual(analysis.getInfo.call_count, 1)
+        self.assertTrue(results[0]["is_detected"])
+        self.assertFalse(results[1]["is_detected"])
+        self.assertEqual(results[0]["temperature"], 30.0)
+        self.assertIsNone(results[1]["temperature"])
+        self.assertTrue(results[0]["sources"][0]["has_source_image"])
+        self.assertEqual(results[0]["dataset_time"], fd._to_iso_from_millis(1718535600000))
+        self.assertFalse(results[1]["sources"][0]["has_source_image"])
+        self.assertEqual(cached[1]["lon"], 43.0)
+        self.assertEqual(results[0]["detected_at"], "2025-06-16T12:00:00+00:00")
+        self.assertEqual(cached[0]["fire_datetime"], "2025-06-16T12:30:00+00:00")
+
+        # lazy mode: enrichment is fetched only for the point with an active sensor
+        fd._detection_cache.clear()
+        sensors, enrichment = MagicMock(), MagicMock()
+        sensors.getInfo.return_value = {"sources": values["sources"]}
+        enrichment.getInfo.return_value = {key: values[key] for key in ("previous_sources", "ndvi", "lulc", "weather")}
+
+        with patch.object(fd, "_build_batch_analysis", side_effect=[sensors, enrichment]) as build:
+            results = fd.detect_active_fire_batch(points, "2025-06-16T12:00:00Z")
+
+        self.assertEqual(build.call_args.kwargs["indexes"], [0])
+        self.assertTrue(results[0]["is_detected"])
+        self.assertEqual(results[0]["skipped_fields"], [])
+        self.assertIn("ndvi_mean", results[1]["skipped_fields"])
+        self.assertIsNone(results[1]["ndvi_mean"])
+        fd._detection_cache.clear()
+
 if __name__ == "__main__":
     unittest.main()  # run test functions
\ No newline at end of file
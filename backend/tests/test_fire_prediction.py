@@ -1,9 +1,13 @@
 import unittest  # unit test library
 import sys
+import tempfile
+import time
 import types
+from pathlib import Path
 from datetime import datetime, timezone
-from unittest.mock import patch
+from unittest.mock import MagicMock, patch
 import numpy as np
+import requests
 
 # create a fake ee module
 sys.modules.setdefault("ee", types.ModuleType("ee"))
@@ -14,6 +18,7 @@ fake_auth.login_required = lambda f: f
 sys.modules["auth_utils"] = fake_auth
 
 import FirePrediction as fp
+from weather_utils import WeatherCache
 
 # create a fake preprocessor 
 class FakePreprocessor:
@@ -38,9 +43,27 @@ class FakeModel:
     def predict_proba(self, x):
         return np.array([[1-self.probability, self.probability]])
 
+# create fake model that scores every row by its ndvi and counts its calls
+class FakeBatchModel:
+    def __init__(self):
+        self.calls = 0
+
+    def predict_proba(self, x):
+        self.calls += 1
+        probability = np.clip(x["ndvi"].to_numpy(), 0, 1)
+        return np.column_stack([1 - probability, probability])
+
 # create a test fire prediction
 class TestFirePrediction(unittest.TestCase):
     def setUp(self):
+        # every test gets an empty weather cache
+        cache_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(cache_dir.cleanup)
+        self.weather_cache = WeatherCache(Path(cache_dir.name) / "weather.sqlite3")
+        cache_patch = patch.object(fp, "get_weather_cache", return_value=self.weather_cache)
+        cache_patch.start()
+        self.addCleanup(cache_patch.stop)
+
         self.lat = 17.53960592243366
         self.lon = 42.93497900449253
         self.predicted_at = "2025-07-04T10:14:00+00:00"
@@ -140,6 +163,195 @@ class TestFirePrediction(unittest.TestCase):
         self.assertEqual(result["risk_level"], "safe")
         self.assertEqual(result["message_ar"], "هذه المنطقة لا تُعد منطقة ذات غطاء نباتي كافٍ للتنبؤ بحرائق الغابات.")
 
+    # test batch prediction with one model call
+    def test_predict_many_one_model_call(self):
+        high = dict(self.valid_features, ndvi=0.9)
+        low = dict(self.valid_features, ndvi=0.2)
+        outside = dict(self.valid_features, ndvi=0.10)
+        missing = dict(self.valid_features, ndvi=-9999)
+        features = [high, outside, low, missing, ValueError("no weather")]
+        points = [(17.5, 42.9), (17.6, 42.9), (17.7, 42.9), (17.8, 42.9), (17.9, 42.9)]
+        model = FakeBatchModel()
+
+        with patch.object(fp, "_build_prediction_features_many", return_value=(features, self.predicted_at)), \
+             patch.object(fp, "_load_prediction_artifacts", return_value=(model, FakePreprocessor(), 0.35)):
+            results = fp.predict_fire_risk_many(points, self.predicted_at)
+
+        # check the results
+        self.assertEqual(model.calls, 1)
+        self.assertEqual(results[0]["risk_level"], "high")
+        self.assertEqual(results[1]["status"], "outside_forest_scope")
+        self.assertEqual(results[2]["probability"], 0.2)
+        self.assertEqual(results[3]["status"], "ndvi_unavailable")
+        self.assertEqual(results[4]["error"], "weather_unavailable")
+        self.assertEqual(results[2]["lat"], 17.7)
+
+    # test weather of many points from one Open-Meteo request
+    def test_weather_many_one_request(self):
+        hourly = {
+            "time": ["2025-07-04T10:00"],
+            "temperature_2m": [30.0],
+            "dew_point_2m": [10.0],
+            "precipitation": [0.0],
+            "vapour_pressure_deficit": [3.0],
+            "wind_speed_10m": [1.5]
+        }
+        response = MagicMock()
+        response.json.return_value = [{"hourly": hourly}, {"hourly": {}}]
+
+        with patch.object(requests.Session, "get", return_value=response) as get:
+            weather = fp._get_weather_features_many([(17.5, 42.9), (17.6, 43.0)], "2025-07-04T10:14:00+00:00")
+
+        # check the result
+        get.assert_called_once()
+        self.assertEqual(get.call_args.kwargs["params"]["latitude"], "17.5,17.6")
+        self.assertEqual(weather[0]["temperature"], 30.0)
+        self.assertIsInstance(weather[1], ValueError)
+
+    # test a past day is read from the weather cache the second time
+    def test_weather_cached_day(self):
+        hours = [f"2025-07-04T{hour:02d}:00" for hour in range(24)]
+        response = MagicMock()
+        response.json.return_value = {"hourly": {
+            "time": hours,
+            "temperature_2m": [20.0 + hour for hour in range(24)],
+            "dew_point_2m": [10.0] * 24,
+            "precipitation": [0.1] * 24,
+            "vapour_pressure_deficit": [3.0] * 24,
+            "wind_speed_10m": [1.5] * 24
+        }}
+
+        with patch.object(requests.Session, "get", return_value=response) as get:
+            first = fp._get_weather_features(self.lat, self.lon, "2025-07-04T10:14:00+00:00")
+            second = fp._get_weather_features(self.lat, self.lon, "2025-07-04T15:40:00+00:00")
+
+        # check one request for both hours of the same day
+        get.assert_called_once()
+        self.assertEqual(get.call_args.kwargs["params"]["start_date"], "2025-07-04")
+        self.assertEqual(first["temperature"], 30.0)
+        self.assertEqual(second["temperature"], 35.0)
+        self.assertEqual(second["precipitation"], 0.1)
+
+    # test a cached day without the asked hour is fetched again instead of failing
+    def test_weather_cached_day_without_hour(self):
+        hours = [f"2025-07-04T{hour:02d}:00" for hour in range(24)]
+        empty, full = MagicMock(), MagicMock()
+        # the archive runs days behind and answers nulls for today
+        empty.json.return_value = {"hourly": {"time": hours, **{name: [None] * 24 for name in (
+            "temperature_2m", "dew_point_2m", "precipitation", "vapour_pressure_deficit", "wind_speed_10m")}}}
+        full.json.return_value = {"hourly": {
+            "time": hours,
+            "temperature_2m": [30.0] * 24,
+            "dew_point_2m": [10.0] * 24,
+            "precipitation": [0.0] * 24,
+            "vapour_pressure_deficit": [3.0] * 24,
+            "wind_speed_10m": [1.5] * 24
+        }}
+
+        with patch.object(requests.Session, "get", side_effect=[empty, full]) as get:
+            with self.assertRaises(ValueError):
+                fp._get_weather_features(self.lat, self.lon, "2025-07-04T08:00:00+00:00")
+            second = fp._get_weather_features(self.lat, self.lon, "2025-07-04T10:14:00+00:00")
+
+        # check the second hour was asked again
+        self.assertEqual(get.call_count, 2)
+        self.assertEqual(second["temperature"], 30.0)
+
+    # test Earth Engine and weather lookups run at the same time
+    def test_features_fetched_concurrently(self):
+        def slow(value):
+            time.sleep(0.3)
+            return value
+
+        ee_values = MagicMock()
+        ee_values.getInfo.side_effect = lambda: slow({
+            "terrain": {"elevation": 1500.1234, "slope": 4.5, "aspect": 115},
+            "lulc": 7,
+            "ndvi": 0.51695,
+            "ndwi": -0.4325
+        })
+        weather = {"temperature": 30.9, "wind_speed": 1.2, "precipitation": 0.0, "vpd": 3.1}
+
+        started = time.perf_counter()
+        with patch.object(fp, "_build_ee_features", return_value=ee_values), \
+             patch.object(fp, "_build_point"), patch.object(fp.ee, "Date", create=True), \
+             patch.object(fp, "_get_weather_features", side_effect=lambda *args: slow(weather)):
+            features, _ = fp._build_prediction_features(self.lat, self.lon, self.predicted_at)
+        elapsed = time.perf_counter() - started
+
+        # check one evaluation, both lookups overlapped, and the features
+        ee_values.getInfo.assert_called_once()
+        self.assertLess(elapsed, 0.55)
+        self.assertEqual(features["elevation"], 1500.123)
+        self.assertEqual(features["lulc"], 7)
+        self.assertEqual(features["ndvi"], 0.517)
+        self.assertEqual(features["temperature"], 30.9)
+
+    # test a failed lookup is raised
+    def test_feature_lookup_error(self):
+        ee_values = MagicMock()
+        ee_values.getInfo.return_value = {}
+
+        with patch.object(fp, "_build_ee_features", return_value=ee_values), \
+             patch.object(fp, "_build_point"), patch.object(fp.ee, "Date", create=True), \
+             patch.object(fp, "_get_weather_features", side_effect=ValueError("no weather")):
+            with self.assertRaises(ValueError):
+                fp._build_prediction_features(self.lat, self.lon, self.predicted_at)
+
+    # test a risk grid scored with one model call and read back from the tile cache
+    def test_risk_grid(self):
+        bands = {
+            "elevation": np.full((2, 3), 1500.0),
+            "slope": np.full((2, 3), 4.5),
+            "aspect": np.full((2, 3), 115.0),
+            "lulc": np.full((2, 3), 7.0),
+            "ndvi": np.array([[0.9, 0.2, 0.1], [-9999, 0.6, 0.4]]),
+            "ndwi": np.full((2, 3), -0.4)
+        }
+        weather = {"temperature": 30.9, "wind_speed": 1.2, "precipitation": 0.0, "vpd": 3.1}
+        model = FakeBatchModel()
+        tile_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(tile_dir.cleanup)
+
+        with patch("tile_utils.TILE_DIR", Path(tile_dir.name)), \
+             patch.object(fp, "_sample_grid", return_value=bands) as sample, \
+             patch.object(fp, "_get_weather_features_many", return_value=[weather]) as get_weather, \
+             patch.object(fp.ee, "Date", create=True), \
+             patch.object(fp, "_load_prediction_artifacts", return_value=(model, FakePreprocessor(), 0.35)):
+            arrays, meta, _ = fp.predict_fire_risk_grid((42.0, 18.0, 42.03, 18.02), 0.01, "2025-07-04T10:00:00+00:00")
+            cached, _, _ = fp.predict_fire_risk_grid((42.0, 18.0, 42.03, 18.02), 0.01, "2025-07-04T16:00:00+00:00")
+
+        # check one sample, one weather point, one model call and the classes
+        sample.assert_called_once()
+        self.assertEqual(len(get_weather.call_args.args[0]), 1)
+        self.assertEqual(model.calls, 1)
+        self.assertEqual((meta["rows"], meta["cols"]), (2, 3))
+        self.assertEqual(arrays["risk_class"].tolist(), [[4, 1, 0], [0, 3, 2]])
+        self.assertAlmostEqual(float(arrays["probability"][1, 1]), 0.6, places=5)
+        self.assertEqual(meta["counts"]["no_data"], 2)
+        self.assertEqual(cached["risk_class"].tolist(), arrays["risk_class"].tolist())
+
+    # test a box needing too many Open-Meteo points is refused before any request
+    def test_risk_grid_weather_point_limit(self):
+        from flask import Flask, g
+        app = Flask(__name__)
+
+        def post(bbox, cell_deg):
+            with app.test_request_context(json={"bbox": bbox, "cell_deg": cell_deg}):
+                g.user_uid = "user-1"
+                return fp.fire_prediction_grid_route()
+
+        # the whole Kingdom at 0.1 deg passes the cell limit but not the weather one
+        with patch.object(fp, "predict_fire_risk_grid") as predict:
+            response, status = post([34.0, 16.0, 56.0, 32.5], 0.1)
+            self.assertEqual(status, 400)
+            self.assertEqual(response.get_json()["error"], "too_many_weather_points")
+            predict.assert_not_called()
+
+        # check a 2 x 2 deg box is at the limit
+        nodes, _ = fp._grid_weather_nodes((42.0, 18.0, 44.0, 20.0), *fp.grid_cell_centres((42.0, 18.0, 44.0, 20.0), 0.01, 200, 200))
+        self.assertEqual(len(nodes), 400)
+
 # run test functions 
 if __name__ == "__main__":
     unittest.main()   
@@ -1,8 +1,18 @@
 import unittest
-from Singleton.gee_connection import GEEConnection
-GEEConnection.get_instance()
+import tempfile
+from datetime import date
+from pathlib import Path
+from unittest.mock import patch
+
+import numpy as np
+import pytest
 
+import FireThreatEstimator as ft
+import fwi_utils as fwi
+import threat_utils
 from FireThreatEstimator import normalize, safe_number, compute_threat_score
+from ee_stub import stub_ee
+from Singleton.gee_connection import GEEConnection
 
 # Weights used in threat calculation
 W_FIRE = 0.25
@@ -12,6 +22,11 @@ W_EXPOSURE = 0.40
 
 class TestFireThreatEstimator(unittest.TestCase):
 
+    @classmethod
+    def setUpClass(cls):
+        # these tests evaluate on Earth Engine
+        GEEConnection.get_instance()
+
     def test_normalize_mid_value(self):
         # Test normalization for a normal value
         result = normalize(100, 200)
@@ -48,9 +63,267 @@ class TestFireThreatEstimator(unittest.TestCase):
         value = float(result.getInfo())
         expected = (0.5 * 0.25) + (0.6 * 0.35) + (0.8 * 0.40)
         self.assertAlmostEqual(value, expected)
-    
-    
+
+
+class TestLocalThreatEngine(unittest.TestCase):
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.store = fwi.FwiStateStore(Path(tmp.name) / "fwi_state.sqlite3")
+        self.cache = threat_utils.ComponentCache(Path(tmp.name) / "threat_components.sqlite3")
+        for name, value in (("get_fwi_state_store", self.store), ("get_component_cache", self.cache)):
+            store_patch = patch.object(ft, name, return_value=value)
+            store_patch.start()
+            self.addCleanup(store_patch.stop)
+
+    def test_local_engine_one_evaluation(self): # Check that the local engine asks Earth Engine once and scores locally
+        day0 = 1748822400000  # 2025-06-02
+        daily = [{"T": 30.0, "RH": 20.0, "W": 15.0, "R": 0.0, "time": day0 + d * 86400000} for d in range(14)]
+        daily.append({"time": day0 + 14 * 86400000})  # requested day not in ERA5-Land yet
+        response = {"fire_power": 0.5, "exposure": 0.2, "slope_factor": 1.1, "daily": daily}
+
+        with stub_ee(ft, responses=[response]) as recorder:
+            result = ft.compute_fire_threat(18.2, 42.5, "2025-06-16T11:00:00Z", 0.25, 0.35, 0.40)
+
+        self.assertEqual(len(recorder.evaluations), 1)
+        self.assertEqual(recorder.count("iterate"), 0)
+
+        series = fwi.fwi_series(*(np.array([d[band] for d in daily[:14]]) for band in ("T", "RH", "W", "R")),
+                                18.2, range(153, 167))
+        spread_index = min(series["FWI"][-1] / ft.FWI_CAP, 1.0) * 1.1
+        expected = 0.5 * 0.25 + min(spread_index, 1.0) * 0.35 + 0.2 * 0.40
+        self.assertAlmostEqual(result["threat_score"], expected)
+        self.assertEqual(result["threat_level"], threat_utils.threat_level_of(expected))
+        self.assertEqual(result["components"]["fire_power"], 0.5)
+        self.assertAlmostEqual(result["components"]["spread_index"], min(spread_index, 1.0))
+
+        # every day with weather is kept for the next request, the last one with a 14 day history
+        day, codes, spinup = self.store.latest(18.2, 42.5, date(2025, 6, 16), 14)
+        self.assertEqual((day, spinup), (date(2025, 6, 15), 14))
+        self.assertAlmostEqual(codes["FWI"], series["FWI"][-1])
+
+    def test_local_engine_uses_stored_state(self): # Check that a stored state leaves only the days after it to iterate
+        state = {"FFMC": 88.0, "DMC": 30.0, "DC": 400.0, "ISI": 0.0, "BUI": 0.0, "FWI": 0.0}
+        self.store.save(18.2, 42.5, [(date(2025, 6, 15), state, 40)])
+        response = {"fire_power": 0.0, "exposure": 0.0, "slope_factor": 1.0,
+                    "daily": [{"T": 32.0, "RH": 15.0, "W": 20.0, "R": 0.0}]}
+
+        with stub_ee(ft, responses=[response]) as recorder:
+            result = ft.compute_fire_threat(18.23, 42.47, "2025-06-16T11:00:00Z", 0.25, 0.35, 0.40)
+
+        self.assertEqual(len(recorder.evaluations), 1)
+        self.assertEqual(recorder.count("sequence"), 1)
+        expected = fwi.fwi_step(88.0, 30.0, 400.0, 32.0, 15.0, 20.0, 0.0, 18.2, 167)
+        self.assertAlmostEqual(result["threat_score"], min(float(expected["FWI"]) / ft.FWI_CAP, 1.0) * 0.35)
+
+        day, codes, spinup = self.store.latest(18.2, 42.5, date(2025, 6, 16), 0)
+        self.assertEqual((day, spinup), (date(2025, 6, 16), 41))
+        self.assertAlmostEqual(codes["DC"], float(expected["DC"]))
+
+    def test_local_engine_state_of_the_day(self): # Check that no weather is asked for when the day is already stored
+        state = {"FFMC": 88.0, "DMC": 30.0, "DC": 400.0, "ISI": 9.0, "BUI": 60.0, "FWI": 25.0}
+        self.store.save(18.2, 42.5, [(date(2025, 6, 16), state, 40)])
+
+        with stub_ee(ft, responses=[{"fire_power": 0.0, "exposure": 0.0, "slope_factor": 1.0}]) as recorder:
+            result = ft.compute_fire_threat(18.2, 42.5, "2025-06-16T11:00:00Z", 0.25, 0.35, 0.40)
+
+        self.assertEqual(recorder.count("sequence"), 0)
+        self.assertAlmostEqual(result["threat_score"], 0.5 * 0.35)
+
+    def test_cached_components(self): # Check that only the components missing from the cache go to Earth Engine
+        state = {"FFMC": 88.0, "DMC": 30.0, "DC": 400.0, "ISI": 9.0, "BUI": 60.0, "FWI": 25.0}
+        self.store.save(18.2, 42.5, [(date(2025, 6, 16), state, 40)])
+        first = {"fire_power": 0.4, "frp_images": 1, "exposure": 0.2, "slope_factor": 1.0}
+
+        with stub_ee(ft, responses=[first]) as recorder:
+            expected = ft.compute_fire_threat(18.2, 42.5, "2025-06-16T11:00:00Z", 0.25, 0.35, 0.40)
+            again = ft.compute_fire_threat(18.2001, 42.4999, "2025-06-16T18:00:00Z", 0.25, 0.35, 0.40)
+        self.assertEqual(len(recorder.evaluations), 1)
+        self.assertEqual(again, expected)
+
+        # another day only needs its fire power and weather
+        with stub_ee(ft, responses=[{"fire_power": 0.0, "frp_images": 0, "daily": [{}]}]) as recorder:
+            ft.compute_fire_threat(18.2, 42.5, "2025-06-17T11:00:00Z", 0.25, 0.35, 0.40)
+        self.assertEqual(recorder.count("slope"), 0)
+        self.assertEqual(recorder.count("sequence"), 1)
+        self.assertEqual(set(recorder.evaluations[0]._args[0]), {"fire_power", "frp_images", "daily"})
+
+        # the spread index of that day came from the FWI of the day before, it is computed again later
+        self.cache._clock = lambda: threat_utils.time.time() + threat_utils.SPREAD_PENDING_TTL_S + 1
+        self.assertNotIn("spread_index", self.cache.get(18.2, 42.5, date(2025, 6, 17), ft.CACHED_COMPONENTS))
+
+    def test_pending_fire_power_expires(self): # Check that a day without a VIIRS image is asked again later
+        self.cache.set(18.2, 42.5, date(2025, 6, 16), {"fire_power": 0.0}, threat_utils.fire_power_expiry(0, now=1000.0))
+        self.cache.set(18.2, 42.5, date(2025, 6, 15), {"fire_power": 0.3}, threat_utils.fire_power_expiry(2, now=1000.0))
+
+        self.cache._clock = lambda: 1000.0 + threat_utils.FRP_PENDING_TTL_S + 1
+        self.assertEqual(self.cache.get(18.2, 42.5, date(2025, 6, 16), ft.CACHED_COMPONENTS), {})
+        self.assertEqual(self.cache.get(18.2, 42.5, date(2025, 6, 15), ft.CACHED_COMPONENTS), {"fire_power": 0.3})
+
+    def test_local_engine_series(self): # Check that the daily series comes with the components in one evaluation
+        state = {"FFMC": 88.0, "DMC": 30.0, "DC": 400.0, "ISI": 9.0, "BUI": 60.0, "FWI": 25.0}
+        self.store.save(18.2, 42.5, [(date(2025, 6, 1), state, 40), (date(2025, 6, 15), state, 54)])
+        daily = [{"T": 30.0, "RH": 20.0, "W": 15.0, "R": 0.0}] * 14 + [{}]
+        response = {"fire_power": 0.0, "frp_images": 1, "exposure": 0.1, "slope_factor": 1.0, "daily": daily}
+
+        with stub_ee(ft, responses=[response]) as recorder:
+            result = ft.compute_fire_threat(18.2, 42.5, "2025-06-16T11:00:00Z", 0.25, 0.35, 0.40, include_series=True)
+
+        self.assertEqual(len(recorder.evaluations), 1)
+        series = result["series"]
+        self.assertEqual([series[0]["date"], series[-1]["date"]], ["2025-06-02", "2025-06-16"])
+        self.assertIsNone(series[-1]["FWI"])
+        self.assertEqual(series[-1]["DC"], series[-2]["DC"])
+
+        # the window starts from the stored state of the day before it
+        expected = fwi.fwi_step(88.0, 30.0, 400.0, 30.0, 20.0, 15.0, 0.0, 18.2, 153)
+        self.assertAlmostEqual(series[0]["DC"], round(float(expected["DC"]), 4))
+        self.assertEqual(series[0]["T"], 30.0)
+        self.assertAlmostEqual(result["components"]["spread_index"], min(series[-2]["FWI"] / ft.FWI_CAP, 1.0), places=4)
+
+    def test_ee_engine_series(self): # Check that the server-side engine returns its daily collection in the same evaluation
+        day0 = 1748822400000  # 2025-06-02
+        series = [{"T": 30.0, "RH": 20.0, "W": 15.0, "R": 0.0, "FFMC": 90.0, "DMC": 20.0, "DC": 100.0,
+                   "ISI": 8.0, "BUI": 25.0, "FWI": 12.5, "time": day0 + d * 86400000} for d in range(15)]
+        response = {"fire_power": 0.2, "spread_index": 0.3, "exposure": 0.4, "series": series}
+
+        with patch.object(ft, "FWI_ENGINE", "earth_engine"), stub_ee(ft, responses=[response]) as recorder:
+            result = ft.compute_fire_threat(18.2, 42.5, "2025-06-16T11:00:00Z", 0.25, 0.35, 0.40, include_series=True)
+
+        self.assertEqual(len(recorder.evaluations), 1)
+        self.assertEqual(result["components"], {"fire_power": 0.2, "spread_index": 0.3, "exposure": 0.4})
+        self.assertEqual(result["series"][-1]["date"], "2025-06-16")
+        self.assertEqual(result["series"][0]["FWI"], 12.5)
+
+    def test_advance_fwi_states(self): # Check that the daily job moves every recent cell on in one evaluation
+        state = {"FFMC": 88.0, "DMC": 30.0, "DC": 400.0, "ISI": 0.0, "BUI": 0.0, "FWI": 0.0}
+        self.store.save(18.2, 42.5, [(date(2025, 6, 14), state, 40)])
+        self.store.save(17.5, 42.9, [(date(2025, 6, 15), state, 20)])
+        self.store.save(16.9, 43.0, [(date(2025, 6, 1), state, 20)]) # too old, no longer advanced
+        weather = {"T": 32.0, "RH": 15.0, "W": 20.0, "R": 0.0}
+        response = [[weather, {}], [weather]] # 2025-06-16 not in ERA5-Land yet
+
+        with stub_ee(ft, responses=[response]) as recorder:
+            summary = ft.advance_fwi_states(today=date(2025, 6, 17))
+
+        self.assertEqual(len(recorder.evaluations), 1)
+        self.assertEqual(summary, {"cells": 2, "advanced": 2})
+        self.assertEqual(self.store.latest(18.2, 42.5, date(2025, 6, 16), 14)[0], date(2025, 6, 15))
+        self.assertEqual(self.store.latest(17.5, 42.9, date(2025, 6, 16), 14)[0], date(2025, 6, 16))
+
+
+class TestThreatGrid(unittest.TestCase):
+
+    def setUp(self):
+        tile_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(tile_dir.cleanup)
+        tile_patch = patch("tile_utils.TILE_DIR", Path(tile_dir.name))
+        tile_patch.start()
+        self.addCleanup(tile_patch.stop)
+
+        shape = (2, 3)
+        self.bands = {
+            "fire_power": np.array([[0.0, 1.0, 0.0], [0.0, 0.0, 0.0]]),
+            "exposure": np.array([[0.2, 0.2, np.nan], [0.9, 0.0, 0.0]]), # no WorldPop over the sea
+            "slope_factor": np.full(shape, 1.2),
+            "frp_images": np.full(shape, 1.0)
+        }
+        for i in range(ft.FWI_SPINUP_DAYS + 1):
+            self.bands.update({f"T_{i}": np.full(shape, 32.0), f"RH_{i}": np.full(shape, 15.0),
+                               f"W_{i}": np.full(shape, 20.0), f"R_{i}": np.zeros(shape)})
+        # the requested day is missing in one cell
+        self.bands[f"T_{ft.FWI_SPINUP_DAYS}"][1, 2] = np.nan
+
+    def test_threat_grid(self): # Check one raster pass per day, shared by every weight set, and the classes
+        bbox = (42.0, 18.0, 42.03, 18.02)
+        with patch.object(ft, "_sample_threat_grid", return_value=self.bands) as sample:
+            arrays, meta, _ = ft.predict_fire_threat_grid(bbox, 0.01, "2025-06-16T11:00:00Z", (0.25, 0.35, 0.40))
+            other, _, _ = ft.predict_fire_threat_grid(bbox, 0.01, "2025-06-16T18:00:00Z", (1.0, 0.0, 0.0))
+            again, _, _ = ft.predict_fire_threat_grid(bbox, 0.01, "2025-06-16T11:00:00Z", (0.25, 0.35, 0.40))
+
+        sample.assert_called_once()
+        self.assertEqual((meta["rows"], meta["cols"]), (2, 3))
+
+        days = 15
+        series = fwi.fwi_series(*(np.full(days, v) for v in (32.0, 15.0, 20.0, 0.0)), 18.015, [153 + d for d in range(days)])
+        spread = min(series["FWI"][-1] / ft.FWI_CAP, 1.0) * 1.2
+        self.assertAlmostEqual(float(arrays["spread_index"][0, 0]), min(spread, 1.0), places=5)
+        self.assertAlmostEqual(float(arrays["threat_score"][0, 1]), min(0.25 + min(spread, 1.0) * 0.35 + 0.2 * 0.40, 1.0), places=5)
+
+        self.assertEqual(arrays["threat_class"][0, 2], 0)
+        self.assertEqual(meta["counts"]["no_data"], 1)
+        self.assertEqual(other["threat_class"].tolist(), [[1, 3, 0], [1, 1, 1]])
+        self.assertEqual(again["threat_class"].tolist(), arrays["threat_class"].tolist())
+
+        # the day the FWI fell back to is not final in every cell
+        self.assertIsNotNone(meta["expires_at"])
+
+    def test_fire_power_at_native_scale(self): # Check that the FRP max is taken over the native pixels of each cell
+        with stub_ee(ft) as recorder:
+            ft._build_threat_grid_image((42.0, 18.0, 42.5, 18.5), date(2025, 6, 16))
+
+        reduce = next(node for node in recorder.calls if node._name == "reduceResolution")
+        self.assertEqual(reduce._kwargs["reducer"]._name, "max")
+        self.assertEqual(recorder.count("setDefaultProjection"), 1)
+
+
+# ---- routes, through the app client of conftest with its fake token ----
+
+@pytest.fixture
+def component_cache(monkeypatch, tmp_path):
+    cache = threat_utils.ComponentCache(tmp_path / "threat_components.sqlite3")
+    monkeypatch.setattr(ft, "get_component_cache", lambda: cache)
+    return cache
+
+
+# components sent back by the client are scored with new weights
+def test_rescore_sent_components(client, component_cache):
+    response = client.post("/fire-threat/rescore", json={
+        "components": {"fire_power": 1.0, "spread_index": 0.0, "exposure": 0.0},
+        "weights": [{"w_fire": 1, "w_spread": 0.1, "w_exposure": 0.1}]
+    })
+
+    assert response.status_code == 200
+    data = response.get_json()
+    assert data["threat_score"] == pytest.approx(0.25)
+    assert data["scores"][0]["threat_score"] == pytest.approx(1 / 1.2)
+
+
+# the cached components of a point and day are scored
+def test_rescore_cached_components(client, component_cache):
+    payload = {"lat": 18.2, "lon": 42.5, "datetime": "2025-06-16T11:00:00Z"}
+    assert client.post("/fire-threat/rescore", json=payload).status_code == 404
+
+    component_cache.set(18.2, 42.5, date(2025, 6, 16), {"fire_power": 0.2, "spread_index": 0.4, "exposure": 0.6})
+    response = client.post("/fire-threat/rescore", json=payload)
+
+    assert response.status_code == 200
+    assert response.get_json()["threat_score"] == pytest.approx(0.2 * 0.25 + 0.4 * 0.35 + 0.6 * 0.40)
+
+
+# incomplete bodies, bad weights and bad coordinates are refused
+def test_threat_bad_request(client, component_cache):
+    assert client.post("/fire-threat/rescore", json={}).status_code == 400
+    assert client.post("/fire-threat/rescore", json={"components": {"fire_power": 1}}).status_code == 400
+
+    point = {"lat": 18.2, "lon": 42.5, "datetime": "2025-06-16T11:00:00Z"}
+    for body in ({**point, "w_fire": None}, {**point, "w_spread": "high"}, {**point, "weights": [{"w_fire": "x", "w_spread": 1, "w_exposure": 1}]},
+                 {**point, "lat": "north"}, {**point, "lon": 500}, {**point, "datetime": "yesterday"}):
+        for route in ("/fire-threat", "/fire-threat/rescore"):
+            assert client.post(route, json=body).status_code == 400, (route, body)
+
+
+# the bounding box, cell size and cell count limits of the grid
+def test_grid_bad_request(client):
+    for body, error in (({"bbox": [42.5, 18, 42, 18.5]}, "invalid_bbox"),
+                        ({"bbox": [42, 18, 42.5, 18.5], "cell_deg": 0.5}, "invalid_cell_deg"),
+                        ({"bbox": [36, 18, 46, 28], "cell_deg": 0.01}, "too_many_cells"),
+                        ({"bbox": [42, 18, 42.5, 18.5], "format": "tiff"}, "invalid_format")):
+        response = client.post("/fire-threat/grid", json=body)
+        assert response.status_code == 400
+        assert response.get_json()["error"] == error
 
 
 if __name__ == "__main__":
-    unittest.main()
\ No newline at end of file
+    unittest.main()
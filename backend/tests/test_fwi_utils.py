@@ -0,0 +1,171 @@
+import unittest  # unit test library
+import math
+import tempfile
+from datetime import date
+from pathlib import Path
+
+import numpy as np
+
+import fwi_utils as fwi
+
+
+# one day of the Earth Engine expressions of FireThreatEstimator, written out for a single pixel
+def reference_day(ffmc_prev, dmc_prev, dc_prev, T, RH, W, R, lat, doy):
+    # FFMC
+    ffmc_prev = min(max(ffmc_prev, 0), 101)
+    mo = 147.2 * (101.0 - ffmc_prev) / (59.5 + ffmc_prev)
+    rf = max(R - 0.5, 0)
+    mr = mo
+    if rf > 0:
+        mr = mo + 42.5 * rf * math.exp(-100.0 / (251.0 - mo)) * (1 - math.exp(-6.93 / rf))
+        if mo > 150:
+            mr += 0.0015 * (mo - 150.0) ** 2 * math.sqrt(rf)
+    mr = min(mr, 250)
+    Ed = 0.942 * RH ** 0.679 + 11 * math.exp((RH - 100) / 10) + 0.18 * (21.1 - T) * (1 - math.exp(-0.115 * RH))
+    Ew = 0.618 * RH ** 0.753 + 10 * math.exp((RH - 100) / 10) + 0.18 * (21.1 - T) * (1 - math.exp(-0.115 * RH))
+    ko = (0.424 * (1 - (RH / 100) ** 1.7) + 0.0694 * math.sqrt(W) * (1 - (RH / 100) ** 8)) * 0.581 * math.exp(0.0365 * T)
+    kw = (0.424 * (1 - ((100 - RH) / 100) ** 1.7) + 0.0694 * math.sqrt(W) * (1 - ((100 - RH) / 100) ** 8)) * 0.581 * math.exp(0.0365 * T)
+    if mr > Ed:
+        m = Ed + (mr - Ed) * math.exp(-ko)
+    elif mr < Ew:
+        m = Ew - (Ew - mr) * math.exp(-kw)
+    else:
+        m = mr
+    ffmc = min(max((59.5 * (250.0 - m)) / (147.2 + m), 0), 101)
+
+    # ISI
+    m = 147.2 * (101.0 - ffmc) / (59.5 + ffmc)
+    isi = max(0.208 * math.exp(0.05039 * W) * 91.9 * math.exp(-0.1386 * m) * (1 + m ** 5.31 / 4.93e7), 0)
+
+    # DMC
+    lat_rad = lat * math.pi / 180
+    decl = 23.44 * math.pi / 180 * math.sin(360 * (doy + 284) / 365 * math.pi / 180)
+    Le = math.acos(min(max(-math.tan(lat_rad) * math.tan(decl), -1), 1)) * 24 / math.pi
+    Tc = max(T, -1.1)
+    K = 1.894 * (Tc + 1.1) * (100 - RH) * Le * 1e-6
+    P = dmc_prev
+    if R > 1.5:
+        re = max(R * 0.92 - 1.27, 0)
+        Mo = 20 + math.exp(5.6348 - dmc_prev / 43.43)
+        if dmc_prev <= 33:
+            b = 100 / (0.5 + 0.3 * dmc_prev)
+        elif dmc_prev <= 65:
+            b = 14 - 1.3 * math.log(dmc_prev)
+        else:
+            b = 6.2 * math.log(dmc_prev) - 17.2
+        Mr = Mo + 1000 * re / (48.77 + b * re)
+        P = max(244.72 - 43.43 * math.log(Mr - 20), 0)
+    dmc = max(P + 100 * K, 0)
+
+    # DC
+    if R > 2.8:
+        re = max(R * 0.83 - 1.27, 0)
+        dc = dc_prev - 400 * re / (re + 800)
+    else:
+        dc = dc_prev + 0.05 * T
+    dc = max(dc, 0)
+
+    # BUI / FWI
+    if dmc <= 0.4 * dc:
+        bui = 0.8 * dmc * dc / (dmc + 0.4 * dc)
+    else:
+        bui = dmc - (1 - 0.8 * dc / (dmc + 0.4 * dc)) * (0.92 + (0.0114 * dmc) ** 1.7)
+    bui = max(bui, 0)
+    fD = 0.626 * bui ** 0.809 + 2 if bui <= 80 else 1000 / (25 + 108.64 * math.exp(-0.023 * bui))
+    B = 0.1 * isi * fD
+    fwi_value = B if B <= 1 else math.exp(2.72 * (0.434 * math.log(B)) ** 0.647)
+    return {"FFMC": ffmc, "DMC": dmc, "DC": dc, "ISI": isi, "BUI": bui, "FWI": max(fwi_value, 0)}
+
+
+class TestFwiUtils(unittest.TestCase):
+
+    def test_standard_indexes(self): # Check ISI, BUI and FWI against the published example day of the FWI system
+        self.assertAlmostEqual(float(fwi.isi_from_ffmc_wind(87.69298, 25.0)), 10.85, places=2)
+        self.assertAlmostEqual(float(fwi.bui_from_dmc_dc(8.5450, 19.0133)), 8.49, places=2)
+        self.assertAlmostEqual(float(fwi.fwi_from_isi_bui(10.853661, 8.4904)), 10.10, places=2)
+
+    def test_step_matches_formulas(self): # Check every branch of the vectorized step against the per-pixel formulas
+        rng = np.random.default_rng(0)
+        n = 500
+        ffmc = rng.uniform(20, 99, n)
+        dmc = rng.uniform(0.5, 120, n)
+        dc = rng.uniform(0, 600, n)
+        T = rng.uniform(-5, 45, n)
+        RH = rng.uniform(5, 100, n)
+        W = rng.uniform(0, 60, n)
+        R = np.where(rng.random(n) < 0.5, 0.0, rng.uniform(0, 30, n))
+        lat = 18.2
+        doy = rng.integers(1, 366, n)
+
+        day = fwi.fwi_step(ffmc, dmc, dc, T, RH, W, R, lat, doy)
+        for i in range(n):
+            expected = reference_day(ffmc[i], dmc[i], dc[i], T[i], RH[i], W[i], R[i], lat, doy[i])
+            for code, value in expected.items():
+                self.assertAlmostEqual(float(day[code][i]), value, places=6, msg=f"{code} of row {i}")
+
+    def test_series_carries_missing_days(self): # Check that a day without weather keeps the codes of the day before
+        T = np.array([[25.0], [np.nan], [27.0]])
+        RH = np.array([[30.0], [np.nan], [25.0]])
+        W = np.array([[10.0], [np.nan], [12.0]])
+        R = np.array([[0.0], [np.nan], [0.0]])
+
+        series = fwi.fwi_series(T, RH, W, R, 18.2, [160, 161, 162])
+        single = fwi.fwi_series(T[[0, 2]], RH[[0, 2]], W[[0, 2]], R[[0, 2]], 18.2, [160, 162])
+
+        self.assertEqual(series["FFMC"][1, 0], series["FFMC"][0, 0])
+        self.assertTrue(np.isnan(series["FWI"][1, 0]))
+        self.assertAlmostEqual(series["FWI"][2, 0], single["FWI"][1, 0])
+
+    def test_series_is_vectorized_over_cells(self): # Check that cells are independent of each other
+        T = np.array([[25.0, 10.0], [30.0, 12.0]])
+        RH = np.array([[30.0, 80.0], [20.0, 90.0]])
+        W = np.array([[10.0, 2.0], [15.0, 3.0]])
+        R = np.array([[0.0, 5.0], [0.0, 12.0]])
+
+        both = fwi.fwi_series(T, RH, W, R, 18.2, [160, 161])
+        first = fwi.fwi_series(T[:, :1], RH[:, :1], W[:, :1], R[:, :1], 18.2, [160, 161])
+
+        self.assertEqual(both["FWI"].shape, (2, 2))
+        self.assertAlmostEqual(both["FWI"][1, 0], first["FWI"][1, 0])
+        self.assertLess(both["FWI"][1, 1], both["FWI"][1, 0])
+
+
+class TestFwiStateStore(unittest.TestCase):
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.store = fwi.FwiStateStore(Path(tmp.name) / "fwi_state.sqlite3")
+        self.codes = {code: float(i + 1) for i, code in enumerate(fwi.FWI_CODES)}
+
+    def test_latest_state_of_cell(self): # Check that the newest row of the cell inside the age window is returned
+        self.store.save(18.2, 42.5, [(date(2025, 6, 10), self.codes, 5), (date(2025, 6, 12), self.codes, 7)])
+
+        day, codes, spinup = self.store.latest(18.21, 42.49, date(2025, 6, 14), 14)
+        self.assertEqual((day, spinup), (date(2025, 6, 12), 7))
+        self.assertEqual(codes, self.codes)
+        self.assertEqual(self.store.latest(18.2, 42.5, date(2025, 6, 11), 14)[0], date(2025, 6, 10))
+        self.assertIsNone(self.store.latest(18.2, 42.5, date(2025, 6, 30), 14))
+        self.assertIsNone(self.store.latest(18.5, 42.5, date(2025, 6, 14), 14))
+
+    def test_longer_history_wins(self): # Check that a row is not replaced by one with a shorter spin-up
+        fresh = dict(self.codes, DC=99.0)
+        self.store.save(18.2, 42.5, [(date(2025, 6, 10), self.codes, 30)])
+        self.store.save(18.2, 42.5, [(date(2025, 6, 10), fresh, 15)])
+        self.assertEqual(self.store.latest(18.2, 42.5, date(2025, 6, 10), 0)[1]["DC"], self.codes["DC"])
+
+        self.store.save(18.2, 42.5, [(date(2025, 6, 10), fresh, 31)])
+        self.assertEqual(self.store.latest(18.2, 42.5, date(2025, 6, 10), 0)[1]["DC"], 99.0)
+
+    def test_cells_and_prune(self): # Check the list of recent cells and the removal of old rows
+        self.store.save(18.2, 42.5, [(date(2025, 6, 1), self.codes, 1), (date(2025, 6, 12), self.codes, 12)])
+        self.store.save(17.5, 42.9, [(date(2025, 5, 1), self.codes, 1)])
+
+        self.assertEqual(self.store.cells(since=date(2025, 6, 1)), [(18.2, 42.5, date(2025, 6, 12))])
+        self.store.prune(before=date(2025, 6, 5))
+        self.assertEqual(len(self.store.cells(since=date(2025, 1, 1))), 1)
+        self.assertIsNone(self.store.latest(18.2, 42.5, date(2025, 6, 4), 30))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,135 @@
+import unittest  # unit test library
+import os
+import tempfile
+import time
+from pathlib import Path
+from unittest.mock import patch
+
+from flask import Flask, g
+
+import job_utils
+from job_utils import JobRunner, JobStore, QueueFullError, DONE, FAILED, QUEUED, RUNNING
+
+
+def wait_for(store, job_id, timeout=5):
+    # wait until the job is finished
+    end = time.time() + timeout
+    while time.time() < end:
+        job = store.get(job_id)
+        if job["status"] in (DONE, FAILED):
+            return job
+        time.sleep(0.01)
+    return store.get(job_id)
+
+
+class TestJobUtils(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.store = JobStore(Path(self.tmp.name) / "jobs.sqlite3")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_job_result_is_stored(self): # Check that a finished job keeps its JSON result
+        runner = JobRunner(self.store, handlers={"add": lambda a, b: {"sum": a + b}})
+        job = wait_for(self.store, runner.submit("add", "user-1", {"a": 2, "b": 3}))
+
+        self.assertEqual(job["status"], DONE)
+        self.assertEqual(job["result"], {"sum": 5})
+        self.assertEqual(job["user_id"], "user-1")
+
+    def test_failed_job(self): # Check that an exception marks the job as failed
+        def broken():
+            raise RuntimeError("no data")
+
+        runner = JobRunner(self.store, handlers={"broken": broken})
+        job = wait_for(self.store, runner.submit("broken", "user-1", {}))
+
+        self.assertEqual(job["status"], FAILED)
+        self.assertEqual(job["error"], "no data")
+
+    def test_queue_limit(self): # Check that new jobs are refused when too many are waiting
+        runner = JobRunner(self.store, handlers={"noop": lambda: None}, max_pending=1)
+        self.store.create("noop", "user-1", {})
+
+        with self.assertRaises(QueueFullError):
+            runner.submit("noop", "user-1", {})
+
+    def test_resume_after_restart(self): # Check that jobs left by a restart run again from their params
+        job_id = self.store.create("add", "user-1", {"a": 1, "b": 1})
+        runner = JobRunner(self.store, handlers={"add": lambda a, b: {"sum": a + b}})
+
+        self.assertEqual(runner.resume_pending(), 1)
+        self.assertEqual(wait_for(self.store, job_id)["result"], {"sum": 2})
+
+    def test_resume_in_several_workers(self): # Check that workers resuming the same store run every job once
+        calls = []
+        handlers = {"add": lambda a, b: calls.append(a) or {"sum": a + b}}
+        job_ids = [self.store.create("add", "user-1", {"a": i, "b": 1}) for i in range(5)]
+
+        runners = [JobRunner(self.store, handlers=handlers) for _ in range(3)]
+        for runner in runners:
+            runner.resume_pending()
+        for job_id in job_ids:
+            self.assertEqual(wait_for(self.store, job_id)["status"], DONE)
+        time.sleep(0.05)
+        self.assertEqual(sorted(calls), list(range(5)))
+
+    def test_claim_once(self): # Check that a queued job is claimed by one worker only
+        job_id = self.store.create("add", "user-1", {})
+
+        self.assertTrue(self.store.claim(job_id))
+        self.assertFalse(self.store.claim(job_id))
+        self.assertEqual(self.store.get(job_id)["owner"], os.getpid())
+
+    def test_running_job_of_live_worker(self): # Check that a running job is only resumed once its worker is gone
+        runner = JobRunner(self.store, handlers={"add": lambda a, b: {"sum": a + b}})
+        live = self.store.create("add", "user-1", {"a": 1, "b": 1})
+        gone = self.store.create("add", "user-1", {"a": 2, "b": 2})
+        with self.store._connect() as conn:
+            conn.execute("UPDATE jobs SET status = ?, owner = ? WHERE id = ?", (RUNNING, os.getppid(), live))
+            conn.execute("UPDATE jobs SET status = ?, owner = ? WHERE id = ?", (RUNNING, 2 ** 30, gone))
+
+        self.assertEqual(runner.resume_pending(), 1)
+        self.assertEqual(wait_for(self.store, gone)["result"], {"sum": 4})
+        self.assertEqual(self.store.get(live)["status"], RUNNING)
+
+    def test_pool_per_process(self): # Check that the pool is started on first use and again after a fork
+        runner = JobRunner(self.store, handlers={})
+        self.assertIsNone(runner._executor)
+
+        first = runner.executor()
+        self.assertIs(runner.executor(), first)
+        with patch.object(job_utils.os, "getpid", return_value=os.getpid() + 1):
+            self.assertIsNot(runner.executor(), first)
+
+    def test_status_route_owner_only(self): # Check that a job is only visible to its owner
+        runner = JobRunner(self.store, handlers={})
+        job_id = self.store.create("add", "user-1", {"a": 1, "b": 1})
+
+        # call the view without the login decorator, g.user_uid is what login_required would set
+        view = getattr(job_utils.job_status_route, "__wrapped__", job_utils.job_status_route)
+        app = Flask(__name__)
+
+        with patch.object(job_utils, "_runner", runner):
+            with app.test_request_context():
+                g.user_uid = "user-1"
+                own, own_status = view(job_id)
+            with app.test_request_context():
+                g.user_uid = "user-2"
+                other, other_status = view(job_id)
+
+        self.assertEqual(own_status, 200)
+        self.assertEqual(own.get_json()["status"], QUEUED)
+        self.assertEqual(other_status, 404)
+
+    def test_request_flags(self): # Check the async and enrich flags from the body or the query string
+        self.assertTrue(job_utils.wants_async({"async": True}, {}))
+        self.assertTrue(job_utils.wants_enrichment({}, {"enrich": "1"}))
+        self.assertFalse(job_utils.wants_enrichment({"enrich": False}, {"enrich": "1"}))
+        self.assertFalse(job_utils.wants_enrichment({}, {}))
+
+
+if __name__ == "__main__":
+    unittest.main() # run test functions
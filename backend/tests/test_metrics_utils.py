@@ -0,0 +1,69 @@
+import unittest  # unit test library
+import types
+
+from flask import Flask
+
+import metrics_utils
+from metrics_utils import Histogram
+
+
+class TestMetricsUtils(unittest.TestCase):
+
+    def test_histogram_text_format(self): # Check cumulative buckets, sum and count in the text format
+        hist = Histogram("test_seconds", "Test latency.", ("route",), buckets=(0.1, 1))
+        hist.observe(0.05, "/a")
+        hist.observe(0.5, "/a")
+        hist.observe(3, "/a")
+
+        text = hist.render()
+        self.assertIn('test_seconds_bucket{route="/a",le="0.1"} 1', text)
+        self.assertIn('test_seconds_bucket{route="/a",le="1"} 2', text)
+        self.assertIn('test_seconds_bucket{route="/a",le="+Inf"} 3', text)
+        self.assertIn('test_seconds_count{route="/a"} 3', text)
+
+    def test_dependency_wrapper(self): # Check that wrapped calls are timed once and errors are counted
+        def fail():
+            raise RuntimeError("down")
+
+        client = types.SimpleNamespace(call=lambda x: x * 2, fail=fail)
+        self.assertTrue(metrics_utils._wrap(client, "call", "test_dep", "call"))
+        self.assertFalse(metrics_utils._wrap(client, "call", "test_dep", "call"))
+        metrics_utils._wrap(client, "fail", "test_dep", "fail")
+
+        self.assertEqual(client.call(4), 8)
+        with self.assertRaises(RuntimeError):
+            client.fail()
+
+        self.assertEqual(metrics_utils.DEPENDENCY_LATENCY.snapshot("test_dep", "call", "ok")[2], 1)
+        self.assertEqual(metrics_utils.DEPENDENCY_LATENCY.snapshot("test_dep", "fail", "error")[2], 1)
+
+    def test_firestore_reads_wrapped_once(self): # Check that collection reads are timed through Query.stream only
+        from google.cloud.firestore_v1.collection import CollectionReference
+        from google.cloud.firestore_v1.query import Query
+
+        metrics_utils.instrument_dependencies()
+        self.assertTrue(getattr(Query.stream, "__metrics_wrapped__", False))
+        self.assertFalse(getattr(CollectionReference.stream, "__metrics_wrapped__", False))
+        self.assertFalse(getattr(Query.get, "__metrics_wrapped__", False))
+
+    def test_request_latency_by_route(self): # Check that requests are labelled with the route pattern
+        app = Flask(__name__)
+        app.before_request(metrics_utils._before_request)
+        app.after_request(metrics_utils._after_request)
+        app.register_blueprint(metrics_utils.metrics_bp)
+
+        @app.route("/items/<item_id>")
+        def item(item_id):
+            return item_id
+
+        client = app.test_client()
+        client.get("/items/1")
+        client.get("/items/2")
+        body = client.get("/metrics").get_data(as_text=True)
+
+        self.assertIn('route="/items/<item_id>",method="GET",status="200"} 2', body)
+        self.assertIn("# TYPE wameed_http_request_duration_seconds histogram", body)
+
+
+if __name__ == "__main__":
+    unittest.main() # run test functions
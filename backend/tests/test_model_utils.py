@@ -0,0 +1,71 @@
+import unittest  # unit test library
+import warnings
+from pathlib import Path
+
+import joblib
+import numpy as np
+import pandas as pd
+
+from model_utils import CompiledFireModel
+
+MODEL_DIR = Path(__file__).resolve().parent.parent / "Model"
+
+NUMERIC = ["elevation", "slope", "aspect", "temperature", "wind_speed", "precipitation", "vpd", "ndvi", "ndwi"]
+
+
+def _random_rows(preprocessor, count, seed=0):
+    # rows spread like the training data, with missing values and unknown land cover classes
+    rng = np.random.default_rng(seed)
+    scaler = preprocessor.named_transformers_["num"]["scaler"]
+    rows = []
+    for i in range(count):
+        row = {name: float(rng.normal(scaler.mean_[j], scaler.scale_[j])) for j, name in enumerate(NUMERIC)}
+        row["lulc"] = int(rng.choice([1, 5, 7, 8, 9, 10, 12, 13]))
+        if i % 7 == 6:
+            row["ndwi"] = None
+        if i % 11 == 10:
+            row["lulc"] = None
+        rows.append(row)
+    return rows
+
+
+class TestCompiledFireModel(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            cls.model = joblib.load(MODEL_DIR / "gb_model.pkl")
+            cls.preprocessor = joblib.load(MODEL_DIR / "preprocessor.pkl")
+        cls.compiled = CompiledFireModel(cls.model, cls.preprocessor)
+
+    def _sklearn_proba(self, rows):
+        X = pd.DataFrame(rows).reindex(columns=list(self.preprocessor.feature_names_in_))
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            X = pd.DataFrame(self.preprocessor.transform(X), columns=self.preprocessor.get_feature_names_out())
+            return self.model.predict_proba(X)[:, 1]
+
+    def test_batch_matches_predict_proba(self): # Compiled probabilities equal sklearn within 1e-9
+        rows = _random_rows(self.preprocessor, 2000)
+        diff = np.abs(self.compiled.decision_function(self.compiled.transform(rows)) - self.model.decision_function(
+            pd.DataFrame(self.compiled.transform(rows), columns=self.preprocessor.get_feature_names_out())))
+        self.assertLess(diff.max(), 1e-9)
+
+        # small batches (NumPy trees) and large ones (fitted trees) both match predict_proba
+        for count in (100, 500):
+            rows = _random_rows(self.preprocessor, count, seed=count)
+            diff = np.abs(self.compiled.predict_proba(rows) - self._sklearn_proba(rows))
+            self.assertLess(diff.max(), 1e-9)
+
+    def test_single_row_matches_predict_proba(self): # One row gives the same probability
+        rows = _random_rows(self.preprocessor, 1, seed=3)
+        self.assertAlmostEqual(self.compiled.predict_proba(rows)[0], self._sklearn_proba(rows)[0], delta=1e-9)
+
+    def test_unsupported_model_is_refused(self): # Other estimators raise TypeError so callers can fall back
+        with self.assertRaises(TypeError):
+            CompiledFireModel(object(), self.preprocessor)
+
+
+if __name__ == "__main__":
+    unittest.main()
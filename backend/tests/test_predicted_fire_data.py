@@ -0,0 +1,138 @@
+import unittest  # unit test library
+import sys
+import types
+from datetime import datetime, timezone
+from unittest.mock import patch
+
+# create a fake ee module
+sys.modules.setdefault("ee", types.ModuleType("ee"))
+
+import FirePrediction as fp
+from Data import predicted_fire_data as pfd
+
+
+# in-memory stand-in for the Firestore client, keeps the documents and the committed batches
+class FakeSnapshot:
+    def __init__(self, doc_id, data):
+        self.id = doc_id
+        self._data = data
+
+    def to_dict(self):
+        return dict(self._data)
+
+
+class FakeBatch:
+    def __init__(self, db):
+        self.db = db
+        self.updates = []
+
+    def update(self, ref, data):
+        self.updates.append((ref, data))
+
+    def commit(self):
+        self.db.commits.append(len(self.updates))
+        for ref, data in self.updates:
+            self.db.docs[ref].update(data)
+
+
+class FakeCollection:
+    def __init__(self, db):
+        self.db = db
+        self.selected = None
+
+    def select(self, fields):
+        self.selected = list(fields)
+        return self
+
+    def stream(self):
+        return [FakeSnapshot(doc_id, data) for doc_id, data in self.db.docs.items()]
+
+    def document(self, doc_id):
+        return doc_id
+
+
+class FakeDb:
+    def __init__(self, docs):
+        self.docs = docs
+        self.commits = []
+        self.collections = []
+
+    def collection(self, name):
+        collection = FakeCollection(self)
+        self.collections.append((name, collection))
+        return collection
+
+    def batch(self):
+        return FakeBatch(self)
+
+
+class TestPredictionRescoring(unittest.TestCase):
+
+    def setUp(self):
+        self.now = datetime(2025, 7, 4, 3, 0, tzinfo=timezone.utc)
+        self.db = FakeDb({
+            "a": {"latitude": 18.2001, "Longitude": 42.5002, "risk_level": "low"},
+            "b": {"latitude": 18.2003, "Longitude": 42.4998, "risk_level": "safe"}, # same grid cell as a
+            "c": {"latitude": 17.54, "Longitude": 42.93, "risk_level": "high"},
+            "d": {"latitude": None, "Longitude": 42.93, "risk_level": "high"} # no coordinates
+        })
+        db_patch = patch.object(pfd.FirebaseConnection, "get_db", return_value=self.db)
+        db_patch.start()
+        self.addCleanup(db_patch.stop)
+
+    def test_rescore_saved_predictions(self): # Check that sites are scored once per grid cell with one batch call
+        calls = []
+
+        def fake_predict_many(points, when_iso=None):
+            calls.append((list(points), when_iso))
+            return [{"ok": True, "risk_level": "medium" if lat > 18 else "safe"} for lat, _ in points]
+
+        with patch.object(fp, "predict_fire_risk_many", side_effect=fake_predict_many):
+            summary = pfd.rescore_saved_predictions(now=self.now)
+
+        self.assertEqual(summary, {"sites": 3, "cells": 2, "updated": 3})
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(sorted(calls[0][0]), [(17.54, 42.93), (18.2, 42.5)])
+        self.assertEqual(calls[0][1], "2025-07-04T11:00:00+00:00")
+
+        # only the two coordinates are read
+        self.assertEqual(self.db.collections[0][1].selected, ["latitude", "Longitude"])
+
+        self.assertEqual(self.db.docs["a"]["current_risk_level"], "medium")
+        self.assertEqual(self.db.docs["b"]["current_risk_level"], "medium")
+        self.assertEqual(self.db.docs["c"]["current_risk_level"], "safe")
+        self.assertEqual(self.db.docs["a"]["rescored_at"], self.now)
+        self.assertEqual(self.db.docs["a"]["risk_level"], "low")
+        self.assertNotIn("current_risk_level", self.db.docs["d"])
+
+    def test_rescore_keeps_unscored_sites(self): # Check that sites without a new score keep their last level
+        def fake_predict_many(points, when_iso=None):
+            return [{"ok": False, "error": "weather_unavailable"} if lat < 18 else {"ok": True, "risk_level": "high"}
+                    for lat, _ in points]
+
+        with patch.object(fp, "predict_fire_risk_many", side_effect=fake_predict_many):
+            summary = pfd.rescore_saved_predictions(now=self.now)
+
+        self.assertEqual(summary["updated"], 2)
+        self.assertNotIn("current_risk_level", self.db.docs["c"])
+
+    def test_rescore_batches_writes(self): # Check that Firestore writes are split into batches of the allowed size
+        with patch.object(pfd, "FIRESTORE_BATCH_SIZE", 2), \
+             patch.object(fp, "predict_fire_risk_many", side_effect=lambda points, when_iso=None: [
+                 {"ok": True, "risk_level": "low"} for _ in points
+             ]):
+            pfd.rescore_saved_predictions(now=self.now)
+
+        self.assertEqual(self.db.commits, [2, 1])
+
+    def test_serialize_prediction(self): # Check that the re-scoring fields are returned to the list view
+        snapshot = FakeSnapshot("a", {"risk_level": "low", "current_risk_level": "high", "rescored_at": self.now})
+        data = pfd._serialize_prediction(snapshot)
+
+        self.assertEqual(data["risk_level"], "low")
+        self.assertEqual(data["current_risk_level"], "high")
+        self.assertEqual(data["rescored_at"], "2025-07-04T03:00:00+00:00")
+
+
+if __name__ == "__main__":
+    unittest.main()
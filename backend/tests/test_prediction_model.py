@@ -0,0 +1,61 @@
+import unittest  # unit test library
+import shutil
+import tempfile
+from pathlib import Path
+
+import joblib
+
+from Singleton.prediction_model import MODEL_DIR, PredictionModel, latest_bundle
+
+
+class TestPredictionModel(unittest.TestCase):
+
+    def setUp(self):
+        self.bundles_dir = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.bundles_dir)
+
+    def _publish(self, version, threshold, ready=True):
+        folder = self.bundles_dir / version
+        folder.mkdir()
+        shutil.copy(MODEL_DIR / "gb_model.pkl", folder)
+        shutil.copy(MODEL_DIR / "preprocessor.pkl", folder)
+        joblib.dump(threshold, folder / "threshold.pkl")
+        if ready:
+            (folder / "READY").touch()
+        return folder
+
+    def test_shipped_files_without_bundles(self): # No bundle folder loads the model files of the repo
+        loader = PredictionModel(bundles_dir=self.bundles_dir)
+        bundle = loader.current()
+        self.assertEqual(bundle.version, "base")
+        self.assertIsNotNone(bundle.compiled)
+        self.assertEqual(len(bundle.predict_proba([{"ndvi": 0.4, "lulc": 10}])), 1)
+
+    def test_newest_ready_bundle_wins(self): # Bundles without READY are ignored
+        self._publish("v0001", 0.4)
+        self._publish("v0002", 0.5, ready=False)
+        self.assertEqual(latest_bundle(self.bundles_dir)[1], "v0001")
+
+    def test_swap_keeps_old_bundle_intact(self): # A new bundle replaces the current one in one step
+        loader = PredictionModel(bundles_dir=self.bundles_dir)
+        old = loader.current()
+
+        self._publish("v0002", 0.5)
+        self.assertTrue(loader.check_for_update())
+
+        self.assertEqual(loader.current().version, "v0002")
+        self.assertEqual(loader.current().threshold, 0.5)
+        self.assertEqual(old.version, "base")
+        self.assertFalse(loader.check_for_update())
+
+    def test_broken_bundle_keeps_current_model(self): # A bundle that fails to load is skipped
+        loader = PredictionModel(bundles_dir=self.bundles_dir)
+        folder = self._publish("v0003", 0.5)
+        (folder / "gb_model.pkl").write_bytes(b"not a pickle")
+
+        self.assertFalse(loader.check_for_update())
+        self.assertEqual(loader.current().version, "base")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,46 @@
+import unittest  # unit test library
+from Singleton.saudi_boundary import BoundaryIndex, box_around
+
+# a concave polygon with a hole, big enough to have inside, outside and border cells
+GEOMETRY = {
+    "type": "Polygon",
+    "coordinates": [
+        [[0, 0], [10, 0], [10, 10], [5, 5], [0, 10], [0, 0]],
+        [[2, 1], [4, 1], [4, 3], [2, 3], [2, 1]]
+    ]
+}
+
+
+class TestSaudiBoundary(unittest.TestCase):
+
+    def setUp(self):
+        self.index = BoundaryIndex(GEOMETRY, cell_deg=0.5)
+
+    def test_points_inside(self): # Points inside the polygon
+        self.assertTrue(self.index.contains(0.5, 5.0))
+        self.assertTrue(self.index.contains(6.0, 8.0))
+
+    def test_points_outside(self): # Points outside the bounding box, in the notch, and in the hole
+        self.assertFalse(self.index.contains(20.0, 5.0))
+        self.assertFalse(self.index.contains(9.0, 5.0))
+        self.assertFalse(self.index.contains(2.0, 3.0))
+
+    def test_border_cell_points(self): # Points close to an edge are resolved exactly
+        self.assertTrue(self.index.contains(4.9, 5.0))
+        self.assertFalse(self.index.contains(5.1, 5.0))
+        self.assertTrue(self.index.contains(0.99, 3.0))
+        self.assertFalse(self.index.contains(1.01, 3.0))
+
+    def test_contains_box(self): # Boxes fully inside, crossing the hole, and crossing the outer edge
+        self.assertTrue(self.index.contains_box(5.5, 0.5, 6.5, 1.5))
+        self.assertFalse(self.index.contains_box(1.5, 2.5, 2.5, 3.5))
+        self.assertFalse(self.index.contains_box(-0.5, 5.0, 0.5, 6.0))
+
+    def test_box_around(self): # Box around a point contains the buffer distance
+        min_lat, min_lon, max_lat, max_lon = box_around(20.0, 45.0, 5000)
+        self.assertAlmostEqual(max_lat - 20.0, 5000 / 111320.0)
+        self.assertGreater(max_lon - 45.0, max_lat - 20.0)
+
+
+if __name__ == "__main__":
+    unittest.main() # run test functions
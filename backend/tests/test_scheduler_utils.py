@@ -0,0 +1,73 @@
+import unittest  # unit test library
+import tempfile
+import threading
+from datetime import datetime, timezone
+from pathlib import Path
+
+from scheduler_utils import RUN_TIMEOUT_S, _last_slot, _run, _seconds_until, claim_run, finish_run, run_daily
+
+
+class TestSchedulerUtils(unittest.TestCase):
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.path = Path(tmp.name) / "schedule.sqlite3"
+
+    def test_slots(self): # Check the next run time and the slot a run belongs to
+        now = datetime(2025, 7, 4, 1, 30, tzinfo=timezone.utc)
+        self.assertEqual(_seconds_until(3, now), 1.5 * 3600)
+        self.assertEqual(_last_slot(3, now), datetime(2025, 7, 3, 3, tzinfo=timezone.utc))
+        self.assertEqual(_last_slot(1, now), datetime(2025, 7, 4, 1, tzinfo=timezone.utc))
+
+    def test_claim_once_per_slot(self): # Check that one process only runs each day of a job
+        day = datetime(2025, 7, 4, 3, tzinfo=timezone.utc)
+        self.assertTrue(claim_run("refresh", day, self.path))
+        self.assertFalse(claim_run("refresh", day, self.path))
+        self.assertTrue(claim_run("other", day, self.path))
+
+        finish_run("refresh", day, True, self.path)
+        self.assertFalse(claim_run("refresh", day, self.path, now=10 ** 10))
+        self.assertTrue(claim_run("refresh", day.replace(day=5), self.path))
+
+    def test_failed_run_is_claimed_again(self): # Check that a failed or cut run does not skip the day
+        day = datetime(2025, 7, 4, 3, tzinfo=timezone.utc)
+        self.assertTrue(claim_run("refresh", day, self.path, now=1000))
+        finish_run("refresh", day, False, self.path)
+        self.assertTrue(claim_run("refresh", day, self.path, now=1000))
+
+        # the process of this run died without finishing it
+        self.assertFalse(claim_run("refresh", day, self.path, now=1000 + RUN_TIMEOUT_S - 1))
+        self.assertTrue(claim_run("refresh", day, self.path, now=1000 + RUN_TIMEOUT_S + 1))
+
+    def test_run_marks_success_only(self): # Check that the day is done only after the job went through
+        def broken():
+            raise RuntimeError("earth engine is down")
+
+        self.assertFalse(_run("refresh", broken, 3, self.path))
+        self.assertTrue(_run("refresh", lambda: None, 3, self.path))
+        calls = []
+        self.assertTrue(_run("refresh", lambda: calls.append(1), 3, self.path))
+        self.assertEqual(calls, [])
+
+    def test_workers_run_once(self): # Check that loops started in several workers run the job once
+        calls = []
+        done = threading.Event()
+
+        def job():
+            calls.append(1)
+            done.set()
+
+        stops = [run_daily("refresh", job, lock_path=self.path) for _ in range(4)]
+        done.wait(5)
+        for stop in stops:
+            stop.set()
+        # the loops still write the schedule after the job, wait for them before the temp dir goes
+        for thread in threading.enumerate():
+            if thread.name == "refresh":
+                thread.join(5)
+        self.assertEqual(len(calls), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
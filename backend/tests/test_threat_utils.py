@@ -0,0 +1,59 @@
+import unittest  # unit test library
+
+import numpy as np
+
+import threat_utils
+
+
+class TestThreatScoring(unittest.TestCase):
+
+    def setUp(self):
+        self.components = {"fire_power": 0.5, "spread_index": 0.6, "exposure": 0.8}
+
+    def test_normalize_weights(self): # Check that weights are clamped and scaled to sum to 1
+        weights = threat_utils.normalize_weights(0.0, 2.0, "0.4")
+        self.assertAlmostEqual(sum(weights), 1.0)
+        self.assertAlmostEqual(weights[0], 0.1 / 1.5)
+        self.assertAlmostEqual(weights[1], 1.0 / 1.5)
+
+        for value in (None, "high", float("nan"), [1]):
+            with self.assertRaises(ValueError):
+                threat_utils.normalize_weights(value, 1, 1)
+
+    def test_parse_weight_sets(self): # Check that weight sets are normalized and invalid lists are refused
+        weight_sets = threat_utils.parse_weight_sets([{"w_fire": 1, "w_spread": 1, "w_exposure": 1}])
+        self.assertEqual(len(weight_sets), 1)
+        self.assertAlmostEqual(weight_sets[0][2], 1 / 3)
+
+        for value in ([], {"w_fire": 1}, [{"w_fire": 1, "w_spread": 1}], [{"w_fire": 1, "w_spread": 1, "w_exposure": 1}] * 21,
+                      [{"w_fire": None, "w_spread": 1, "w_exposure": 1}]):
+            with self.assertRaises(ValueError):
+                threat_utils.parse_weight_sets(value)
+
+    def test_threat_level_of(self): # Check the Python threat levels
+        self.assertEqual(threat_utils.threat_level_of(0.1), "منخفضة")
+        self.assertEqual(threat_utils.threat_level_of(0.5), "متوسطة")
+        self.assertEqual(threat_utils.threat_level_of(0.9), "عالية")
+
+    def test_threat_response(self): # Check the score, the components and the score of every weight set
+        out = threat_utils.threat_response(self.components, (0.25, 0.35, 0.40), [(1.0, 0.0, 0.0), (0.0, 0.0, 1.0)])
+
+        self.assertAlmostEqual(out["threat_score"], 0.5 * 0.25 + 0.6 * 0.35 + 0.8 * 0.40)
+        self.assertEqual(out["threat_level"], "متوسطة")
+        self.assertEqual(out["components"], self.components)
+        self.assertAlmostEqual(out["scores"][0]["threat_score"], 0.5)
+        self.assertEqual(out["scores"][1]["w_exposure"], 1.0)
+        self.assertEqual(out["scores"][1]["threat_level"], "عالية")
+
+    def test_grid_classes(self): # Check that grid cells get the same levels as a point and NaN is no data
+        score = threat_utils.score_grid(
+            {"fire_power": np.array([0.0, 1.0, np.nan]), "spread_index": np.array([0.5, 1.0, 0.0]), "exposure": np.array([0.2, 1.0, 0.0])},
+            (0.25, 0.35, 0.40)
+        )
+        self.assertAlmostEqual(score[0], 0.5 * 0.35 + 0.2 * 0.40)
+        self.assertEqual(threat_utils.threat_classes(score).tolist(), [1, 3, 0])
+        self.assertEqual(threat_utils.threat_classes(np.array([0.33, 0.66])).tolist(), [2, 3])
+
+
+if __name__ == "__main__":
+    unittest.main()
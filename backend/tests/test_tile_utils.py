@@ -0,0 +1,96 @@
+import unittest  # unit test library
+import os
+import tempfile
+import threading
+from datetime import date
+from pathlib import Path
+from unittest.mock import patch
+
+import numpy as np
+
+from tile_utils import class_png, grid_shape, load_tile, parse_bbox, prune_tiles, save_tile, tile_path
+
+try:
+    import PIL  # noqa: F401
+    HAS_PIL = True
+except ImportError:
+    HAS_PIL = False
+
+
+class TestTileUtils(unittest.TestCase):
+
+    def setUp(self):
+        tile_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(tile_dir.cleanup)
+        self.root = Path(tile_dir.name)
+
+    def test_round_trip(self): # Arrays and meta come back as they were saved
+        path = tile_path("risk", date(2025, 7, 4), [42.0, 18.0], 0.01, root=self.root)
+        values = np.array([[0.5, np.nan]], dtype=np.float32)
+        save_tile(path, {"probability": values}, {"rows": 1, "cols": 2})
+
+        arrays, meta = load_tile(path)
+        self.assertEqual(meta, {"rows": 1, "cols": 2})
+        np.testing.assert_array_equal(arrays["probability"], values)
+        self.assertEqual(path.parent.name, "20250704")
+
+    def test_key_changes_path(self): # A different key is a different tile
+        day = date(2025, 7, 4)
+        self.assertNotEqual(tile_path("risk", day, 0.01, root=self.root), tile_path("risk", day, 0.02, root=self.root))
+
+    def test_expired_tile(self): # Tiles past their expiry are not returned
+        path = tile_path("risk", date(2025, 7, 4), "k", root=self.root)
+        save_tile(path, {"a": np.zeros(2)}, {}, expires_at=1000)
+
+        self.assertIsNotNone(load_tile(path, now=999))
+        self.assertIsNone(load_tile(path, now=1000))
+
+    def test_prune_old_tiles(self): # Tiles not written for too long are removed with their folder
+        old = tile_path("risk", date(2025, 7, 1), "old", root=self.root)
+        new = tile_path("risk", date(2025, 7, 4), "new", root=self.root)
+        save_tile(old, {"a": np.zeros(1)}, {})
+        save_tile(new, {"a": np.zeros(1)}, {})
+        os.utime(old, (1000, 1000))
+
+        prune_tiles("risk", max_age_s=3600, root=self.root, now=new.stat().st_mtime)
+        self.assertFalse(old.parent.exists())
+        self.assertTrue(new.exists())
+
+    def test_concurrent_writers(self): # Workers writing the same tile do not share a temp file
+        path = tile_path("risk", date(2025, 7, 4), "same", root=self.root)
+        writers = [threading.Thread(target=save_tile, args=(path, {"a": np.full(1000, i)}, {"i": i})) for i in range(8)]
+        for writer in writers:
+            writer.start()
+        for writer in writers:
+            writer.join()
+
+        arrays, meta = load_tile(path)
+        self.assertEqual(arrays["a"][0], meta["i"])
+        self.assertEqual(list(path.parent.iterdir()), [path])
+
+    def test_prune_files_already_gone(self): # Tiles and folders removed by another worker meanwhile are skipped
+        folder = self.root / "risk" / "20250701"
+        folder.mkdir(parents=True)
+        listed = [[folder / "gone.npz"], [folder]]
+        with patch.object(Path, "glob", side_effect=listed), patch.object(Path, "rmdir", side_effect=FileNotFoundError):
+            prune_tiles("risk", max_age_s=3600, root=self.root, now=10 ** 10)
+
+    @unittest.skipUnless(HAS_PIL, "Pillow is not installed")
+    def test_class_png(self): # Class indexes become a PNG image
+        png = class_png(np.array([[0, 1], [2, 3]]), [(0, 0, 0, 0), (1, 1, 1, 255), (2, 2, 2, 255), (3, 3, 3, 255)])
+        self.assertTrue(png.startswith(b"\x89PNG"))
+
+    def test_parse_bbox(self): # Invalid bounding boxes are refused
+        self.assertEqual(parse_bbox([42, 18, 42.5, 18.5]), (42.0, 18.0, 42.5, 18.5))
+        with self.assertRaises(ValueError):
+            parse_bbox([42.5, 18, 42, 18.5])
+        with self.assertRaises(ValueError):
+            parse_bbox("42,18")
+
+    def test_grid_shape(self): # The last row and column may pass the box edge
+        self.assertEqual(grid_shape((42.0, 18.0, 42.03, 18.02), 0.01), (2, 3))
+        self.assertEqual(grid_shape((42.0, 18.0, 42.035, 18.02), 0.01), (2, 4))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,50 @@
+import unittest  # unit test library
+from unittest.mock import MagicMock, patch
+
+import requests
+
+from Singleton.weather_client import WeatherClient
+
+
+def _response(payload):
+    response = MagicMock()
+    response.json.return_value = payload
+    return response
+
+
+class TestWeatherClient(unittest.TestCase):
+
+    def setUp(self):
+        self.client = WeatherClient(max_retries=2, pool_maxsize=3)
+
+    def test_pooled_adapter_with_retries(self): # HTTPS calls share a bounded pool that retries GETs
+        adapter = self.client.session.get_adapter("https://archive-api.open-meteo.com/v1/archive")
+        self.assertEqual(adapter.max_retries.total, 2)
+        self.assertIn(503, adapter.max_retries.status_forcelist)
+        self.assertEqual(adapter._pool_maxsize, 3)
+        self.assertTrue(adapter._pool_block)
+
+    def test_locations_in_chunks(self): # Points are sent as comma lists, one request per chunk
+        points = [(17.0 + i, 42.0) for i in range(5)]
+        responses = [
+            _response([{"hourly": {"n": 0}}, {"hourly": {"n": 1}}]),
+            _response([{"hourly": {"n": 2}}, {"hourly": {"n": 3}}]),
+            _response({"hourly": {"n": 4}})
+        ]
+
+        with patch.object(requests.Session, "get", side_effect=responses) as get:
+            payloads = self.client.get_locations("https://example.test", {"hourly": "x"}, points, chunk_size=2)
+
+        self.assertEqual(get.call_count, 3)
+        self.assertEqual(get.call_args_list[0].kwargs["params"]["latitude"], "17.0,18.0")
+        self.assertEqual(get.call_args_list[2].kwargs["params"]["longitude"], "42.0")
+        self.assertEqual([p["hourly"]["n"] for p in payloads], [0, 1, 2, 3, 4])
+
+    def test_short_response_is_padded(self): # Locations missing from the reply come back empty
+        with patch.object(requests.Session, "get", return_value=_response([{"hourly": {}}])):
+            payloads = self.client.get_locations("https://example.test", {}, [(17.0, 42.0), (18.0, 42.0)])
+        self.assertEqual(payloads[1], {})
+
+
+if __name__ == "__main__":
+    unittest.main()
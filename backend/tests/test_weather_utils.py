@@ -0,0 +1,82 @@
+import unittest  # unit test library
+import tempfile
+from datetime import date, datetime, timezone
+from pathlib import Path
+
+from weather_utils import WeatherCache, hour_is_complete, next_forecast_run, snap, weather_expiry
+
+DAY = date(2025, 7, 4)
+
+
+# clock that only moves when the test moves it
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def _hourly(hours=24):
+    return {
+        "time": [f"2025-07-04T{hour:02d}:00" for hour in range(hours)],
+        "temperature_2m": [25.3] * hours,
+        "dew_point_2m": [9.1] * hours,
+        "precipitation": [0.0] * hours,
+        "vapour_pressure_deficit": [2.75] * hours,
+        "wind_speed_10m": [3.4] * hours
+    }
+
+
+class TestWeatherCache(unittest.TestCase):
+
+    def setUp(self):
+        cache_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(cache_dir.cleanup)
+        self.clock = FakeClock()
+        self.cache = WeatherCache(Path(cache_dir.name) / "weather.sqlite3", clock=self.clock)
+
+    def test_round_trip(self): # A stored day comes back with the same hourly values
+        self.cache.set(17.5396, 42.9349, DAY, _hourly())
+        hourly = self.cache.get(17.5396, 42.9349, DAY)
+
+        self.assertEqual(len(hourly["time"]), 24)
+        self.assertEqual(hourly["time"][10], "2025-07-04T10:00")
+        self.assertEqual(hourly["temperature_2m"][10], 25.3)
+        self.assertEqual(hourly["vapour_pressure_deficit"][23], 2.75)
+
+    def test_nearby_points_share_a_day(self): # Points in the same grid cell use one entry
+        self.cache.set(17.5396, 42.9349, DAY, _hourly())
+        self.assertIsNotNone(self.cache.get(17.5404, 42.9331, DAY))
+        self.assertIsNone(self.cache.get(17.56, 42.9349, DAY))
+        self.assertEqual(snap(17.5396, 42.9349), (17.54, 42.93))
+
+    def test_entry_expires(self): # Forecast days are dropped at their expiry time
+        self.cache.set(17.5, 42.9, DAY, _hourly(), expires_at=self.clock.now + 60)
+        self.assertIsNotNone(self.cache.get(17.5, 42.9, DAY))
+
+        self.clock.now += 61
+        self.assertIsNone(self.cache.get(17.5, 42.9, DAY))
+        self.assertEqual(self.cache.stats()["misses"], 1)
+
+    def test_missing_hours_are_none(self): # Hours absent from the response stay missing
+        self.cache.set(17.5, 42.9, DAY, _hourly(hours=12))
+        hourly = self.cache.get(17.5, 42.9, DAY)
+        self.assertIsNone(hourly["temperature_2m"][20])
+
+    def test_hour_is_complete(self): # Hours with a missing value are not complete
+        self.assertTrue(hour_is_complete(_hourly(hours=12), datetime(2025, 7, 4, 11, 30, tzinfo=timezone.utc)))
+        self.assertFalse(hour_is_complete(_hourly(hours=12), datetime(2025, 7, 4, 12, tzinfo=timezone.utc)))
+
+    def test_expiry_rules(self): # Only complete archive days are kept for good
+        now = datetime(2025, 7, 10, 7, 30, tzinfo=timezone.utc)
+        next_run = datetime(2025, 7, 10, 12, tzinfo=timezone.utc).timestamp()
+
+        self.assertIsNone(weather_expiry("archive", _hourly(), DAY, now))
+        self.assertEqual(weather_expiry("archive", _hourly(hours=12), DAY, now), next_run)
+        self.assertEqual(weather_expiry("forecast", _hourly(), DAY, now), next_run)
+        self.assertEqual(next_forecast_run(now).hour, 12)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,207 @@
+import math
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+import numpy as np
+
+# ---------------------------- CONFIGURATION ----------------------------
+
+# normalized threat components of every cell that was asked for, shared by every worker process
+COMPONENT_CACHE_PATH = Path(__file__).resolve().parent / "Cache" / "threat_components.sqlite3"
+
+# points are snapped to this grid (~200 m) and the components are taken around the cell centre
+COMPONENT_CELL_DEG = 0.002
+
+# components that depend on the day, the others (exposure, slope factor) are kept for good
+DAILY_COMPONENTS = ("fire_power", "spread_index")
+
+# a day without a VIIRS image yet is asked again after this long, the product may have been updated
+FRP_PENDING_TTL_S = 3600
+
+# a spread index from the FWI of an earlier day (ERA5-Land not there yet) is computed again after this long
+SPREAD_PENDING_TTL_S = 6 * 3600
+
+# normalized components the score is made of, in the order of the weights
+THREAT_COMPONENTS = ("fire_power", "spread_index", "exposure")
+WEIGHT_NAMES = ("w_fire", "w_spread", "w_exposure")
+
+# every user weight is clamped to this range before the three are scaled to sum to 1
+WEIGHT_MIN = 0.10
+WEIGHT_MAX = 1.0
+
+# weight sets scored in one request
+WEIGHT_SETS_MAX = 20
+
+# upper score limits of the low and medium levels
+THREAT_LEVEL_LIMITS = (0.33, 0.66)
+THREAT_LEVELS = ("منخفضة", "متوسطة", "عالية")
+
+
+def component_cell(lat, lon):
+    return round(round(lat / COMPONENT_CELL_DEG) * COMPONENT_CELL_DEG, 4), round(round(lon / COMPONENT_CELL_DEG) * COMPONENT_CELL_DEG, 4)
+
+
+class ComponentCache:
+    # one row per cell, day and component. day is "" for the static components
+
+    def __init__(self, path=COMPONENT_CACHE_PATH, clock=time.time):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._clock = clock
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS threat_components ("
+                " lat REAL NOT NULL, lon REAL NOT NULL, day TEXT NOT NULL, name TEXT NOT NULL,"
+                " value REAL NOT NULL, expires_at REAL,"
+                " PRIMARY KEY (lat, lon, day, name))"
+            )
+
+        # counters, one lookup per component
+        self.hits = 0
+        self.misses = 0
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=10)
+
+    def get(self, lat, lon, day, names):
+        # {name: value} of the components found and not expired, day is only used for DAILY_COMPONENTS
+        keys = ["" if name not in DAILY_COMPONENTS else day.isoformat() for name in names]
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT day, name, value, expires_at FROM threat_components"
+                " WHERE lat = ? AND lon = ? AND day IN (?, ?)",
+                (*component_cell(lat, lon), "", day.isoformat())
+            ).fetchall()
+
+        now = self._clock()
+        found = {
+            name: value for row_day, name, value, expires_at in rows
+            if (expires_at is None or expires_at > now) and name in names and row_day == keys[names.index(name)]
+        }
+        self.hits += len(found)
+        self.misses += len(names) - len(found)
+        return found
+
+    def set(self, lat, lon, day, values, expires_at=None):
+        # values: {name: value}, expires_at: unix time, None for values that never change again
+        with self._connect() as conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO threat_components (lat, lon, day, name, value, expires_at) VALUES (?, ?, ?, ?, ?, ?)",
+                [
+                    (*component_cell(lat, lon), "" if name not in DAILY_COMPONENTS else day.isoformat(), name, float(value), expires_at)
+                    for name, value in values.items()
+                ]
+            )
+
+    def delete_expired(self):
+        with self._connect() as conn:
+            conn.execute("DELETE FROM threat_components WHERE expires_at IS NOT NULL AND expires_at <= ?", (self._clock(),))
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0
+        }
+
+
+def fire_power_expiry(images, now=None):
+    # the VIIRS day is final once its image is in the collection, until then it is asked again
+    if images:
+        return None
+    return (time.time() if now is None else now) + FRP_PENDING_TTL_S
+
+
+def spread_index_expiry(final, now=None):
+    # final: the FWI was the one of the requested day
+    if final:
+        return None
+    return (time.time() if now is None else now) + SPREAD_PENDING_TTL_S
+
+
+# ---------------------------- SCORING ----------------------------
+
+def _weight(value):
+    # one user weight as a float, ValueError for null, text or non-finite values
+    try:
+        weight = float(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"weights must be numbers, got {value!r}")
+    if not math.isfinite(weight):
+        raise ValueError(f"weights must be finite numbers, got {value!r}")
+    return weight
+
+
+def normalize_weights(w_fire, w_spread, w_exposure):
+    # ValueError when a weight is not a number
+    weights = [min(max(_weight(w), WEIGHT_MIN), WEIGHT_MAX) for w in (w_fire, w_spread, w_exposure)]
+    total = sum(weights)
+    return tuple(w / total for w in weights)
+
+
+def parse_weight_sets(value):
+    # list of {"w_fire", "w_spread", "w_exposure"} objects -> list of normalized weight tuples, ValueError when invalid
+    if not isinstance(value, list) or not 0 < len(value) <= WEIGHT_SETS_MAX:
+        raise ValueError(f"weights must be a list of 1 to {WEIGHT_SETS_MAX} weight sets")
+    weight_sets = []
+    for item in value:
+        if not isinstance(item, dict) or any(name not in item for name in WEIGHT_NAMES):
+            raise ValueError(f"every weight set needs {', '.join(WEIGHT_NAMES)}")
+        weight_sets.append(normalize_weights(*(item[name] for name in WEIGHT_NAMES)))
+    return weight_sets
+
+
+def threat_level_of(score):
+    if score < THREAT_LEVEL_LIMITS[0]:
+        return THREAT_LEVELS[0]
+    if score < THREAT_LEVEL_LIMITS[1]:
+        return THREAT_LEVELS[1]
+    return THREAT_LEVELS[2]
+
+
+def score_components(components, weights):
+    # weighted sum of the normalized components, clamped to [0, 1]
+    score = sum(float(components[name]) * w for name, w in zip(THREAT_COMPONENTS, weights))
+    score = min(max(score, 0.0), 1.0)
+    return {"threat_score": score, "threat_level": threat_level_of(score)}
+
+
+def threat_response(components, weights, weight_sets=None):
+    # score of the request weights, the components, and the score of every extra weight set
+    out = {**score_components(components, weights), "components": {name: float(components[name]) for name in THREAT_COMPONENTS}}
+    if weight_sets:
+        out["scores"] = [
+            {**dict(zip(WEIGHT_NAMES, weight_set)), **score_components(components, weight_set)}
+            for weight_set in weight_sets
+        ]
+    return out
+
+
+def score_grid(components, weights):
+    # score of every cell of component arrays, NaN stays NaN
+    score = sum(np.asarray(components[name], dtype=float) * w for name, w in zip(THREAT_COMPONENTS, weights))
+    return np.clip(score, 0.0, 1.0)
+
+
+def threat_classes(score):
+    # 0 for cells without a score, then 1 + the index in THREAT_LEVELS
+    classes = np.select([score < THREAT_LEVEL_LIMITS[0], score < THREAT_LEVEL_LIMITS[1]], [1, 2], 3)
+    return np.where(np.isnan(score), 0, classes).astype(np.uint8)
+
+
+_component_cache = None
+_component_cache_lock = threading.Lock()
+
+
+def get_component_cache():
+    # one cache per process, the sqlite file is shared by all of them
+    global _component_cache
+    with _component_cache_lock:
+        if _component_cache is None:
+            _component_cache = ComponentCache()
+            _component_cache.delete_expired()
+        return _component_cache
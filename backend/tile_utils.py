@@ -0,0 +1,138 @@
+import hashlib
+import io
+import json
+import os
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+# array tiles of the grid endpoints, one sub folder per tile kind and day
+TILE_DIR = Path(__file__).resolve().parent / "Cache" / "tiles"
+
+# tiles not rewritten for this long are removed
+TILE_MAX_AGE_S = 7 * 24 * 3600
+
+
+# ---------------------------- GRID ----------------------------
+
+def parse_bbox(value):
+    # [min_lon, min_lat, max_lon, max_lat] -> tuple of floats
+    if not isinstance(value, (list, tuple)) or len(value) != 4:
+        raise ValueError("bbox must be [min_lon, min_lat, max_lon, max_lat]")
+    min_lon, min_lat, max_lon, max_lat = (float(v) for v in value)
+    if not (min_lon < max_lon and min_lat < max_lat):
+        raise ValueError("bbox min values must be smaller than its max values")
+    return min_lon, min_lat, max_lon, max_lat
+
+
+def grid_shape(bbox, cell_deg):
+    # (rows, cols) of the grid, the last row / column may pass the box edge
+    min_lon, min_lat, max_lon, max_lat = bbox
+    rows = int(np.ceil(round((max_lat - min_lat) / cell_deg, 6)))
+    cols = int(np.ceil(round((max_lon - min_lon) / cell_deg, 6)))
+    return rows, cols
+
+
+def grid_spec(bbox, cell_deg, rows, cols):
+    # pixel grid in the format used by ee.data.computePixels, row 0 is the northern edge
+    min_lon, _, _, max_lat = bbox
+    return {
+        "dimensions": {"width": cols, "height": rows},
+        "affineTransform": {
+            "scaleX": cell_deg,
+            "shearX": 0,
+            "translateX": min_lon,
+            "shearY": 0,
+            "scaleY": -cell_deg,
+            "translateY": max_lat
+        },
+        "crsCode": "EPSG:4326"
+    }
+
+
+def grid_cell_centres(bbox, cell_deg, rows, cols):
+    min_lon, _, _, max_lat = bbox
+    lats = max_lat - (np.arange(rows) + 0.5) * cell_deg
+    lons = min_lon + (np.arange(cols) + 0.5) * cell_deg
+    return np.meshgrid(lats, lons, indexing="ij")
+
+
+# ---------------------------- TILES ----------------------------
+
+def tile_path(kind, day, *key_parts, root=None):
+    # Cache/tiles/<kind>/<YYYYMMDD>/<hash of the key>.npz
+    root = TILE_DIR if root is None else root
+    key = hashlib.sha1(json.dumps(key_parts, sort_keys=True, default=str).encode("utf-8")).hexdigest()[:20]
+    return Path(root) / kind / f"{day:%Y%m%d}" / f"{key}.npz"
+
+
+def save_tile(path, arrays, meta, expires_at=None):
+    # compressed npz written next to the target then renamed, so readers never see half a tile.
+    # expires_at: unix time, None for tiles that never change again
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+
+    buffer = io.BytesIO()
+    np.savez_compressed(
+        buffer,
+        meta=np.array(json.dumps(meta)),
+        expires_at=np.array(np.nan if expires_at is None else float(expires_at)),
+        **arrays
+    )
+
+    # unique temp name, several workers may write the same tile at once
+    with tempfile.NamedTemporaryFile(dir=path.parent, prefix=path.stem + ".", suffix=".tmp", delete=False) as tmp:
+        tmp.write(buffer.getvalue())
+    try:
+        os.replace(tmp.name, path)
+    except OSError:
+        Path(tmp.name).unlink(missing_ok=True)
+        raise
+
+
+def load_tile(path, now=None):
+    # (arrays, meta) of a stored tile, None when it is missing or expired
+    path = Path(path)
+    if not path.exists():
+        return None
+
+    with np.load(path) as data:
+        expires_at = float(data["expires_at"])
+        if not np.isnan(expires_at) and expires_at <= (time.time() if now is None else now):
+            return None
+        meta = json.loads(str(data["meta"]))
+        arrays = {name: data[name] for name in data.files if name not in ("meta", "expires_at")}
+    return arrays, meta
+
+
+def prune_tiles(kind, max_age_s=TILE_MAX_AGE_S, root=None, now=None):
+    # remove tiles written more than max_age_s ago, then the empty day folders
+    root = TILE_DIR if root is None else root
+    oldest = (time.time() if now is None else now) - max_age_s
+    # another worker may prune or write the same folders at the same time
+    for path in (Path(root) / kind).glob("*/*.npz"):
+        try:
+            if path.stat().st_mtime < oldest:
+                path.unlink(missing_ok=True)
+        except FileNotFoundError:
+            pass
+    for folder in (Path(root) / kind).glob("*"):
+        try:
+            if folder.is_dir() and not any(folder.iterdir()):
+                folder.rmdir()
+        except OSError: # removed already, or a tile was just written in it
+            pass
+
+
+def class_png(classes, palette):
+    # PNG of a 2D array of class indexes, palette[i] = (r, g, b, a) of class i
+    from PIL import Image
+
+    colours = np.asarray(palette, dtype=np.uint8)
+    rgba = colours[np.clip(np.asarray(classes, dtype=np.intp), 0, len(colours) - 1)]
+
+    buffer = io.BytesIO()
+    Image.fromarray(rgba).save(buffer, format="PNG", optimize=True)
+    return buffer.getvalue()
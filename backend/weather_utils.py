@@ -0,0 +1,149 @@
+import sqlite3
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+import numpy as np
+
+# ---------------------------- CONFIGURATION ----------------------------
+
+# local store of Open-Meteo days, shared by every worker process
+WEATHER_CACHE_PATH = Path(__file__).resolve().parent / "Cache" / "weather.sqlite3"
+
+# points are snapped to this grid (~1 km), the weather models are much coarser
+WEATHER_CACHE_DEG = 0.01
+
+# Open-Meteo hourly variables kept for every cached day, in storage order
+HOURLY_VARS = ("temperature_2m", "dew_point_2m", "precipitation", "vapour_pressure_deficit", "wind_speed_10m")
+
+# forecast models are run every 6 hours (00, 06, 12, 18 UTC)
+FORECAST_RUN_INTERVAL_H = 6
+
+
+def snap(lat, lon):
+    # point on the cache grid, also used for the Open-Meteo request so the cached day matches the key
+    return round(round(lat / WEATHER_CACHE_DEG) * WEATHER_CACHE_DEG, 4), round(round(lon / WEATHER_CACHE_DEG) * WEATHER_CACHE_DEG, 4)
+
+
+def next_forecast_run(now=None):
+    # time of the next forecast model run, cached forecasts expire then
+    now = now or datetime.now(timezone.utc)
+    run = now.replace(minute=0, second=0, microsecond=0)
+    run -= timedelta(hours=run.hour % FORECAST_RUN_INTERVAL_H)
+    return run + timedelta(hours=FORECAST_RUN_INTERVAL_H)
+
+
+def hourly_to_array(hourly, day):
+    # Open-Meteo hourly block -> 24 x len(HOURLY_VARS) float32 array, NaN where a value is missing
+    values = np.full((24, len(HOURLY_VARS)), np.nan, dtype=np.float32)
+    prefix = day.strftime("%Y-%m-%dT")
+    for i, t in enumerate(hourly.get("time") or []):
+        t = str(t)
+        if not t.startswith(prefix):
+            continue
+        hour = int(t[len(prefix):len(prefix) + 2])
+        for j, name in enumerate(HOURLY_VARS):
+            column = hourly.get(name) or []
+            if i < len(column) and column[i] is not None:
+                values[hour, j] = column[i]
+    return values
+
+
+def array_to_hourly(values, day):
+    # back to the Open-Meteo hourly format, so cached and fresh days are read by the same code.
+    # str() of a float32 is its shortest decimal form, which gives back the value Open-Meteo sent
+    hourly = {"time": [f"{day:%Y-%m-%d}T{hour:02d}:00" for hour in range(24)]}
+    for j, name in enumerate(HOURLY_VARS):
+        hourly[name] = [None if np.isnan(v) else float(str(v)) for v in values[:, j]]
+    return hourly
+
+
+def hour_is_complete(hourly, when_dt):
+    # every variable of the hour of when_dt is there. a day cached by the archive, which runs days
+    # behind, can hold nulls for hours the forecast can answer
+    return not np.isnan(hourly_to_array(hourly, when_dt.date())[when_dt.hour]).any()
+
+
+class WeatherCache:
+    # one row per grid point and day: the 24 hourly values of every variable as a small float32 blob.
+    # complete past days never expire, forecasts and incomplete days expire at the next model run
+
+    def __init__(self, path=WEATHER_CACHE_PATH, clock=time.time):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._clock = clock
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS weather_days ("
+                " lat REAL NOT NULL, lon REAL NOT NULL, day TEXT NOT NULL,"
+                " hourly BLOB NOT NULL, expires_at REAL,"
+                " PRIMARY KEY (lat, lon, day))"
+            )
+
+        # counters
+        self.hits = 0
+        self.misses = 0
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=10)
+
+    def get(self, lat, lon, day):
+        # hourly block of the day, None when missing or expired
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT hourly, expires_at FROM weather_days WHERE lat = ? AND lon = ? AND day = ?",
+                (*snap(lat, lon), day.isoformat())
+            ).fetchone()
+
+        if row is None or (row[1] is not None and row[1] <= self._clock()):
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        values = np.frombuffer(row[0], dtype=np.float32).reshape(24, len(HOURLY_VARS))
+        return array_to_hourly(values, day)
+
+    def set(self, lat, lon, day, hourly, expires_at=None):
+        # expires_at: unix time, None for days that never change again
+        values = hourly_to_array(hourly, day)
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO weather_days (lat, lon, day, hourly, expires_at) VALUES (?, ?, ?, ?, ?)",
+                (*snap(lat, lon), day.isoformat(), values.tobytes(), expires_at)
+            )
+
+    def delete_expired(self):
+        with self._connect() as conn:
+            conn.execute("DELETE FROM weather_days WHERE expires_at IS NOT NULL AND expires_at <= ?", (self._clock(),))
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0
+        }
+
+
+def weather_expiry(mode, hourly, day, now=None):
+    # complete archive days are kept for good, anything else until the next forecast run
+    now = now or datetime.now(timezone.utc)
+    if mode == "archive" and not np.isnan(hourly_to_array(hourly, day)).any():
+        return None
+    return next_forecast_run(now).timestamp()
+
+
+_weather_cache = None
+_weather_cache_lock = threading.Lock()
+
+
+def get_weather_cache():
+    # one cache per process, the sqlite file is shared by all of them
+    global _weather_cache
+    with _weather_cache_lock:
+        if _weather_cache is None:
+            _weather_cache = WeatherCache()
+            _weather_cache.delete_expired()
+        return _weather_cache